@@ -5,6 +5,14 @@ Nightly EODHD Options Dataset Builder with Progress Tracking
 Runs automatically via cron, processes a batch of tickers each night,
 tracks progress, and notifies when complete.
 
+Progress lives in a SQLite journal (data/eodhd_options/progress.sqlite): one row
+per finished ticker plus a page cursor for every ticker still being fetched.
+Each page is spooled to disk and its cursor committed before the next request,
+so a run that is killed or hits the API budget mid-ticker resumes at the next
+page on the following run instead of paying for the chain again. Cursors are
+only valid for the snapshot date they were taken on; older ones are dropped and
+those tickers restart from page 1. An existing progress.json is imported once.
+
 Usage:
     python3 build-eodhd-nightly.py
 """
@@ -12,12 +20,16 @@ Usage:
 import os
 import json
 import sys
+import sqlite3
+import threading
 import importlib.util
 import smtplib
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 from pathlib import Path
+from typing import Dict, List, Tuple
 
 # Import the dataset builder module (has hyphens in filename)
 spec = importlib.util.spec_from_file_location("builder", "./build-eodhd-options-dataset-fixed.py")
@@ -26,9 +38,11 @@ spec.loader.exec_module(builder_module)
 EODHDOptionsDatasetBuilder = builder_module.EODHDOptionsDatasetBuilder
 
 # Configuration
-PROGRESS_FILE = './data/eodhd_options/progress.json'
-BATCH_SIZE = 25  # Process 25 tickers per night (varies based on ticker size)
+PROGRESS_DB = './data/eodhd_options/progress.sqlite'
+LEGACY_PROGRESS_FILE = './data/eodhd_options/progress.json'  # Imported into PROGRESS_DB once
+BATCH_SIZE = 100  # Tickers queued per night; the API budget usually ends the run first (varies based on ticker size)
 MAX_API_CALLS = 9000  # Stop at ~90% of daily limit (9,000 requests × 10 credits = 90,000/100,000)
+CONCURRENCY = 8  # Tickers fetched at once, sharing the builder's per-minute rate limit
 LOG_FILE = './data/eodhd_options/nightly_build.log'
 
 # Email Configuration
@@ -81,26 +95,149 @@ def send_email(subject, body):
     except Exception as e:
         log(f"❌ Failed to send email: {str(e)}")
 
-def load_progress():
-    """Load progress from file"""
-    if os.path.exists(PROGRESS_FILE):
-        with open(PROGRESS_FILE, 'r') as f:
-            return json.load(f)
-    else:
-        return {
-            'completed_tickers': [],
-            'failed_tickers': [],
-            'started_at': datetime.now().isoformat(),
-            'last_run': None,
-            'total_api_calls': 0,
-            'total_contracts': 0
+class ProgressJournal:
+    """
+    Durable nightly progress: finished tickers, running totals and per-ticker page cursors
+
+    Every update is its own SQLite transaction (WAL mode), so the journal is consistent
+    whenever the process dies. Safe to share between the builder's worker threads.
+    """
+
+    def __init__(self, path: str = PROGRESS_DB, legacy_path: str = LEGACY_PROGRESS_FILE):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.transaction() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS tickers (
+                ticker TEXT PRIMARY KEY,
+                status TEXT NOT NULL CHECK (status IN ('completed', 'failed')),
+                contracts INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL)""")
+            db.execute("""CREATE TABLE IF NOT EXISTS cursors (
+                ticker TEXT NOT NULL,
+                snapshot_date TEXT NOT NULL,
+                next_page INTEGER NOT NULL,
+                contracts INTEGER NOT NULL,
+                PRIMARY KEY (ticker, snapshot_date))""")
+            db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            if db.execute("SELECT 1 FROM meta WHERE key = 'started_at'").fetchone() is None:
+                self._import_legacy(db, legacy_path)
+
+    @contextmanager
+    def transaction(self):
+        """One exclusive write transaction, serialized across threads"""
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    @staticmethod
+    def _import_legacy(db: sqlite3.Connection, legacy_path: str):
+        """Seed a new journal from progress.json (left in place for reference)"""
+        progress = {}
+        if os.path.exists(legacy_path):
+            with open(legacy_path, 'r') as f:
+                progress = json.load(f)
+        now = datetime.now().isoformat()
+        last_run = progress.get('last_run') or now
+        for status in ('completed', 'failed'):
+            db.executemany(
+                'INSERT OR REPLACE INTO tickers (ticker, status, contracts, updated_at) VALUES (?, ?, 0, ?)',
+                [(ticker, status, last_run) for ticker in progress.get(f'{status}_tickers', [])]
+            )
+        meta = {
+            'started_at': progress.get('started_at') or now,
+            'last_run': progress.get('last_run') or '',
+            'total_api_calls': progress.get('total_api_calls', 0),
+            # Per-ticker counts are unknown for imported tickers, so the total is carried over
+            'imported_contracts': progress.get('total_contracts', 0),
         }
-
-def save_progress(progress):
-    """Save progress to file"""
-    progress['last_run'] = datetime.now().isoformat()
-    with open(PROGRESS_FILE, 'w') as f:
-        json.dump(progress, f, indent=2)
+        db.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                       [(key, str(value)) for key, value in meta.items()])
+
+    def _meta(self, key: str, default: str = '') -> str:
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def finished(self) -> Dict[str, str]:
+        """ticker → 'completed' | 'failed'"""
+        with self.lock:
+            return dict(self.conn.execute('SELECT ticker, status FROM tickers'))
+
+    def open_cursors(self, snapshot_date: str) -> List[str]:
+        """Tickers with a partially fetched snapshot for snapshot_date"""
+        with self.lock:
+            return [row[0] for row in self.conn.execute(
+                'SELECT ticker FROM cursors WHERE snapshot_date = ? ORDER BY ticker', (snapshot_date,))]
+
+    def drop_stale_cursors(self, snapshot_date: str) -> List[Tuple[str, str]]:
+        """Forget cursors from other snapshot dates; returns the dropped (ticker, snapshot_date) pairs"""
+        with self.transaction() as db:
+            stale = db.execute(
+                'SELECT ticker, snapshot_date FROM cursors WHERE snapshot_date != ?', (snapshot_date,)).fetchall()
+            db.execute('DELETE FROM cursors WHERE snapshot_date != ?', (snapshot_date,))
+        return stale
+
+    # PageCursorStore (see build-eodhd-options-dataset-fixed.py)
+
+    def cursor(self, ticker: str, snapshot_date: str) -> Tuple[int, int]:
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT next_page, contracts FROM cursors WHERE ticker = ? AND snapshot_date = ?',
+                (ticker, snapshot_date)
+            ).fetchone()
+        return (row[0], row[1]) if row else (1, 0)
+
+    def advance(self, ticker: str, snapshot_date: str, next_page: int, rows: int):
+        with self.transaction() as db:
+            db.execute(
+                """INSERT INTO cursors (ticker, snapshot_date, next_page, contracts) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (ticker, snapshot_date)
+                   DO UPDATE SET next_page = excluded.next_page, contracts = contracts + excluded.contracts""",
+                (ticker, snapshot_date, next_page, rows)
+            )
+
+    def clear(self, ticker: str, snapshot_date: str):
+        with self.transaction() as db:
+            db.execute('DELETE FROM cursors WHERE ticker = ? AND snapshot_date = ?', (ticker, snapshot_date))
+
+    def record(self, ticker: str, status: str, contracts: int = 0):
+        """Mark ticker completed/failed and drop any cursor it still has, atomically"""
+        with self.transaction() as db:
+            db.execute(
+                'INSERT OR REPLACE INTO tickers (ticker, status, contracts, updated_at) VALUES (?, ?, ?, ?)',
+                (ticker, status, contracts, datetime.now().isoformat())
+            )
+            db.execute('DELETE FROM cursors WHERE ticker = ?', (ticker,))
+
+    def add_api_calls(self, calls: int):
+        """Add this run's calls to the running total and stamp last_run"""
+        with self.transaction() as db:
+            total = int(self._meta('total_api_calls', '0')) + calls
+            db.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                           [('total_api_calls', str(total)), ('last_run', datetime.now().isoformat())])
+
+    def summary(self) -> Dict:
+        """Progress in the shape of the old progress.json (ticker lists, totals)"""
+        with self.lock:
+            rows = self.conn.execute('SELECT ticker, status, contracts FROM tickers ORDER BY updated_at, ticker').fetchall()
+            return {
+                'completed_tickers': [ticker for ticker, status, _ in rows if status == 'completed'],
+                'failed_tickers': [ticker for ticker, status, _ in rows if status == 'failed'],
+                'started_at': self._meta('started_at'),
+                'last_run': self._meta('last_run') or None,
+                'total_api_calls': int(self._meta('total_api_calls', '0')),
+                'total_contracts': int(self._meta('imported_contracts', '0')) + sum(n for _, _, n in rows),
+            }
+
+    def close(self):
+        self.conn.close()
 
 def get_sp500_tickers():
     """Get S&P 500 ticker list"""
@@ -166,22 +303,27 @@ def main():
     log("Starting nightly EODHD options dataset build")
     log("="*80)
 
-    # Load progress
-    progress = load_progress()
+    journal = ProgressJournal()
+    builder = EODHDOptionsDatasetBuilder(daily_budget=MAX_API_CALLS, workers=CONCURRENCY)
 
     # Get all tickers
     all_tickers = get_sp500_tickers()
 
-    # Get remaining tickers
-    completed = set(progress['completed_tickers'])
-    failed = set(progress['failed_tickers'])
-    remaining = [t for t in all_tickers if t not in completed and t not in failed]
+    # Get remaining tickers (partially fetched ones first, so their spooled pages are finished off)
+    finished_tickers = journal.finished()
+    for ticker, snapshot_date in journal.drop_stale_cursors(builder.today):
+        builder.sink.spool(ticker, snapshot_date).discard()
+    resuming = set(journal.open_cursors(builder.today))
+    remaining = [t for t in all_tickers if t not in finished_tickers]
+    remaining.sort(key=lambda t: t not in resuming)
+    completed_count = sum(status == 'completed' for status in finished_tickers.values())
 
-    log(f"Progress: {len(completed)} completed, {len(failed)} failed, {len(remaining)} remaining")
+    log(f"Progress: {completed_count} completed, {len(finished_tickers) - completed_count} failed, "
+        f"{len(remaining)} remaining ({len(resuming)} mid-fetch)")
 
     if not remaining:
         log("✅ All tickers completed!")
-        send_completion_notification(progress)
+        send_completion_notification(journal.summary())
         return 0
 
     # Get batch for tonight
@@ -189,42 +331,42 @@ def main():
     log(f"Tonight's batch: {len(batch)} tickers")
     log(f"Tickers: {', '.join(batch)}")
 
-    # Build dataset
-    builder = EODHDOptionsDatasetBuilder()
-
-    for i, ticker in enumerate(batch):
-        log(f"\n[{i+1}/{len(batch)}] Processing {ticker}...")
+    # Build dataset (tickers fetched concurrently; no new request once MAX_API_CALLS is spent)
+    # Pages are spooled under builder_module.PARQUET_DIR and each ticker's cursor kept in the journal
+    # (JSON/CSV copies disabled to save disk space)
+    finished = 0
+    success_tonight = 0
+    failed_tonight = 0
+    incomplete_tonight = 0
 
-        # Check if we're approaching API limit
-        if builder.api_call_count >= MAX_API_CALLS:
-            log(f"⚠️  Approaching API limit ({builder.api_call_count:,} calls), stopping for tonight")
-            break
+    def fetch(ticker, date):
+        return builder.fetch_resumable(ticker, journal, date)
 
-        try:
-            data = builder.get_options_data(ticker)
-
-            if data and len(data) > 0:
-                # Save data
-                today = datetime.now().strftime('%Y-%m-%d')
-                # builder.save_to_json(ticker, data, today)  # Disabled to save disk space
-                builder.save_to_csv(ticker, data, today)
-
-                # Update progress
-                progress['completed_tickers'].append(ticker)
-                progress['total_contracts'] += len(data)
-
-                log(f"✅ {ticker}: {len(data):,} contracts saved")
+    try:
+        for ticker, _, contracts in builder.fetch_many([(ticker, None) for ticker in batch], fetch=fetch):
+            finished += 1
+            log(f"\n[{finished}/{len(batch)}] Finished {ticker}")
+
+            if contracts is None:
+                # Stopped mid-chain; the spooled pages and cursor are resumed next run
+                incomplete_tonight += 1
+                log(f"⏸️  {ticker}: incomplete, will resume on the next run")
+            elif contracts:
+                journal.record(ticker, 'completed', contracts)
+                success_tonight += 1
+                log(f"✅ {ticker}: {contracts:,} contracts saved")
             else:
-                progress['failed_tickers'].append(ticker)
+                journal.record(ticker, 'failed')
+                failed_tonight += 1
                 log(f"❌ {ticker}: No data retrieved")
+    finally:
+        journal.add_api_calls(builder.api_call_count)
 
-        except Exception as e:
-            progress['failed_tickers'].append(ticker)
-            log(f"❌ {ticker}: Error - {str(e)}")
+    if finished < len(batch):
+        log(f"⚠️  Approaching API limit ({builder.api_call_count:,} calls), stopped after {finished}/{len(batch)} tickers")
 
-        # Update progress after each ticker
-        progress['total_api_calls'] = builder.api_call_count
-        save_progress(progress)
+    progress = journal.summary()
+    journal.close()
 
     # Final summary
     log("\n" + "="*80)
@@ -236,9 +378,6 @@ def main():
     remaining_after = len(all_tickers) - len(progress['completed_tickers']) - len(progress['failed_tickers'])
 
     # Prepare email summary
-    success_tonight = len([t for t in batch if t in progress['completed_tickers']])
-    failed_tonight = len([t for t in batch if t in progress['failed_tickers']])
-
     email_body = f"""EODHD Options Dataset - Nightly Build Report
 {'='*60}
 
@@ -247,6 +386,7 @@ Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 Tonight's Results:
   ✅ Successful: {success_tonight} tickers
   ❌ Failed: {failed_tonight} tickers
+  ⏸️  Incomplete (resume next run): {incomplete_tonight} tickers
   📞 API Calls: {builder.api_call_count:,}
 
 Overall Progress:
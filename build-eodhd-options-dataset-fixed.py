@@ -5,7 +5,15 @@ Build comprehensive options dataset from EODHD Marketplace Options API
 FIXED VERSION - Uses correct marketplace endpoint with proper URL encoding
 
 With 100,000 calls/day, you can systematically download options data
-for all 6,000+ tickers and save to JSON/CSV files
+for all 6,000+ tickers and save to typed Parquet (default), JSON and/or CSV files
+
+Parquet snapshots are partitioned as data/eodhd_options/parquet/date=YYYY-MM-DD/ticker=XYZ/
+and written in row-group batches while pages arrive (see scripts/ml/options_parquet_sink.py).
+
+Tickers (or historical dates) are fetched concurrently over one pooled HTTP
+session; a shared token bucket (scripts/ml/rate_limiter.py) keeps the whole pool
+under the per-minute request limit and stops new requests once the daily budget
+is spent.
 
 Usage:
     python3 build-eodhd-options-dataset-fixed.py
@@ -17,11 +25,18 @@ import requests
 import json
 import csv
 import os
+import sys
 import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Any, Callable, Iterator, List, Dict, Optional, Protocol, Tuple
+from requests.adapters import HTTPAdapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'scripts' / 'ml'))
+from options_parquet_sink import OptionsParquetSink
+from rate_limiter import TokenBucketLimiter
 
 # Load environment variables
 from dotenv import load_dotenv
@@ -30,20 +45,69 @@ load_dotenv()
 EODHD_API_KEY = os.getenv('EODHD_API_KEY', '68ec0c6a3bd8a9.01565032')
 BASE_URL = 'https://eodhd.com/api/mp/unicornbay'  # Marketplace endpoint!
 OUTPUT_DIR = './data/eodhd_options'
+PARQUET_DIR = os.path.join(OUTPUT_DIR, 'parquet')
+OUTPUT_FORMATS = ['parquet', 'json', 'csv']  # 'both' (legacy) = json + csv
 RATE_LIMIT = 10000  # Daily limit in requests (100,000 credits ÷ 10 credits per options call)
-DELAY_MS = 0.15  # 150ms delay between requests (~400 req/min, well under 1000/min limit)
+REQUESTS_PER_MINUTE = 900  # Shared across all workers, under the 1000/min limit
+DEFAULT_WORKERS = 8  # Concurrent tickers
+MAX_RETRIES = 3  # Retries of a page after HTTP 429
+DEFAULT_BACKOFF_SECONDS = 60  # Pause after HTTP 429 when no Retry-After header is sent
+
+
+class PageCursorStore(Protocol):
+    """Where fetch_resumable records page cursors (see ProgressJournal in build-eodhd-nightly.py)"""
+
+    def cursor(self, ticker: str, snapshot_date: str) -> Tuple[int, int]:
+        """(next page to fetch, contracts already spooled); (1, 0) if none"""
+
+    def advance(self, ticker: str, snapshot_date: str, next_page: int, rows: int) -> None:
+        """Record that a page of `rows` contracts is durably spooled"""
+
+    def clear(self, ticker: str, snapshot_date: str) -> None:
+        """Forget the cursor once the snapshot is committed"""
+
+
+def expand_formats(formats: List[str]) -> List[str]:
+    """--format values → output formats, expanding the legacy 'both' to json + csv"""
+    expanded = []
+    for fmt in formats:
+        for name in (['json', 'csv'] if fmt == 'both' else [fmt]):
+            if name not in expanded:
+                expanded.append(name)
+    return expanded
 
 
 class EODHDOptionsDatasetBuilder:
-    def __init__(self):
-        self.api_call_count = 0
+    def __init__(
+        self,
+        daily_budget: int = int(RATE_LIMIT * 0.95),
+        requests_per_minute: int = REQUESTS_PER_MINUTE,
+        workers: int = DEFAULT_WORKERS
+    ):
         self.start_time = time.time()
         self.success_count = 0
         self.error_count = 0
+        self.workers = workers
+        self.limiter = TokenBucketLimiter(requests_per_minute, daily_budget)
+        self.sink = OptionsParquetSink(PARQUET_DIR)
+        self.today = datetime.now().strftime('%Y-%m-%d')
+
+        # One pooled session for all workers (EODHD blocks the default Python User-Agent)
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'curl/7.68.0',
+            'Accept': '*/*'
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('https://', adapter)
 
         # Create output directory
         Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
 
+    @property
+    def api_call_count(self) -> int:
+        return self.limiter.used
+
     def get_tickers_list(self) -> List[str]:
         """Get list of tickers to process"""
 
@@ -71,18 +135,32 @@ class EODHDOptionsDatasetBuilder:
         print(f"📋 Using {len(major_tickers)} default tickers")
         return major_tickers
 
-    def get_options_data(self, ticker: str, date: Optional[str] = None, limit: int = 1000) -> Optional[List[Dict]]:
-        """Get ALL options data for a specific ticker using marketplace endpoint with pagination"""
-        all_options = []
-        page = 1
+    def _fetch_pages(
+        self,
+        ticker: str,
+        date: Optional[str],
+        limit: int,
+        on_page: Callable[[List[Dict]], None],
+        start_page: int = 1,
+        fetched: int = 0
+    ) -> bool:
+        """
+        Page through the marketplace endpoint from start_page, handing each page to on_page
+
+        `fetched` is the number of contracts already retrieved from earlier pages. Returns
+        True when the chain was read to the end, False when it stopped early (daily budget,
+        HTTP error, timeout).
+        """
+        page = start_page
         total_contracts = 0
+        retries = 0
 
         try:
             while True:
-                # Check rate limit before each page
-                if self.api_call_count >= RATE_LIMIT * 0.95:
+                # Wait for a rate-limit token; stop once the daily budget is spent
+                if not self.limiter.acquire():
                     print(f"  ⚠️  Rate limit approaching, stopping pagination for {ticker}")
-                    break
+                    return False
 
                 # Use marketplace endpoint
                 url = f"{BASE_URL}/options/eod"
@@ -99,13 +177,7 @@ class EODHDOptionsDatasetBuilder:
                     params['filter[tradetime_from]'] = date
                     params['filter[tradetime_to]'] = date
 
-                # Make request with proper headers (EODHD blocks default Python User-Agent)
-                headers = {
-                    'User-Agent': 'curl/7.68.0',
-                    'Accept': '*/*'
-                }
-                response = requests.get(url, params=params, headers=headers, timeout=30)
-                self.api_call_count += 1
+                response = self.session.get(url, params=params, timeout=30)
 
                 if response.status_code == 200:
                     data = response.json()
@@ -121,48 +193,167 @@ class EODHDOptionsDatasetBuilder:
 
                         if not page_data:
                             # No more data
-                            break
+                            return True
 
-                        all_options.extend(page_data)
-                        total_contracts = data.get('meta', {}).get('total', len(all_options))
+                        on_page(page_data)
+                        fetched += len(page_data)
+                        total_contracts = data.get('meta', {}).get('total', fetched)
 
-                        print(f"  📄 {ticker} page {page}: {len(page_data)} contracts ({len(all_options):,}/{total_contracts:,})")
+                        print(f"  📄 {ticker} page {page}: {len(page_data)} contracts ({fetched:,}/{total_contracts:,})")
 
                         # Check if we got all data
-                        if len(all_options) >= total_contracts or len(page_data) < limit:
-                            break
+                        if fetched >= total_contracts or len(page_data) < limit:
+                            return True
 
                         page += 1
-                        time.sleep(DELAY_MS)  # Delay between pages
                     else:
-                        break
+                        return True
 
                 elif response.status_code == 404:
                     if page == 1:
                         print(f"  ⚠️  {ticker}: No options data available")
-                    break
+                    return True
                 elif response.status_code == 429:
-                    print(f"  🚫 Rate limit reached. Used {self.api_call_count} calls today.")
-                    raise Exception('Rate limit exceeded')
+                    retries += 1
+                    if retries > MAX_RETRIES:
+                        print(f"  🚫 Rate limit reached. Used {self.api_call_count} calls today.")
+                        raise Exception('Rate limit exceeded')
+                    try:
+                        backoff = float(response.headers.get('Retry-After', DEFAULT_BACKOFF_SECONDS))
+                    except ValueError:
+                        backoff = DEFAULT_BACKOFF_SECONDS
+                    print(f"  ⏳ {ticker} page {page}: HTTP 429, pausing all workers for {backoff:.0f}s")
+                    self.limiter.pause(backoff)
                 elif response.status_code == 402:
                     print(f"  🚫 Payment required - check subscription status")
                     raise Exception('Subscription issue')
                 else:
                     print(f"  ❌ {ticker} page {page}: HTTP {response.status_code}")
-                    break
-
-            if all_options:
-                print(f"  ✅ {ticker}: {len(all_options):,} total contracts retrieved")
-                return all_options
-            else:
-                return None
+                    return False
 
         except requests.exceptions.Timeout:
             print(f"  ❌ {ticker}: Request timeout")
-            return all_options if all_options else None
+            return False
         except Exception as e:
             print(f"  ❌ {ticker}: {str(e)}")
-            return all_options if all_options else None
+            return False
+
+    def get_options_data(
+        self,
+        ticker: str,
+        date: Optional[str] = None,
+        limit: int = 1000,
+        on_page: Optional[Callable[[List[Dict]], None]] = None
+    ) -> Optional[List[Dict]]:
+        """Get ALL options data for a specific ticker using marketplace endpoint with pagination
+
+        on_page, if given, receives each page of contracts as soon as it arrives.
+        Whatever was retrieved before an early stop is still returned.
+        """
+        all_options = []
+
+        def collect(page_data: List[Dict]):
+            all_options.extend(page_data)
+            if on_page is not None:
+                on_page(page_data)
+
+        self._fetch_pages(ticker, date, limit, collect)
+
+        if all_options:
+            print(f"  ✅ {ticker}: {len(all_options):,} total contracts retrieved")
+            return all_options
+        else:
+            return None
+
+    def fetch_to_parquet(self, ticker: str, date: Optional[str] = None) -> Optional[List[Dict]]:
+        """get_options_data, streaming pages into the (snapshot date, ticker) Parquet partition"""
+        writer = self.sink.writer(ticker, date or self.today)
+        try:
+            data = self.get_options_data(ticker, date, on_page=writer.write)
+            if data:
+                writer.close()
+            else:
+                writer.abort()
+            return data
+        except BaseException:
+            writer.abort()
+            raise
+
+    def fetch_resumable(self, ticker: str, cursors: PageCursorStore, date: Optional[str] = None) -> Optional[int]:
+        """
+        Fetch a snapshot page by page into a durable spool, resuming from the stored cursor
+
+        Every page is written to disk and its cursor advanced before the next request, so a
+        run that is killed, runs out of budget or hits an HTTP error / timeout mid-ticker
+        continues at the next page on restart (within the same snapshot date). Returns
+        contracts written to the Parquet partition (0 when the chain had none), or None when
+        the chain stopped early; the spooled pages and cursor are then kept for the next run.
+        """
+        snapshot_date = date or self.today
+        spool = self.sink.spool(ticker, snapshot_date)
+        next_page, fetched = cursors.cursor(ticker, snapshot_date)
+
+        # Pages written after the last recorded cursor are refetched; a lost spool restarts the chain
+        spool.truncate(next_page - 1)
+        if spool.page_count() < next_page - 1:
+            spool.discard()
+            next_page, fetched = 1, 0
+        if next_page > 1:
+            print(f"  ↩️  {ticker}: resuming at page {next_page} ({fetched:,} contracts spooled)")
+
+        pages = iter(range(next_page, sys.maxsize))
+
+        def spool_page(page_data: List[Dict]):
+            page = next(pages)
+            spool.write(page, page_data)
+            cursors.advance(ticker, snapshot_date, page + 1, len(page_data))
+
+        complete = self._fetch_pages(ticker, date, 1000, spool_page, start_page=next_page, fetched=fetched)
+        if not complete:
+            # Truncated chain: only a complete one becomes the day's snapshot
+            print(f"  ⏸️  {ticker}: chain incomplete, spooled pages kept for the next run")
+            return None
+
+        rows = spool.commit()
+        cursors.clear(ticker, snapshot_date)
+        if rows:
+            print(f"  ✅ {ticker}: {rows:,} total contracts retrieved")
+        return rows
+
+    def fetch_many(
+        self,
+        jobs: List[Tuple[str, Optional[str]]],
+        parquet: bool = False,
+        fetch: Optional[Callable[[str, Optional[str]], Any]] = None
+    ) -> Iterator[Tuple[str, Optional[str], Any]]:
+        """
+        Fetch (ticker, date) jobs concurrently, yielding (ticker, date, data) as each completes
+
+        With parquet=True each job is also written to the Parquet sink while it is fetched;
+        `fetch` replaces the per-job fetch function altogether (e.g. fetch_resumable).
+        Jobs that got no data because the daily budget ran out are not yielded, so
+        callers can leave them for the next run instead of recording a failure.
+        """
+        if fetch is None:
+            fetch = self.fetch_to_parquet if parquet else self.get_options_data
+
+        def run(job):
+            ticker, date = job
+            if self.limiter.exhausted():
+                return job, False, None
+            try:
+                data = fetch(ticker, date)
+            except Exception as e:
+                print(f"  ❌ {ticker}: {str(e)}")
+                return job, True, None
+            return job, bool(data) or not self.limiter.exhausted(), data
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(run, job) for job in jobs]
+            for future in as_completed(futures):
+                (ticker, date), started, data = future.result()
+                if started:
+                    yield ticker, date, data
 
     def save_to_json(self, ticker: str, data: List[Dict], date: str):
         """Save options data to JSON file"""
@@ -189,51 +380,56 @@ class EODHDOptionsDatasetBuilder:
             writer.writeheader()
             writer.writerows(data)
 
-    def build_dataset(self, tickers: Optional[List[str]] = None, format: str = 'both'):
+    def save(self, ticker: str, data: List[Dict], date: str, formats: List[str]):
+        """Write JSON/CSV copies of a fetched snapshot (Parquet is written while fetching)"""
+        if 'json' in formats:
+            self.save_to_json(ticker, data, date)
+        if 'csv' in formats:
+            self.save_to_csv(ticker, data, date)
+
+    def build_dataset(self, tickers: Optional[List[str]] = None, formats: List[str] = ('parquet',)):
         """Build current options dataset"""
         print('=' * 80)
         print('EODHD OPTIONS DATASET BUILDER (FIXED - Marketplace API)')
         print('=' * 80)
         print(f'\n📊 Output directory: {OUTPUT_DIR}')
-        print(f'📁 Format: {format}')
-        print(f'⚡ Daily limit: {RATE_LIMIT:,} API calls')
+        print(f'📁 Format: {", ".join(formats)}')
+        print(f'⚡ Daily limit: {RATE_LIMIT:,} API calls ({self.limiter.daily_budget:,} budgeted, {int(self.limiter.rate * 60)}/min)')
         print()
 
         # Get tickers
         if tickers is None:
             tickers = self.get_tickers_list()
 
-        today = datetime.now().strftime('%Y-%m-%d')
+        print(f'⚙️  Fetching {len(tickers)} tickers with {self.workers} workers')
 
-        for i, ticker in enumerate(tickers):
-            print(f'\n[{i+1}/{len(tickers)}] Processing {ticker}...')
-
-            # Check rate limit
-            if self.api_call_count >= RATE_LIMIT * 0.95:
-                print('\n⚠️  Approaching daily rate limit. Stopping...')
-                break
-
-            # Get data
-            data = self.get_options_data(ticker)
+        completed = 0
+        jobs = [(ticker, None) for ticker in tickers]
+        for ticker, _, data in self.fetch_many(jobs, parquet='parquet' in formats):
+            completed += 1
+            print(f'\n[{completed}/{len(tickers)}] Finished {ticker}')
 
             if data and len(data) > 0:
                 # Save data
-                if format in ['json', 'both']:
-                    self.save_to_json(ticker, data, today)
-                if format in ['csv', 'both']:
-                    self.save_to_csv(ticker, data, today)
+                self.save(ticker, data, self.today, formats)
 
                 self.success_count += 1
             else:
                 self.error_count += 1
 
-            # Rate limiting delay
-            time.sleep(DELAY_MS)
+        if completed < len(tickers):
+            print(f'\n⚠️  Approaching daily rate limit. Stopped after {completed}/{len(tickers)} tickers')
 
         # Print summary
         self.print_summary()
 
-    def build_historical_dataset(self, ticker: str, start_date: str, end_date: str):
+    def build_historical_dataset(
+        self,
+        ticker: str,
+        start_date: str,
+        end_date: str,
+        formats: List[str] = ('parquet',)
+    ):
         """Build historical dataset for a specific ticker"""
         print('=' * 80)
         print(f'BUILDING HISTORICAL DATASET FOR {ticker}')
@@ -254,23 +450,21 @@ class EODHDOptionsDatasetBuilder:
 
         print(f'📅 Processing {len(dates)} weeks\n')
 
-        for i, date in enumerate(dates):
-            if self.api_call_count >= RATE_LIMIT * 0.95:
-                print('\n⚠️  Approaching daily rate limit. Stopping...')
-                break
-
-            print(f'[{i+1}/{len(dates)}] {date}...')
-            data = self.get_options_data(ticker, date)
+        completed = 0
+        jobs = [(ticker, date) for date in dates]
+        for _, date, data in self.fetch_many(jobs, parquet='parquet' in formats):
+            completed += 1
+            print(f'[{completed}/{len(dates)}] {date}...')
 
             if data and len(data) > 0:
-                self.save_to_json(ticker, data, date)
-                self.save_to_csv(ticker, data, date)
+                self.save(ticker, data, date, formats)
                 print(f'     ✅ {len(data)} contracts saved')
                 self.success_count += 1
             else:
                 self.error_count += 1
 
-            time.sleep(DELAY_MS)
+        if completed < len(dates):
+            print(f'\n⚠️  Approaching daily rate limit. Stopped after {completed}/{len(dates)} weeks')
 
         self.print_summary()
 
@@ -288,10 +482,9 @@ class EODHDOptionsDatasetBuilder:
         print(f'📁 Files saved to: {OUTPUT_DIR}')
         print()
         print('💡 Next steps:')
-        print('  1. Convert CSV to Parquet for efficient storage')
-        print('  2. Import to PostgreSQL database')
-        print('  3. Combine with Kaggle options datasets')
-        print('  4. Build ML features from options data')
+        print('  1. Import to PostgreSQL database')
+        print('  2. Combine with Kaggle options datasets')
+        print('  3. Build ML features from options data (scripts/ml/smart-money-flow/extract-options-features.py)')
 
 
 def main():
@@ -309,8 +502,11 @@ Examples:
   # Build historical dataset
   python3 build-eodhd-options-dataset-fixed.py --historical AAPL --start 2024-01-01 --end 2024-12-31
 
-  # JSON only
-  python3 build-eodhd-options-dataset-fixed.py --format json
+  # Parquet plus the legacy JSON + CSV copies
+  python3 build-eodhd-options-dataset-fixed.py --format parquet both
+
+  # More concurrent tickers (still capped at REQUESTS_PER_MINUTE overall)
+  python3 build-eodhd-options-dataset-fixed.py --workers 16
 
   # Test with 5 tickers
   python3 build-eodhd-options-dataset-fixed.py --tickers AAPL MSFT GOOGL AMZN TSLA
@@ -318,23 +514,25 @@ Examples:
     )
 
     parser.add_argument('--tickers', nargs='+', help='List of ticker symbols')
-    parser.add_argument('--format', choices=['json', 'csv', 'both'], default='both',
-                        help='Output format (default: both)')
+    parser.add_argument('--format', nargs='+', choices=OUTPUT_FORMATS + ['both'], default=['parquet'],
+                        help='Output formats (default: parquet; both = json + csv)')
     parser.add_argument('--historical', help='Build historical dataset for this ticker')
     parser.add_argument('--start', help='Start date for historical data (YYYY-MM-DD)')
     parser.add_argument('--end', help='End date for historical data (YYYY-MM-DD)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Concurrent requests (default: {DEFAULT_WORKERS})')
 
     args = parser.parse_args()
 
-    builder = EODHDOptionsDatasetBuilder()
+    builder = EODHDOptionsDatasetBuilder(workers=args.workers)
 
     if args.historical:
         if not args.start or not args.end:
             print("❌ Error: --start and --end are required for historical data")
             return
-        builder.build_historical_dataset(args.historical, args.start, args.end)
+        builder.build_historical_dataset(args.historical, args.start, args.end, formats=expand_formats(args.format))
     else:
-        builder.build_dataset(tickers=args.tickers, format=args.format)
+        builder.build_dataset(tickers=args.tickers, formats=expand_formats(args.format))
 
 
 if __name__ == '__main__':
@@ -51,40 +51,62 @@ from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch
 import time
 from collections import defaultdict
-import statistics
+
+from sentiment_cache import SentimentCache
 
 class NewsSentimentScorer:
     """Score news sentiment using pre-trained FinBERT with batch processing"""
 
     def __init__(self, batch_size=32):
         print("📦 Loading pre-trained FinBERT model...")
-        self.tokenizer = AutoTokenizer.from_pretrained("ProsusAI/finbert")
-        self.model = AutoModelForSequenceClassification.from_pretrained("ProsusAI/finbert")
+        self.model_name = "ProsusAI/finbert"
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
         self.model.eval()
         self.batch_size = batch_size
+        self.cache = SentimentCache()
         print(f"✓ Model loaded (batch size: {batch_size})\n")
 
     def score_batch(self, texts: list) -> list:
-        """Score multiple texts in batches for better performance"""
+        """Score multiple texts, running FinBERT only on texts missing from the shared sentiment cache"""
         if not texts:
             return []
 
+        # Empty texts get the neutral placeholder
+        results = [{'score': 0.0, 'confidence': 0.0, 'label': 'neutral'} for _ in texts]
+        valid_indices = [i for i, text in enumerate(texts) if text and text.strip()]
+
+        probabilities = self.cache.score(self.model_name, [texts[i] for i in valid_indices], self.run_model)
+        for i, probs in zip(valid_indices, probabilities):
+            negative, neutral, positive = probs
+            score = positive - negative
+            confidence = max(probs)
+
+            if score > 0.2:
+                label = 'positive'
+            elif score < -0.2:
+                label = 'negative'
+            else:
+                label = 'neutral'
+
+            results[i] = {
+                'score': round(score, 4),
+                'confidence': round(confidence, 4),
+                'label': label
+            }
+
+        return results
+
+    def run_model(self, texts: list) -> list:
+        """[negative, neutral, positive] probabilities per text, in batches for better performance"""
         results = []
 
         # Process in batches
         for i in range(0, len(texts), self.batch_size):
             batch = texts[i:i + self.batch_size]
 
-            # Filter empty texts
-            valid_indices = [j for j, text in enumerate(batch) if text and text.strip()]
-            valid_texts = [batch[j] for j in valid_indices]
-
-            if not valid_texts:
-                results.extend([{'score': 0.0, 'confidence': 0.0, 'label': 'neutral'}] * len(batch))
-                continue
-
             # Tokenize batch
-            inputs = self.tokenizer(valid_texts, return_tensors="pt", truncation=True,
+            inputs = self.tokenizer(batch, return_tensors="pt", truncation=True,
                                    max_length=512, padding=True)
 
             # Inference
@@ -92,33 +114,7 @@ class NewsSentimentScorer:
                 outputs = self.model(**inputs)
                 probabilities = torch.softmax(outputs.logits, dim=-1)
 
-            # Process results
-            batch_results = []
-            valid_idx = 0
-            for j in range(len(batch)):
-                if j in valid_indices:
-                    probs = probabilities[valid_idx].tolist()
-                    negative, neutral, positive = probs
-                    score = positive - negative
-                    confidence = max(probs)
-
-                    if score > 0.2:
-                        label = 'positive'
-                    elif score < -0.2:
-                        label = 'negative'
-                    else:
-                        label = 'neutral'
-
-                    batch_results.append({
-                        'score': round(score, 4),
-                        'confidence': round(confidence, 4),
-                        'label': label
-                    })
-                    valid_idx += 1
-                else:
-                    batch_results.append({'score': 0.0, 'confidence': 0.0, 'label': 'neutral'})
-
-            results.extend(batch_results)
+            results.extend(probabilities.tolist())
 
         return results
 
@@ -188,83 +184,85 @@ class PolygonNewsClient:
             print(f"      ⚠️  Error fetching news for {symbol}: {e}", file=sys.stderr)
             return []
 
-    def get_news_for_date(self, symbol: str, target_date: datetime, all_news: list, days_back: int = 30) -> list:
-        """Filter cached news to specific date window"""
-        end_date = target_date
-        start_date = end_date - timedelta(days=days_back)
+class SentimentFeatureCalculator:
+    """Calculate 5 sentiment features from scored articles"""
+
+    WINDOW_24H = np.timedelta64(24, 'h')
+    WINDOW_7D = np.timedelta64(7, 'D')
+    WINDOW_30D = np.timedelta64(30, 'D')
+    MIN_MOMENTUM_ARTICLES = 4  # 7-day articles needed before momentum is non-zero
+    SCORE_SCALE = 10_000  # Sentiment scores carry 4 decimals
 
-        filtered = []
+    @staticmethod
+    def build_timeline(all_news: list, article_sentiments: dict) -> tuple:
+        """
+        Scored articles for one symbol → (publish times, scores), oldest first
+
+        Each publish time is parsed once here rather than once per (symbol, date).
+        Articles without a parseable time or a cached sentiment are dropped; articles
+        published at the same instant keep their fetch order, newest-first, as the
+        momentum split expects.
+        """
+        published = []
+        scores = []
         for article in all_news:
+            article_id = article.get('id', article.get('published_utc', ''))
+            sentiment = article_sentiments.get(article_id)
+            if not sentiment:
+                continue
             try:
                 pub_date = datetime.fromisoformat(article['published_utc'].replace('Z', '+00:00'))
-                pub_date = pub_date.replace(tzinfo=None)
-
-                if start_date <= pub_date <= end_date:
-                    filtered.append(article)
-            except:
+            except (KeyError, AttributeError, TypeError, ValueError):
                 continue
+            published.append(pub_date.replace(tzinfo=None))
+            scores.append(sentiment['score'])
 
-        return filtered
+        published = np.array(published, dtype='datetime64[us]')
+        scores = np.array(scores, dtype=np.float64)
+        order = np.lexsort((-np.arange(len(published)), published))
+        return published[order], scores[order]
 
-class SentimentFeatureCalculator:
-    """Calculate 5 sentiment features from scored articles"""
-
-    @staticmethod
-    def calculate_features(scored_articles: list, target_date: datetime) -> dict:
-        """Generate 5 numerical features from scored articles"""
-        if not scored_articles:
-            return {
-                'news_sentiment_24h': 0.0,
-                'news_sentiment_7d': 0.0,
-                'news_sentiment_30d': 0.0,
-                'news_sentiment_momentum': 0.0,
-                'news_volume_24h': 0
-            }
+    @classmethod
+    def calculate_features(cls, published: np.ndarray, scores: np.ndarray, target_dates: np.ndarray) -> pd.DataFrame:
+        """
+        Generate the 5 numerical features for every target date of one symbol at once
 
-        # Parse dates
-        for article in scored_articles:
-            try:
-                article['datetime'] = datetime.fromisoformat(article['published'].replace('Z', '+00:00'))
-                article['hours_ago'] = (target_date - article['datetime'].replace(tzinfo=None)).total_seconds() / 3600
-            except:
-                article['hours_ago'] = 999  # Very old
-
-        scored_articles.sort(key=lambda x: x['hours_ago'])
-
-        # Filter by time windows
-        articles_24h = [a for a in scored_articles if a['hours_ago'] <= 24 and a['hours_ago'] >= 0]
-        articles_7d = [a for a in scored_articles if a['hours_ago'] <= 168 and a['hours_ago'] >= 0]  # 7 days
-        articles_30d = [a for a in scored_articles if a['hours_ago'] <= 720 and a['hours_ago'] >= 0]  # 30 days
-
-        # Calculate averages
-        def avg_score(articles):
-            if not articles:
-                return 0.0
-            return statistics.mean([a['score'] for a in articles])
-
-        sentiment_24h = avg_score(articles_24h)
-        sentiment_7d = avg_score(articles_7d)
-        sentiment_30d = avg_score(articles_30d)
-
-        # Calculate momentum (7-day trend)
-        if len(articles_7d) >= 4:
-            mid_point = len(articles_7d) // 2
-            recent_half = articles_7d[:mid_point]  # More recent
-            older_half = articles_7d[mid_point:]   # Older
-
-            recent_avg = avg_score(recent_half)
-            older_avg = avg_score(older_half)
-            momentum = recent_avg - older_avg
-        else:
-            momentum = 0.0
-
-        return {
-            'news_sentiment_24h': round(sentiment_24h, 4),
-            'news_sentiment_7d': round(sentiment_7d, 4),
-            'news_sentiment_30d': round(sentiment_30d, 4),
-            'news_sentiment_momentum': round(momentum, 4),
-            'news_volume_24h': len(articles_24h)
-        }
+        `published` / `scores` come from build_timeline(); `target_dates` are the
+        feature timestamps (end of each trading day). Window sums come from score
+        prefix sums, window bounds from searchsorted; a window covers articles
+        published in [target - window, target].
+        """
+        target_dates = np.asarray(target_dates, dtype='datetime64[us]')
+        # Scores are stored rounded to 4 decimals, so integer prefix sums give exact window sums
+        units = np.rint(np.asarray(scores) * cls.SCORE_SCALE).astype(np.int64)
+        cumulative = np.concatenate(([0], np.cumsum(units)))
+
+        end = np.searchsorted(published, target_dates, side='right')
+        start_24h = np.searchsorted(published, target_dates - cls.WINDOW_24H, side='left')
+        start_7d = np.searchsorted(published, target_dates - cls.WINDOW_7D, side='left')
+        start_30d = np.searchsorted(published, target_dates - cls.WINDOW_30D, side='left')
+
+        def avg_score(start, stop):
+            count = stop - start
+            total = cumulative[stop] - cumulative[start]
+            return np.divide(total, count * cls.SCORE_SCALE, out=np.zeros(len(count)), where=count > 0)
+
+        # Momentum (7-day trend): newer half minus older half of the 7-day articles
+        count_7d = end - start_7d
+        mid_point = end - count_7d // 2
+        momentum = np.where(
+            count_7d >= cls.MIN_MOMENTUM_ARTICLES,
+            avg_score(mid_point, end) - avg_score(start_7d, mid_point),
+            0.0
+        )
+
+        return pd.DataFrame({
+            'news_sentiment_24h': avg_score(start_24h, end).round(4),
+            'news_sentiment_7d': avg_score(start_7d, end).round(4),
+            'news_sentiment_30d': avg_score(start_30d, end).round(4),
+            'news_sentiment_momentum': momentum.round(4),
+            'news_volume_24h': end - start_24h
+        })
 
 def add_sentiment_features_to_dataset(input_file: str, output_file: str):
     """Add sentiment features to existing dataset"""
@@ -401,58 +399,24 @@ def add_sentiment_features_to_dataset(input_file: str, output_file: str):
     print(f"📊 Processing {len(unique_pairs)} unique (symbol, date) pairs")
     print()
 
-    # Cache for sentiment features
-    feature_cache = {}
-
-    # Process each unique pair
-    for idx, (_, row) in enumerate(unique_pairs.iterrows()):
-        symbol = row['symbol']
-        date_str = row['date']
-        # Set to end of day so articles published same day aren't filtered out
-        target_date = datetime.strptime(date_str, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
-
-        cache_key = f"{symbol}_{date_str}"
+    # All dates of a symbol are evaluated in one vectorized call over its article timeline
+    feature_frames = []
+    for idx, (symbol, dates) in enumerate(unique_pairs.groupby('symbol', sort=False)['date'], 1):
+        if idx % 10 == 0:
+            print(f"   [{idx}/{len(unique_symbols)}] Aggregating {symbol} ({len(dates)} dates)...")
 
-        if (idx + 1) % 1000 == 0:
-            print(f"   [{idx+1}/{len(unique_pairs)}] Aggregating {symbol} @ {date_str}...")
+        # Cached news + sentiments for this symbol (NO API CALL, NO FINBERT!)
+        published, scores = calculator.build_timeline(
+            symbol_news_cache.get(symbol, []), symbol_sentiment_cache.get(symbol, {})
+        )
 
-        # Get cached news for this symbol
-        all_news = symbol_news_cache.get(symbol, [])
-
-        # Filter to relevant date window (NO API CALL!)
-        articles = news_client.get_news_for_date(symbol, target_date, all_news, days_back=30)
-
-        if not articles:
-            # No news, use default values
-            feature_cache[cache_key] = {
-                'news_sentiment_24h': 0.0,
-                'news_sentiment_7d': 0.0,
-                'news_sentiment_30d': 0.0,
-                'news_sentiment_momentum': 0.0,
-                'news_volume_24h': 0
-            }
-            continue
-
-        # Get sentiment cache for this symbol
-        article_sentiments = symbol_sentiment_cache.get(symbol, {})
-
-        # Combine cached sentiments with article metadata
-        scored = []
-        for article in articles:
-            article_id = article.get('id', article.get('published_utc', ''))
-            sentiment = article_sentiments.get(article_id)
-
-            if sentiment:
-                scored.append({
-                    'score': sentiment['score'],
-                    'confidence': sentiment['confidence'],
-                    'label': sentiment['label'],
-                    'published': article['published_utc']
-                })
+        # Set to end of day so articles published same day aren't filtered out
+        target_dates = pd.to_datetime(dates, format='%Y-%m-%d').values + np.timedelta64(86399, 's')
 
-        # Calculate features (NO FINBERT!)
-        features = calculator.calculate_features(scored, target_date)
-        feature_cache[cache_key] = features
+        features = calculator.calculate_features(published, scores, target_dates)
+        features.insert(0, 'symbol', symbol)
+        features.insert(1, 'date', dates.values)
+        feature_frames.append(features)
 
     print()
     print("✅ Sentiment feature calculation complete")
@@ -460,11 +424,8 @@ def add_sentiment_features_to_dataset(input_file: str, output_file: str):
 
     # Add sentiment features to dataframe
     print("📝 Adding features to dataframe...")
-    df['news_sentiment_24h'] = df.apply(lambda row: feature_cache.get(f"{row['symbol']}_{row['date']}", {}).get('news_sentiment_24h', 0.0), axis=1)
-    df['news_sentiment_7d'] = df.apply(lambda row: feature_cache.get(f"{row['symbol']}_{row['date']}", {}).get('news_sentiment_7d', 0.0), axis=1)
-    df['news_sentiment_30d'] = df.apply(lambda row: feature_cache.get(f"{row['symbol']}_{row['date']}", {}).get('news_sentiment_30d', 0.0), axis=1)
-    df['news_sentiment_momentum'] = df.apply(lambda row: feature_cache.get(f"{row['symbol']}_{row['date']}", {}).get('news_sentiment_momentum', 0.0), axis=1)
-    df['news_volume_24h'] = df.apply(lambda row: feature_cache.get(f"{row['symbol']}_{row['date']}", {}).get('news_volume_24h', 0), axis=1)
+    feature_df = pd.concat(feature_frames, ignore_index=True)
+    df = df.drop(columns=feature_df.columns[2:], errors='ignore').merge(feature_df, on=['symbol', 'date'], how='left')
 
     # Save enhanced dataset
     print(f"💾 Saving enhanced dataset: {output_file}")
@@ -520,6 +481,7 @@ def add_sentiment_features_to_dataset(input_file: str, output_file: str):
     print()
     print("  Sentiment Cache: data/cache/sentiment/")
     print("    - FinBERT scores cached per symbol")
+    print("    - Shared content-hash cache (all FinBERT scripts): finbert-cache.sqlite")
     print("    - Each article scored EXACTLY ONCE")
     print("    - Clear: rm -rf data/cache/sentiment/")
     print()
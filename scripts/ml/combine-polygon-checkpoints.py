@@ -1,63 +1,58 @@
 #!/usr/bin/env python3
 """
 Combine Polygon news checkpoint files into a single dataset.
-Removes duplicates and sorts by published date.
+
+Checkpoints are upserted into the deduplicating article store
+(data/training/polygon_news, see polygon_article_store.py) once each; overlapping
+rows cost an index lookup and take no extra disk. The year's dataset is then
+exported from the store, sorted by published date. Articles harvested straight
+into the store need no combining at all: this only re-exports them.
 """
 
 import pandas as pd
 import glob
 import os
 
-def combine_checkpoints(pattern: str, output_file: str):
-    """Combine checkpoint files matching the pattern."""
+from polygon_article_store import DEFAULT_STORE_DIR, EXPORT_COLUMNS, ArticleStore
 
-    # Find all checkpoint files
-    checkpoint_files = sorted(glob.glob(pattern))
+def combine_checkpoints(pattern: str, year: int, output_file: str):
+    """Import checkpoint files matching the pattern, then export the year from the store."""
 
-    if not checkpoint_files:
-        print(f"❌ No checkpoint files found matching: {pattern}")
-        return
+    store = ArticleStore(DEFAULT_STORE_DIR)
 
-    print(f"📊 Found {len(checkpoint_files)} checkpoint files")
-    print(f"   First: {os.path.basename(checkpoint_files[0])}")
-    print(f"   Last:  {os.path.basename(checkpoint_files[-1])}")
+    # Find all checkpoint files
+    checkpoint_files = sorted(glob.glob(pattern))
 
-    # Read and combine all checkpoints
-    dfs = []
-    total_rows = 0
+    if checkpoint_files:
+        print(f"📊 Found {len(checkpoint_files)} checkpoint files")
+        print(f"   First: {os.path.basename(checkpoint_files[0])}")
+        print(f"   Last:  {os.path.basename(checkpoint_files[-1])}")
+    else:
+        print(f"ℹ️  No checkpoint files found matching: {pattern} (exporting from the store)")
 
     for i, file in enumerate(checkpoint_files, 1):
+        if store.is_imported(file):
+            print(f"   [{i}/{len(checkpoint_files)}] {os.path.basename(file)}: already imported")
+            continue
         try:
-            df = pd.read_csv(file)
-            rows = len(df)
-            total_rows += rows
-            dfs.append(df)
-            print(f"   [{i}/{len(checkpoint_files)}] {os.path.basename(file)}: {rows:,} rows")
+            new_articles, new_links = store.import_csv(file)
+            print(f"   [{i}/{len(checkpoint_files)}] {os.path.basename(file)}: "
+                  f"{new_articles:,} new articles, {new_links:,} new ticker links")
         except Exception as e:
             print(f"   ⚠️  Error reading {file}: {e}")
 
-    if not dfs:
-        print("❌ No data to combine")
-        return
-
-    # Combine all dataframes
-    print("\n🔄 Combining datasets...")
-    combined_df = pd.concat(dfs, ignore_index=True)
-    print(f"   Total rows before deduplication: {len(combined_df):,}")
+    articles, links = store.counts()
+    print(f"\n🗄️  Store: {articles:,} unique articles, {links:,} ticker links")
 
-    # Remove duplicates (same ticker + published_utc + title)
-    print("🔄 Removing duplicates...")
-    before_dedup = len(combined_df)
-    combined_df = combined_df.drop_duplicates(subset=['ticker', 'published_utc', 'title'], keep='last')
-    after_dedup = len(combined_df)
-    duplicates_removed = before_dedup - after_dedup
-    print(f"   Removed {duplicates_removed:,} duplicates")
-    print(f"   Final row count: {after_dedup:,}")
+    combined_df = store.read(years=[year], columns=EXPORT_COLUMNS)
+    if len(combined_df) == 0:
+        print(f"❌ No {year} articles in the store")
+        return
 
     # Sort by published date
     print("🔄 Sorting by published date...")
     combined_df['published_utc'] = pd.to_datetime(combined_df['published_utc'])
-    combined_df = combined_df.sort_values('published_utc')
+    combined_df = combined_df.sort_values('published_utc', kind='stable')
 
     # Save combined dataset
     print(f"\n💾 Saving to {output_file}...")
@@ -79,6 +74,7 @@ if __name__ == '__main__':
     # Combine checkpoints for specified year
     combine_checkpoints(
         pattern=f'data/training/polygon_news_{year}_checkpoint_*.csv',
+        year=int(year),
         output_file=f'data/training/polygon_news_{year}.csv'
     )
 
@@ -2,12 +2,16 @@
 """
 Combine Polygon News Datasets (2023, 2024, 2025)
 
-Merges three yearly Polygon news datasets into a single consolidated file.
+Exports the 2023-2025 articles of the deduplicating article store
+(data/training/polygon_news, see polygon_article_store.py) as one file with a
+row per unique article. Yearly CSVs not yet in the store are upserted first (each
+only once), so with harvested data this is a plain export.
 
 Input:
-  - data/training/polygon_news_2023.csv (~109,906 articles)
-  - data/training/polygon_news_2024.csv (~40MB)
-  - data/training/polygon_news_2025.csv (~24,775 articles)
+  - data/training/polygon_news/ (article store)
+  - data/training/polygon_news_2023.csv (~109,906 articles, imported once)
+  - data/training/polygon_news_2024.csv (~40MB, imported once)
+  - data/training/polygon_news_2025.csv (~24,775 articles, imported once)
 
 Output:
   - data/training/polygon_news_combined_2023-2025.csv (~135,000+ articles)
@@ -20,6 +24,8 @@ import pandas as pd
 import os
 from datetime import datetime
 
+from polygon_article_store import DEFAULT_STORE_DIR, EXPORT_COLUMNS, ArticleStore
+
 def combine_polygon_datasets():
     """Combine 2023, 2024, 2025 Polygon news datasets"""
 
@@ -35,55 +41,37 @@ def combine_polygon_datasets():
         '2025': 'data/training/polygon_news_2025.csv'
     }
 
-    # Load each dataset
-    dataframes = []
-    total_articles = 0
+    store = ArticleStore(DEFAULT_STORE_DIR)
 
+    # Bring in yearly files that predate the store (skipped once imported)
     for year, filepath in files.items():
-        print(f"📂 Loading {year} dataset...")
-
         if not os.path.exists(filepath):
-            print(f"   ⚠️  File not found: {filepath}")
-            print(f"   Skipping {year}")
             continue
-
-        df = pd.read_csv(filepath)
-        print(f"   ✓ Loaded {len(df):,} articles")
-        print(f"   Columns: {list(df.columns)}")
-        print(f"   Date range: {df['published_utc'].min() if 'published_utc' in df.columns else 'N/A'} to {df['published_utc'].max() if 'published_utc' in df.columns else 'N/A'}")
-        print(f"   Unique tickers: {df['ticker'].nunique() if 'ticker' in df.columns else 'N/A'}")
+        if store.is_imported(filepath):
+            print(f"📂 {year} dataset already in the store")
+            continue
+        print(f"📂 Importing {year} dataset...")
+        new_articles, new_links = store.import_csv(filepath)
+        print(f"   ✓ {new_articles:,} new articles, {new_links:,} new ticker links")
         print()
 
-        dataframes.append(df)
-        total_articles += len(df)
-
-    # Combine all dataframes
-    print("🔗 Combining datasets...")
-    df_combined = pd.concat(dataframes, ignore_index=True)
-
-    print(f"   ✓ Combined {len(df_combined):,} total articles")
-    print()
-
-    # Remove duplicates (same article might appear in multiple years)
-    print("🧹 Removing duplicate articles...")
-    initial_count = len(df_combined)
-
-    # Drop duplicates based on article_url (most reliable unique identifier)
-    if 'article_url' in df_combined.columns:
-        df_combined = df_combined.drop_duplicates(subset=['article_url'], keep='first')
-    elif 'published_utc' in df_combined.columns and 'ticker' in df_combined.columns and 'title' in df_combined.columns:
-        # Fallback: use combination of published_utc, ticker, title
-        df_combined = df_combined.drop_duplicates(subset=['published_utc', 'ticker', 'title'], keep='first')
-
-    duplicates_removed = initial_count - len(df_combined)
-    print(f"   ✓ Removed {duplicates_removed:,} duplicates")
-    print(f"   Final count: {len(df_combined):,} unique articles")
+    # Scan the store month by month; each article lives in one month, so keeping its
+    # first ticker link per batch leaves one row per unique article
+    print("🔗 Reading articles from the store...")
+    years = sorted(files)
+    batches = [
+        batch.drop_duplicates(subset=['article_id'], keep='first')[EXPORT_COLUMNS]
+        for batch in store.scan(start=f'{years[0]}-01', end=f'{years[-1]}-12')
+    ]
+    df_combined = pd.concat(batches, ignore_index=True) if batches else pd.DataFrame(columns=EXPORT_COLUMNS)
+    articles, links = store.counts()
+    print(f"   ✓ {len(df_combined):,} unique articles ({articles:,} articles / {links:,} ticker links in store)")
     print()
 
     # Sort by published date
     if 'published_utc' in df_combined.columns:
         print("📅 Sorting by published date...")
-        # Handle mixed date formats (2023: ISO8601 with Z, 2024: space-separated with +00:00, 2025: ISO8601 with Z)
+        # The store normalizes every source's format (ISO8601 with Z, space-separated with +00:00) to ISO8601 UTC
         df_combined['published_utc'] = pd.to_datetime(df_combined['published_utc'], format='mixed', utc=True)
         df_combined = df_combined.sort_values('published_utc')
         print(f"   ✓ Sorted chronologically")
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Indexed Company-Name Matcher for CUSIP → Ticker Mapping
+
+Shared by parse-sec-13f.py and build-real-cusip-mapping.py. Company titles from
+company_tickers.json are normalized once and indexed by character trigrams, so
+each lookup only scores titles that share trigrams with the query instead of
+running difflib against every title:
+
+- exact(): dictionary lookup on the title as given
+- best_ratio(): highest SequenceMatcher ratio above a threshold, scoring only the
+  titles with the most trigrams in common (a >0.9 ratio implies heavy overlap)
+- containment(): first title whose normalized name contains, or is contained in,
+  the normalized query. Containment implies every trigram of the shorter name is
+  shared, so the candidate filter is exact.
+
+Resolved CUSIPs persist as Parquet (cusip, ticker, company_name, rule, universe;
+ticker '' when unmatched). Each script keeps its own file and names its match
+rule; a row is only reused by a run with the same rule, the same ticker universe
+(ticker_universe_version() of the company_tickers entries) and the same issuer
+name, so unmatched CUSIPs are retried whenever company_tickers gains titles.
+"""
+
+import hashlib
+import json
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+DEFAULT_MAPPING_PATH = Path('data/smart_money_features/cusip_ticker_mapping.parquet')
+# Titles scored with SequenceMatcher per best_ratio() lookup
+MAX_RATIO_CANDIDATES = 50
+# Minimum trigram Dice overlap for a title to be scored at all
+MIN_TRIGRAM_DICE = 0.5
+
+CusipMapping = Dict[str, Tuple[str, str]]
+MAPPING_COLUMNS = ['cusip', 'ticker', 'company_name', 'rule', 'universe']
+
+
+def normalize_company_name(name: str) -> str:
+    """Normalize company name for matching"""
+    # Remove common suffixes
+    name = name.upper().strip()
+    name = re.sub(r'\s+(INC|CORP|LTD|LLC|CO|COMPANY|CORPORATION|INCORPORATED|LIMITED)\.?$', '', name)
+    name = re.sub(r'\s+', ' ', name)  # Normalize whitespace
+    return name.strip()
+
+
+def ticker_universe_version(entries: Iterable[Tuple[str, str]]) -> str:
+    """Fingerprint of the (company title, ticker) pairs a CompanyNameMatcher is built from"""
+    digest = hashlib.sha256(json.dumps(list(entries), separators=(',', ':')).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _TrigramIndex:
+    """Inverted index from character trigram to the ids of the texts containing it"""
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.sizes = np.zeros(len(texts), dtype=np.int64)
+        postings = defaultdict(list)
+        for i, text in enumerate(texts):
+            grams = _trigrams(text)
+            self.sizes[i] = len(grams)
+            for gram in grams:
+                postings[gram].append(i)
+        self.postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+    def shared_counts(self, text: str) -> Tuple[int, np.ndarray]:
+        """(distinct trigrams in text, per-text count of those trigrams it contains)"""
+        grams = _trigrams(text)
+        hits = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not hits:
+            return len(grams), np.zeros(len(self.texts), dtype=np.int64)
+        return len(grams), np.bincount(np.concatenate(hits), minlength=len(self.texts))
+
+
+class CompanyNameMatcher:
+    def __init__(self, entries: Iterable[Tuple[str, str]]):
+        """
+        Args:
+            entries: (company title, ticker) pairs in priority order; for duplicate
+                     titles the last ticker wins exact lookups, as with dict assignment,
+                     while fuzzy lookups prefer earlier entries on ties
+        """
+        entries = list(entries)
+        self.titles = [title for title, _ in entries]
+        self.tickers = [ticker for _, ticker in entries]
+        self.by_title = {title: ticker for title, ticker in entries}
+        self.normalized = [normalize_company_name(title) for title in self.titles]
+        self._title_index: Optional[_TrigramIndex] = None
+        self._normalized_index: Optional[_TrigramIndex] = None
+
+    def exact(self, name: str) -> Optional[str]:
+        return self.by_title.get(name)
+
+    def best_ratio(self, name: str, threshold: float = 0.9) -> Optional[str]:
+        """Ticker of the title with the highest SequenceMatcher ratio to name, if above threshold"""
+        if self._title_index is None:
+            self._title_index = _TrigramIndex(self.titles)
+        index = self._title_index
+
+        query_size, shared = index.shared_counts(name)
+        if query_size == 0:
+            return None
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dice = 2 * shared / (query_size + index.sizes)
+        candidates = np.flatnonzero(dice >= MIN_TRIGRAM_DICE)
+        if len(candidates) > MAX_RATIO_CANDIDATES:
+            top = np.argpartition(-dice[candidates], MAX_RATIO_CANDIDATES)[:MAX_RATIO_CANDIDATES]
+            candidates = np.sort(candidates[top])
+
+        best_match = None
+        best_ratio = 0
+        for i in candidates:
+            ratio = SequenceMatcher(None, name, self.titles[i]).ratio()
+            if ratio > best_ratio:
+                best_ratio = ratio
+                best_match = self.tickers[i]
+
+        return best_match if best_ratio > threshold else None
+
+    def containment(self, name: str) -> Optional[str]:
+        """Ticker of the first title whose normalized name contains or is contained in name's"""
+        if self._normalized_index is None:
+            self._normalized_index = _TrigramIndex(self.normalized)
+        index = self._normalized_index
+
+        query = normalize_company_name(name)
+        query_size, shared = index.shared_counts(query)
+        # Title inside query: all of the title's trigrams shared; query inside title: all of the query's
+        candidates = np.flatnonzero((shared == index.sizes) | (shared == query_size))
+        for i in candidates:
+            title = self.normalized[i]
+            if query in title or title in query:
+                return self.tickers[i]
+        return None
+
+
+def load_cusip_mapping(path: Union[str, Path], rule: str, universe: str) -> CusipMapping:
+    """
+    Persisted CUSIP → (ticker, company_name) resolved with `rule` against ticker
+    universe `universe`; rows from another rule or universe (or a file written
+    before rows carried them) are not returned, so those CUSIPs are matched again
+    """
+    path = Path(path)
+    if not path.exists():
+        return {}
+    if not set(MAPPING_COLUMNS) <= set(pq.read_schema(path).names):
+        return {}
+    df = pd.read_parquet(path, columns=MAPPING_COLUMNS)
+    df = df[(df['rule'] == rule) & (df['universe'] == universe)]
+    return {
+        str(cusip): ('' if pd.isna(ticker) else str(ticker), '' if pd.isna(name) else str(name))
+        for cusip, ticker, name in zip(df['cusip'], df['ticker'], df['company_name'])
+    }
+
+
+def save_cusip_mapping(mapping: CusipMapping, path: Union[str, Path], rule: str, universe: str) -> pd.DataFrame:
+    """Write CUSIP → (ticker, company_name), tagged with its match rule and ticker universe; returns the frame"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df = pd.DataFrame(
+        [(cusip, ticker, name) for cusip, (ticker, name) in mapping.items()],
+        columns=['cusip', 'ticker', 'company_name']
+    )
+    df['rule'] = rule
+    df['universe'] = universe
+    df.to_parquet(path, index=False, compression='snappy')
+    return df
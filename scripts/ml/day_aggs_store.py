@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Symbol-Major Columnar Store for Polygon Day-Aggregate Flat Files
+
+Converts datasets/polygon-flat-files/day_aggs/YYYY-MM-DD.csv.gz (one file per
+trading day, every ticker) into one NumPy array per column, sorted by
+(ticker, date), plus an offset table per ticker:
+
+    <store>/symbols.npy    sorted ticker symbols
+    <store>/offsets.npy    rows of symbols[i] are offsets[i]:offsets[i + 1]
+    <store>/date.npy       datetime64[D]
+    <store>/open.npy, high.npy, low.npy, close.npy, volume.npy   float64
+    <store>/manifest.json  source files the store was built from
+
+Arrays are memory-mapped on open, so a date-range lookup for any symbol is a
+dict lookup, a binary search over that symbol's dates and a slice, with no CSV
+parsing. The store is rebuilt when the set of source files changes.
+
+Usage:
+    python3 scripts/ml/day_aggs_store.py                       # build/refresh default store
+    python3 scripts/ml/day_aggs_store.py --source DIR --store DIR
+
+    store = DayAggsStore.open_or_build('datasets/polygon-flat-files/day_aggs')
+    bars = store.bars('AAPL', '2024-01-02', '2024-01-23')
+"""
+
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+STORE_SUFFIX = '_columnar'
+DateLike = Union[str, datetime, np.datetime64, pd.Timestamp]
+
+
+def default_store_dir(source_dir: Union[str, Path]) -> Path:
+    """Store location next to the flat files (day_aggs -> day_aggs_columnar)"""
+    source_dir = Path(source_dir)
+    return source_dir.parent / f'{source_dir.name}{STORE_SUFFIX}'
+
+
+def source_manifest(source_dir: Union[str, Path]) -> Dict[str, int]:
+    """Source file name -> size, used to detect new or replaced day files"""
+    return {f.name: f.stat().st_size for f in sorted(Path(source_dir).glob('*.csv.gz'))}
+
+
+def _to_day(value: DateLike) -> np.datetime64:
+    return np.datetime64(pd.Timestamp(value).date(), 'D')
+
+
+class DayAggsStore:
+    def __init__(self, store_dir: Union[str, Path]):
+        """Open an existing store (arrays are memory-mapped read-only)"""
+        self.store_dir = Path(store_dir)
+        symbols = np.load(self.store_dir / 'symbols.npy')
+        self.offsets = np.load(self.store_dir / 'offsets.npy')
+        self.dates = np.load(self.store_dir / 'date.npy', mmap_mode='r')
+        self.columns = {
+            name: np.load(self.store_dir / f'{name}.npy', mmap_mode='r')
+            for name in PRICE_COLUMNS
+        }
+        self.symbol_index = {symbol: i for i, symbol in enumerate(symbols.tolist())}
+
+    @staticmethod
+    def build(source_dir: Union[str, Path], store_dir: Union[str, Path, None] = None) -> Path:
+        """Convert every day file in source_dir into a columnar store; returns the store dir"""
+        source_dir = Path(source_dir)
+        store_dir = Path(store_dir) if store_dir else default_store_dir(source_dir)
+        files = sorted(source_dir.glob('*.csv.gz'))
+        print(f"🏗️  Building columnar day_aggs store from {len(files)} files → {store_dir}")
+
+        frames = []
+        for i, path in enumerate(files, 1):
+            day = np.datetime64(path.name[:10], 'D')
+            df = pd.read_csv(path, compression='gzip', usecols=['ticker'] + PRICE_COLUMNS)
+            df['date'] = day
+            frames.append(df)
+            if i % 50 == 0:
+                print(f"  [{i}/{len(files)}] files read")
+
+        if frames:
+            data = pd.concat(frames, ignore_index=True)
+        else:
+            data = pd.DataFrame({'ticker': [], 'date': np.array([], dtype='datetime64[D]'),
+                                 **{c: [] for c in PRICE_COLUMNS}})
+        data = data.dropna(subset=['ticker'])
+        data['ticker'] = data['ticker'].astype(str)
+        # One bar per (ticker, date); stable sort keeps the first occurrence in file order
+        data = data.sort_values(['ticker', 'date'], kind='stable')
+        data = data.drop_duplicates(subset=['ticker', 'date'], keep='first')
+
+        tickers = data['ticker'].to_numpy()
+        symbols, starts = np.unique(tickers, return_index=True)
+        offsets = np.append(starts, len(tickers)).astype(np.int64)
+
+        # Write into a temp dir, then swap, so readers never see a half-built store
+        tmp_dir = store_dir.with_name(store_dir.name + '.tmp')
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        np.save(tmp_dir / 'symbols.npy', symbols.astype(str))
+        np.save(tmp_dir / 'offsets.npy', offsets)
+        np.save(tmp_dir / 'date.npy', data['date'].to_numpy().astype('datetime64[D]'))
+        for name in PRICE_COLUMNS:
+            np.save(tmp_dir / f'{name}.npy', data[name].to_numpy(dtype=np.float64))
+        with open(tmp_dir / 'manifest.json', 'w') as f:
+            json.dump({
+                'built_at': datetime.now().isoformat(),
+                'rows': int(len(data)),
+                'symbols': int(len(symbols)),
+                'files': source_manifest(source_dir)
+            }, f)
+
+        if store_dir.exists():
+            old_dir = store_dir.with_name(store_dir.name + '.old')
+            os.replace(store_dir, old_dir)
+            os.replace(tmp_dir, store_dir)
+            for leftover in old_dir.iterdir():
+                leftover.unlink()
+            old_dir.rmdir()
+        else:
+            os.replace(tmp_dir, store_dir)
+
+        print(f"  ✅ {len(data):,} bars for {len(symbols):,} symbols")
+        return store_dir
+
+    @staticmethod
+    def is_current(source_dir: Union[str, Path], store_dir: Union[str, Path]) -> bool:
+        """True if store_dir was built from exactly the files now in source_dir"""
+        manifest_path = Path(store_dir) / 'manifest.json'
+        if not manifest_path.exists():
+            return False
+        with open(manifest_path, 'r') as f:
+            built_from = json.load(f).get('files', {})
+        return built_from == source_manifest(source_dir)
+
+    @classmethod
+    def open_or_build(cls, source_dir: Union[str, Path], store_dir: Union[str, Path, None] = None) -> 'DayAggsStore':
+        """Open the store for source_dir, (re)building it first if missing or stale"""
+        store_dir = Path(store_dir) if store_dir else default_store_dir(source_dir)
+        if not cls.is_current(source_dir, store_dir):
+            cls.build(source_dir, store_dir)
+        return cls(store_dir)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.symbol_index
+
+    def symbols(self) -> List[str]:
+        return list(self.symbol_index.keys())
+
+    def _slice(self, symbol: str, start: Optional[DateLike], end: Optional[DateLike]) -> Optional[slice]:
+        i = self.symbol_index.get(symbol)
+        if i is None:
+            return None
+        lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+        dates = self.dates[lo:hi]
+        first = lo + (int(np.searchsorted(dates, _to_day(start), side='left')) if start is not None else 0)
+        last = lo + (int(np.searchsorted(dates, _to_day(end), side='right')) if end is not None else hi - lo)
+        return slice(first, last)
+
+    def bars(
+        self,
+        symbol: str,
+        start: Optional[DateLike] = None,
+        end: Optional[DateLike] = None
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Bars for symbol with start <= date <= end (inclusive, either bound optional)
+
+        Returns {'date': datetime64[D], 'open', 'high', 'low', 'close', 'volume'} arrays
+        (views into the memory-mapped store), or None if the symbol is unknown.
+        """
+        rows = self._slice(symbol, start, end)
+        if rows is None:
+            return None
+        result = {'date': self.dates[rows]}
+        for name, column in self.columns.items():
+            result[name] = column[rows]
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a columnar store from Polygon day_aggs flat files')
+    parser.add_argument('--source', default='datasets/polygon-flat-files/day_aggs', help='Directory of YYYY-MM-DD.csv.gz files')
+    parser.add_argument('--store', default=None, help='Output directory (default: <source>_columnar)')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if the store is current')
+    args = parser.parse_args()
+
+    if not Path(args.source).exists():
+        print(f"❌ Error: {args.source} not found")
+        sys.exit(1)
+
+    store_dir = Path(args.store) if args.store else default_store_dir(args.source)
+    if not args.force and DayAggsStore.is_current(args.source, store_dir):
+        print(f"✅ Store is current: {store_dir}")
+        return
+    DayAggsStore.build(args.source, store_dir)
+
+
+if __name__ == "__main__":
+    main()
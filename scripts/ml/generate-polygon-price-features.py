@@ -16,6 +16,8 @@ Output:
 
 Cache:
   - data/cache/polygon_prices/ (historical OHLCV data per ticker)
+  - data/feature_store/polygon-price/ (incremental Parquet feature store; only bars past
+    each ticker's high-water mark are recomputed. Bump FEATURE_VERSION when changing features)
 
 Features (43 total):
   - Volume (6): ratios, spikes, trends, acceleration, dark pool (placeholder)
@@ -44,6 +46,12 @@ import sys
 import json
 from tqdm import tqdm
 
+from price_feature_store import BAR_COLUMNS, PriceFeatureStore
+
+FEATURE_STORE_DIR = 'data/feature_store/polygon-price'
+FEATURE_VERSION = 'v1'
+LABEL_LOOKAHEAD_DAYS = 7
+
 # Feature calculation functions
 def calculate_technical_features(df):
     """Calculate technical indicator features"""
@@ -205,31 +213,22 @@ def get_historical_prices(ticker, start_date, end_date, cache_dir='data/cache/po
         print(f"Error fetching {ticker}: {e}")
         return None
 
-def generate_label(df, target_date, lookahead_days=7, threshold=0.02):
-    """Generate UP/DOWN/NEUTRAL label based on future price movement"""
-    try:
-        # Use get_indexer for pandas 2.x compatibility (get_loc doesn't support method='nearest')
-        idx_pos = df.index.get_indexer([target_date], method='nearest')[0]
-
-        if idx_pos == -1:
-            return 'NEUTRAL'  # Date not found
-
-        if idx_pos + lookahead_days >= len(df):
-            return 'NEUTRAL'  # Not enough future data
-
-        current_price = df.iloc[idx_pos]['Close']
-        future_price = df.iloc[idx_pos + lookahead_days]['Close']
-
-        pct_change = (future_price - current_price) / current_price
-
-        if pct_change > threshold:
-            return 'UP'
-        elif pct_change < -threshold:
-            return 'DOWN'
-        else:
-            return 'NEUTRAL'
-    except:
-        return 'NEUTRAL'
+def generate_labels(close, lookahead_days=7, threshold=0.02):
+    """Generate UP/DOWN/NEUTRAL labels for every trading day based on future price movement"""
+    # Days without enough future data (NaN change) fall through to NEUTRAL
+    pct_change = (close.shift(-lookahead_days) - close) / close
+    labels = np.where(pct_change > threshold, 'UP', np.where(pct_change < -threshold, 'DOWN', 'NEUTRAL'))
+    return pd.Series(labels, index=close.index)
+
+def calculate_ticker_features(df_prices):
+    """Calculate all price features and labels for every trading day of one ticker (feature store compute function)"""
+    features = pd.concat([
+        calculate_technical_features(df_prices),
+        calculate_volume_features(df_prices),
+        calculate_price_action_features(df_prices),
+    ], axis=1).astype(float)
+    features['label'] = generate_labels(df_prices['Close'], lookahead_days=LABEL_LOOKAHEAD_DAYS, threshold=0.02)
+    return features
 
 def generate_polygon_price_features():
     """Main function to generate price features"""
@@ -303,81 +302,63 @@ def generate_polygon_price_features():
     print("=" * 80)
     print()
 
-    results = []
-
-    for idx, row in tqdm(unique_pairs.iterrows(), total=len(unique_pairs), desc="Generating features"):
-        ticker = row['ticker']
-        target_date_str = row['date']
-        target_date = pd.to_datetime(target_date_str).normalize()  # Normalize to midnight
-
-        # Get cached price data
-        df_prices = ticker_price_cache.get(ticker)
-
-        if df_prices is None:
-            continue  # Skip if no price data
-
-        # Normalize price index to dates only (remove time component)
-        df_prices_normalized = df_prices.copy()
-        df_prices_normalized.index = df_prices_normalized.index.normalize()
-
-        # Find target date in price data
-        try:
-            if target_date not in df_prices_normalized.index:
-                # Find nearest trading day (within 5 days)
-                nearest_dates = df_prices_normalized.index[
-                    (df_prices_normalized.index >= target_date - pd.Timedelta(days=5)) &
-                    (df_prices_normalized.index <= target_date + pd.Timedelta(days=5))
-                ]
-                if len(nearest_dates) == 0:
-                    continue
-                target_date = nearest_dates[0]
-        except:
-            continue  # Skip if date not found
-
-        # Calculate technical features
-        tech_features = calculate_technical_features(df_prices)
-        volume_features = calculate_volume_features(df_prices)
-        price_features = calculate_price_action_features(df_prices)
-
-        # Get features for target date
-        try:
-            target_idx = df_prices.index.get_loc(target_date)
-
-            features = {
-                'ticker': ticker,
-                'date': target_date.strftime('%Y-%m-%d'),
-            }
-
-            # Add technical features
-            for col in tech_features.columns:
-                features[col] = tech_features.iloc[target_idx][col]
-
-            # Add volume features
-            for col in volume_features.columns:
-                features[col] = volume_features.iloc[target_idx][col]
-
-            # Add price action features
-            for col in price_features.columns:
-                features[col] = price_features.iloc[target_idx][col]
-
-            # Add placeholder features
-            features.update(calculate_placeholder_features())
-
-            # Generate label (use normalized dataframe with normalized target_date)
-            features['label'] = generate_label(df_prices_normalized, target_date, lookahead_days=7, threshold=0.02)
-
-            results.append(features)
+    # Features depend only on the ticker's history, so compute each ticker's full
+    # feature frame once and look up every target date against it
+    store = PriceFeatureStore(
+        FEATURE_STORE_DIR,
+        calculate_ticker_features,
+        feature_version=FEATURE_VERSION,
+        lookahead_bars=LABEL_LOOKAHEAD_DAYS
+    )
+    ticker_frames = []
+    for ticker in tqdm(sorted(ticker_price_cache), desc="Calculating ticker features"):
+        df_prices = ticker_price_cache[ticker]
+        if not store.update(ticker, df_prices):
+            # Cached prices were re-adjusted since the store was built: rebuild the ticker
+            store.update(ticker, df_prices)
+        ticker_features = store.read(ticker).drop(columns=BAR_COLUMNS)
+        ticker_features.index.name = 'trading_date'
+        ticker_features = ticker_features.reset_index()
+        ticker_features.insert(0, 'ticker', ticker)
+        ticker_frames.append(ticker_features)
+
+    if not ticker_frames:
+        print("❌ Error: no price data available for any ticker")
+        sys.exit(1)
 
-        except Exception as e:
-            continue  # Skip on error
+    all_features = pd.concat(ticker_frames, ignore_index=True)
+    all_features['trading_date'] = all_features['trading_date'].astype('datetime64[ns]')
+    feature_columns = [c for c in all_features.columns if c not in ('ticker', 'trading_date', 'label')]
+
+    # Match each (ticker, date) pair to its nearest trading day within 5 days
+    targets = unique_pairs.copy()
+    targets['target_date'] = pd.to_datetime(targets['date']).astype('datetime64[ns]')
+    matched = pd.merge_asof(
+        targets.sort_values('target_date'),
+        all_features.sort_values('trading_date'),
+        left_on='target_date',
+        right_on='trading_date',
+        by='ticker',
+        direction='nearest',
+        tolerance=pd.Timedelta(days=5),
+    )
+    matched = matched.dropna(subset=['trading_date']).sort_values(['ticker', 'target_date'])
+
+    df_features = matched[['ticker']].copy()
+    df_features['date'] = matched['trading_date'].dt.strftime('%Y-%m-%d')
+    df_features[feature_columns] = matched[feature_columns]
+
+    # Add placeholder features
+    for name, value in calculate_placeholder_features().items():
+        df_features[name] = value
+
+    df_features['label'] = matched['label']
+    df_features = df_features.reset_index(drop=True)
 
     print()
-    print(f"✅ Generated features for {len(results):,} (ticker, date) pairs")
+    print(f"✅ Generated features for {len(df_features):,} (ticker, date) pairs")
     print()
 
-    # Create dataframe
-    df_features = pd.DataFrame(results)
-
     # Save to CSV
     output_file = "data/training/polygon_price_features.csv"
     print(f"💾 Saving price features dataset: {output_file}")
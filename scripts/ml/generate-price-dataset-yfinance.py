@@ -11,6 +11,10 @@ Generates simplified feature set for price movement prediction.
    Without caching, this script may make 73,200+ redundant API calls for
    historical data that never changes. Proper caching reduces this to ~100 calls
    on first run and 0 calls on subsequent runs.
+
+Features are kept in an incremental Parquet feature store (data/feature_store/price-yfinance):
+after the first run, only bars newer than each ticker's high-water mark are downloaded and
+only the trailing 252-day window is recomputed. Bump FEATURE_VERSION when changing features.
 """
 
 import yfinance as yf
@@ -19,6 +23,13 @@ import numpy as np
 from datetime import datetime, timedelta
 import time
 
+from price_feature_store import BAR_COLUMNS, PriceFeatureStore
+from rolling_kernels import rolling_slope
+
+FEATURE_STORE_DIR = 'data/feature_store/price-yfinance'
+FEATURE_VERSION = 'v2'
+LABEL_LOOKAHEAD_DAYS = 7
+
 # Stock universe
 SP500_TOP_100 = [
     'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'NVDA', 'META', 'TSLA', 'BRK-B', 'UNH', 'JNJ',
@@ -95,17 +106,11 @@ def calculate_volume_features(df):
     features['volume_spike'] = (df['Volume'] > 2 * df['Volume'].rolling(20).mean()).astype(int)
     features['relative_volume'] = df['Volume'] / df['Volume'].rolling(20).mean()
 
-    # Volume trend
-    vol_series = df['Volume'].rolling(10)
-    x = np.arange(10)
-    def calc_slope(y):
-        if len(y) < 10:
-            return 0
-        return np.polyfit(x, y, 1)[0]
-    features['volume_trend_10d'] = df['Volume'].rolling(10).apply(calc_slope, raw=False)
+    # Volume trend (10-day regression slope)
+    features['volume_trend_10d'] = rolling_slope(df['Volume'], 10)
 
     # Volume acceleration
-    vol_trend_5d = df['Volume'].rolling(5).apply(lambda y: np.polyfit(np.arange(len(y)), y, 1)[0] if len(y) == 5 else 0, raw=False)
+    vol_trend_5d = rolling_slope(df['Volume'], 5)
     features['volume_acceleration'] = features['volume_trend_10d'] - vol_trend_5d
 
     # Dark pool ratio (placeholder)
@@ -156,6 +161,16 @@ def calculate_label(df, threshold=2.0):
 
     return pd.Series(labels, index=df.index)
 
+def calculate_all_features(df):
+    """Calculate all features and the label for one ticker's bars (feature store compute function)"""
+    features_df = pd.concat([
+        calculate_technical_features(df),
+        calculate_volume_features(df),
+        calculate_price_action_features(df)
+    ], axis=1)
+    features_df['label'] = calculate_label(df)
+    return features_df
+
 def generate_dataset(symbols, start_date, end_date, output_file, checkpoint_freq=10):
     """Generate complete training dataset"""
     print(f"🚀 Price Prediction Dataset Generation (yfinance)")
@@ -169,26 +184,37 @@ def generate_dataset(symbols, start_date, end_date, output_file, checkpoint_freq
     successful = 0
     failed = []
 
+    store = PriceFeatureStore(
+        FEATURE_STORE_DIR,
+        calculate_all_features,
+        feature_version=FEATURE_VERSION,
+        lookahead_bars=LABEL_LOOKAHEAD_DAYS
+    )
+
     for i, symbol in enumerate(symbols):
         print(f"\n[{i+1}/{len(symbols)}] Processing {symbol}...")
 
         try:
-            # Download data
+            # Download only bars past the stored high-water mark (full history if start_date moved earlier)
             ticker = yf.Ticker(symbol)
-            df = ticker.history(start=start_date, end=end_date)
+            fetch_start = store.fetch_start(symbol, start_date)
+            df = ticker.history(start=fetch_start, end=end_date)
+
+            if not store.update(symbol, df, start=fetch_start):
+                # Stored history was re-adjusted (split/dividend): rebuild from full history
+                print(f"  ↻ Price history changed, rebuilding {symbol}")
+                df = ticker.history(start=start_date, end=end_date)
+                store.update(symbol, df, start=start_date)
+
+            df = store.read(symbol, start_date, end_date)
 
-            if len(df) < 60:  # Need minimum 60 days for indicators
-                print(f"  ⚠️ Insufficient data ({len(df)} days)")
+            if df is None or len(df) < 60:  # Need minimum 60 days for indicators
+                print(f"  ⚠️ Insufficient data ({0 if df is None else len(df)} days)")
                 failed.append(symbol)
                 continue
 
-            # Calculate features
-            tech_features = calculate_technical_features(df)
-            vol_features = calculate_volume_features(df)
-            price_features = calculate_price_action_features(df)
-
-            # Combine all features
-            features_df = pd.concat([tech_features, vol_features, price_features], axis=1)
+            # Features + label from the store
+            features_df = df.drop(columns=BAR_COLUMNS)
 
             # Add placeholders for missing features
             for col in ['put_call_ratio', 'put_call_ratio_change', 'unusual_options_activity',
@@ -206,9 +232,6 @@ def generate_dataset(symbols, start_date, end_date, output_file, checkpoint_freq
                 else:
                     features_df[col] = 0
 
-            # Calculate labels
-            features_df['label'] = calculate_label(df)
-
             # Add symbol and date
             features_df['symbol'] = symbol
             features_df['date'] = df.index.strftime('%Y-%m-%d')
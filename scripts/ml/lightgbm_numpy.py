@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+NumPy Tree Evaluator for LightGBM text models (model.txt)
+
+Parses a saved LightGBM model into flat arrays (split feature, threshold,
+decision type, left/right child, leaf value) covering every tree, then
+evaluates all trees for all rows at once with vectorized array traversal
+(one gather/compare step per tree level). Exposes the subset of the
+lgb.Booster interface used by predict-generic.py (predict, num_feature,
+num_trees, feature_name), so the prediction server can score models without
+importing lightgbm.
+
+Supported: numerical splits (including missing-value handling), binary,
+multiclass, multiclassova, cross-entropy and regression-family objectives.
+Models with categorical splits or linear trees raise UnsupportedModelError so
+callers can fall back to lgb.Booster.
+
+Parity check against Booster.predict (requires lightgbm):
+    python3 scripts/ml/lightgbm_numpy.py models/price-prediction/v1.1.0/model.txt
+"""
+
+import sys
+import numpy as np
+from typing import Dict, List, Tuple
+
+# LightGBM's kZeroThreshold: |x| <= 1e-35 counts as zero for missing_type=Zero
+ZERO_THRESHOLD = 1e-35
+
+# decision_type bit layout (LightGBM tree.h)
+CATEGORICAL_MASK = 1
+DEFAULT_LEFT_MASK = 2
+MISSING_TYPE_ZERO = 1
+MISSING_TYPE_NAN = 2
+
+IDENTITY_OBJECTIVES = {
+    'regression', 'regression_l1', 'huber', 'fair', 'quantile', 'mape', 'lambdarank', 'rank_xendcg'
+}
+EXP_OBJECTIVES = {'poisson', 'gamma', 'tweedie'}
+
+
+class UnsupportedModelError(Exception):
+    """Model uses a LightGBM feature this evaluator does not implement"""
+
+
+def _parse_model_text(text: str) -> Tuple[Dict[str, str], List[Dict[str, str]]]:
+    """Split model.txt into header key/values and one key/value dict per tree"""
+    header: Dict[str, str] = {}
+    trees: List[Dict[str, str]] = []
+    current = header
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if line == 'end of trees':
+            break
+        if not line:
+            continue
+        if line.startswith('Tree='):
+            current = {}
+            trees.append(current)
+            continue
+        key, sep, value = line.partition('=')
+        if sep:
+            current[key] = value
+    return header, trees
+
+
+def _floats(value: str) -> np.ndarray:
+    return np.array(value.split(), dtype=np.float64) if value else np.empty(0, dtype=np.float64)
+
+
+def _ints(value: str) -> np.ndarray:
+    return np.array(value.split(), dtype=np.int64) if value else np.empty(0, dtype=np.int64)
+
+
+class NumpyTreeEnsemble:
+    def __init__(self, model_text: str, source: str = '<string>'):
+        """Compile LightGBM model text into flat, ensemble-wide node arrays"""
+        header, trees = _parse_model_text(model_text)
+        if not trees:
+            raise UnsupportedModelError(f'No trees found in {source}')
+
+        self.source = source
+        self.num_class = int(header.get('num_class', '1'))
+        self.num_tree_per_iteration = int(header.get('num_tree_per_iteration', '1'))
+        self._num_feature = int(header['max_feature_idx']) + 1
+        self._feature_names = header.get('feature_names', '').split() or [
+            f'Column_{i}' for i in range(self._num_feature)
+        ]
+        self.average_output = 'average_output' in header
+
+        objective = header.get('objective', 'regression').split()
+        self.objective = objective[0]
+        self.objective_params = {
+            k: v for k, _, v in (token.partition(':') for token in objective[1:])
+        }
+        if not (
+            self.objective in IDENTITY_OBJECTIVES
+            or self.objective in EXP_OBJECTIVES
+            or self.objective in ('binary', 'cross_entropy', 'multiclass', 'multiclassova')
+        ):
+            raise UnsupportedModelError(f'Unsupported objective "{self.objective}" in {source}')
+
+        if len(trees) % self.num_tree_per_iteration != 0:
+            raise UnsupportedModelError(
+                f'{len(trees)} trees is not a multiple of num_tree_per_iteration={self.num_tree_per_iteration}'
+            )
+
+        split_feature, threshold, decision_type = [], [], []
+        left_child, right_child, leaf_value, roots = [], [], [], []
+        node_offset = 0
+        leaf_offset = 0
+
+        for t, tree in enumerate(trees):
+            if int(tree.get('num_cat', '0')) > 0:
+                raise UnsupportedModelError(f'Tree {t} in {source} has categorical splits')
+            if tree.get('is_linear', '0') != '0':
+                raise UnsupportedModelError(f'Tree {t} in {source} is a linear tree')
+
+            leaves = _floats(tree['leaf_value'])
+            num_leaves = int(tree['num_leaves'])
+            if len(leaves) != num_leaves:
+                raise UnsupportedModelError(f'Tree {t} in {source} has {len(leaves)} leaf values, expected {num_leaves}')
+
+            if num_leaves == 1:
+                # Constant tree: root is the single leaf
+                roots.append(~leaf_offset)
+            else:
+                left = _ints(tree['left_child'])
+                right = _ints(tree['right_child'])
+                # Internal children are offset into the global node arrays;
+                # leaf children are encoded as ~global_leaf_index (always negative)
+                left_child.append(np.where(left >= 0, left + node_offset, ~(~left + leaf_offset)))
+                right_child.append(np.where(right >= 0, right + node_offset, ~(~right + leaf_offset)))
+                split_feature.append(_ints(tree['split_feature']))
+                threshold.append(_floats(tree['threshold']))
+                decision_type.append(_ints(tree['decision_type']))
+                roots.append(node_offset)
+                node_offset += num_leaves - 1
+
+            leaf_value.append(leaves)
+            leaf_offset += num_leaves
+
+        def concat(parts: List[np.ndarray], dtype) -> np.ndarray:
+            return np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype=dtype)
+
+        decision = concat(decision_type, np.int64)
+        if np.any(decision & CATEGORICAL_MASK):
+            raise UnsupportedModelError(f'{source} has categorical splits')
+
+        # Flat node layout: internal nodes first, then one absorbing node per leaf
+        # (both children point to itself), so every (row, tree) pair can take the
+        # same number of steps without compacting finished pairs out of the arrays.
+        num_internal = node_offset
+        leaf_nodes = num_internal + np.arange(leaf_offset, dtype=np.int64)
+
+        def to_node(child: np.ndarray) -> np.ndarray:
+            return np.where(child >= 0, child, num_internal + ~child)
+
+        left = np.concatenate([to_node(concat(left_child, np.int64)), leaf_nodes])
+        right = np.concatenate([to_node(concat(right_child, np.int64)), leaf_nodes])
+        # child[2 * node] is the left child, child[2 * node + 1] the right child
+        self.child = np.ascontiguousarray(np.stack([left, right], axis=1).ravel())
+        self.split_feature = np.concatenate([concat(split_feature, np.int64), np.zeros(leaf_offset, dtype=np.int64)])
+        self.threshold = np.concatenate([concat(threshold, np.float64), np.full(leaf_offset, np.inf)])
+        self.node_value = np.concatenate([np.zeros(num_internal), concat(leaf_value, np.float64)])
+        self.roots = to_node(np.array(roots, dtype=np.int64))
+        self.num_internal = num_internal
+
+        padding = np.zeros(leaf_offset, dtype=bool)
+        missing_type = (decision >> 2) & 3
+        self.default_left = np.concatenate([(decision & DEFAULT_LEFT_MASK) != 0, padding])
+        self.missing_zero = np.concatenate([missing_type == MISSING_TYPE_ZERO, padding])
+        self.missing_nan = np.concatenate([missing_type == MISSING_TYPE_NAN, padding])
+        self.has_missing_zero = bool(self.missing_zero.any())
+        self.max_depth = self._max_depth()
+
+    def _max_depth(self) -> int:
+        """Longest root-to-leaf path over all trees (number of traversal steps needed)"""
+        depth = 0
+        frontier = self.roots[self.roots < self.num_internal]
+        while frontier.size:
+            depth += 1
+            children = np.concatenate([self.child[2 * frontier], self.child[2 * frontier + 1]])
+            frontier = children[children < self.num_internal]
+        return depth
+
+    @classmethod
+    def from_file(cls, model_path: str) -> 'NumpyTreeEnsemble':
+        with open(model_path, 'r') as f:
+            return cls(f.read(), source=model_path)
+
+    def num_feature(self) -> int:
+        return self._num_feature
+
+    def num_trees(self) -> int:
+        return len(self.roots)
+
+    def feature_name(self) -> List[str]:
+        return list(self._feature_names)
+
+    def leaf_nodes(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node reached by every (row, tree) pair, shape (n_rows, n_trees)"""
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+        node = np.tile(self.roots, n_rows)
+        row_base = np.repeat(np.arange(n_rows, dtype=np.int64) * n_features, n_trees)
+        flat_X = np.ascontiguousarray(X).ravel()
+
+        # NaN/zero routing is only needed if the input has NaNs or the model routes zeros
+        handle_missing = self.has_missing_zero or bool(np.isnan(flat_X).any())
+
+        for _ in range(self.max_depth):
+            fval = flat_X[row_base + self.split_feature[node]]
+            if handle_missing:
+                is_nan = np.isnan(fval)
+                missing_nan = self.missing_nan[node]
+                # NaN is treated as 0.0 unless the split routes NaN explicitly
+                fval = np.where(is_nan & ~missing_nan, 0.0, fval)
+                is_missing = (missing_nan & is_nan) | (
+                    self.missing_zero[node] & (np.abs(fval) <= ZERO_THRESHOLD)
+                )
+                go_right = np.where(is_missing, ~self.default_left[node], fval > self.threshold[node])
+            else:
+                go_right = fval > self.threshold[node]
+            node = self.child[2 * node + go_right]
+
+        return node.reshape(n_rows, n_trees)
+
+    def predict_raw(self, X: np.ndarray) -> np.ndarray:
+        """Raw scores: (n_rows,) or (n_rows, num_tree_per_iteration)"""
+        values = self.node_value[self.leaf_nodes(X)]
+        k = self.num_tree_per_iteration
+        raw = values.reshape(X.shape[0], -1, k).sum(axis=1)
+        if self.average_output:
+            raw /= values.shape[1] // k
+        return raw[:, 0] if k == 1 else raw
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Transformed predictions matching lgb.Booster.predict output shape and scale"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self._num_feature:
+            raise Exception(f'Feature count mismatch: got {X.shape[1]} features, expected {self._num_feature}')
+
+        raw = self.predict_raw(X)
+        if self.objective == 'multiclass':
+            shifted = np.exp(raw - raw.max(axis=1, keepdims=True))
+            return shifted / shifted.sum(axis=1, keepdims=True)
+        if self.objective in ('binary', 'multiclassova'):
+            sigmoid = float(self.objective_params.get('sigmoid', '1'))
+            return 1.0 / (1.0 + np.exp(-sigmoid * raw))
+        if self.objective == 'cross_entropy':
+            return 1.0 / (1.0 + np.exp(-raw))
+        if self.objective in EXP_OBJECTIVES:
+            return np.exp(raw)
+        if 'sqrt' in self.objective_params:
+            return np.sign(raw) * raw * raw
+        return raw
+
+
+def check_parity(model_path: str, num_rows: int = 1000, seed: int = 42) -> float:
+    """Max absolute difference between NumpyTreeEnsemble and lgb.Booster on random inputs"""
+    import lightgbm as lgb
+
+    booster = lgb.Booster(model_file=model_path)
+    ensemble = NumpyTreeEnsemble.from_file(model_path)
+
+    # Draw inputs around each split threshold so both branches are exercised, plus some NaNs and zeros
+    rng = np.random.default_rng(seed)
+    X = rng.normal(0.0, 3.0, size=(num_rows, ensemble.num_feature()))
+    split_feature = ensemble.split_feature[:ensemble.num_internal]
+    split_threshold = ensemble.threshold[:ensemble.num_internal]
+    for j in range(ensemble.num_feature()):
+        thresholds = split_threshold[split_feature == j]
+        if thresholds.size:
+            X[:, j] = rng.choice(thresholds, size=num_rows) + rng.normal(0.0, 1e-3, size=num_rows)
+    X[rng.random(X.shape) < 0.02] = np.nan
+    X[rng.random(X.shape) < 0.02] = 0.0
+
+    return float(np.max(np.abs(booster.predict(X) - ensemble.predict(X))))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.stderr.write('Usage: lightgbm_numpy.py <model.txt> [<model.txt> ...]\n')
+        sys.exit(1)
+
+    failed = False
+    for path in sys.argv[1:]:
+        diff = check_parity(path)
+        status = 'OK' if diff <= 1e-9 else 'MISMATCH'
+        failed = failed or status != 'OK'
+        print(f'{status} {path}: max |numpy - lightgbm| = {diff:.3e}')
+    sys.exit(1 if failed else 0)
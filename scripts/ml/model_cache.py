@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Bounded, self-invalidating LRU cache for file-backed artifacts (models, normalizers)
+
+- Entries are keyed by path and stamped with the file's (mtime_ns, size) signature.
+  Every lookup re-stats the file; a changed signature (e.g. a retrain overwrote
+  models/*/vX/model.txt) reloads the entry instead of serving the stale one.
+- The cache is bounded by entry count and by total bytes, where an entry's size is
+  the size of its backing file. Least recently used entries are evicted first; the
+  most recently loaded entry is always kept, even if it alone exceeds the budget.
+- Thread-safe: lookups, inserts and evictions are serialized on one lock, but the
+  loader runs outside it, so a slow load never blocks hits on other entries.
+  Concurrent misses on the same path share one in-flight load.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+Signature = Tuple[int, int]
+
+
+def env_int(name: str, default: int) -> int:
+    """Read a positive integer budget from the environment"""
+    configured = os.environ.get(name)
+    if not configured:
+        return default
+    try:
+        return max(1, int(configured))
+    except ValueError:
+        sys.stderr.write(f'Invalid {name}={configured!r}, using {default}\n')
+        sys.stderr.flush()
+        return default
+
+
+def file_signature(path: str) -> Signature:
+    """Cheap change detector for a file: (mtime in ns, size in bytes)"""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class FileLRUCache:
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        max_bytes: int,
+        on_evict: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Args:
+            name: Label used in log lines and stats ("model", "normalizer")
+            max_entries: Maximum number of cached entries
+            max_bytes: Maximum total size of the backing files of cached entries
+            on_evict: Called with the path whenever an entry is dropped or replaced
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._entries: 'OrderedDict[str, Tuple[Any, Signature]]' = OrderedDict()
+        self._bytes = 0
+        # path -> Future of the load in progress; later misses wait on it instead of loading again
+        self._loading: Dict[str, Future] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def get(self, path: str, loader: Callable[[str], Any]) -> Any:
+        """Return the cached value for path, (re)loading it if missing or changed on disk"""
+        with self._lock:
+            try:
+                signature = file_signature(path)
+            except OSError as e:
+                # File vanished: drop anything cached for it and surface the error
+                self._drop(path)
+                raise Exception(f'Cannot stat {self.name} file {path}: {str(e)}')
+
+            entry = self._entries.get(path)
+            if entry is not None and entry[1] == signature:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[0]
+
+            in_flight = self._loading.get(path)
+            if in_flight is None:
+                if entry is not None:
+                    sys.stderr.write(f'{self.name.capitalize()} changed on disk, reloading: {path}\n')
+                    sys.stderr.flush()
+                    self._drop(path)
+                    self.reloads += 1
+                else:
+                    self.misses += 1
+                in_flight = self._loading[path] = Future()
+                owner = True
+            else:
+                self.hits += 1
+                owner = False
+
+        if not owner:
+            # Another thread is loading this path: share its result (or its error)
+            return in_flight.result()
+
+        try:
+            value = loader(path)
+        except BaseException as e:
+            with self._lock:
+                if self._loading.get(path) is in_flight:
+                    del self._loading[path]
+            in_flight.set_exception(e)
+            raise
+
+        with self._lock:
+            # Skip caching if the entry was evicted while it was loading
+            if self._loading.get(path) is in_flight:
+                del self._loading[path]
+                self._entries[path] = (value, signature)
+                self._bytes += signature[1]
+                self._enforce_budget()
+        in_flight.set_result(value)
+        return value
+
+    def contains(self, path: str) -> bool:
+        """True if path is cached and its file is unchanged"""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return False
+            try:
+                return entry[1] == file_signature(path)
+            except OSError:
+                return False
+
+    def evict(self, path: str) -> bool:
+        """Drop path from the cache; returns False if it was not cached"""
+        with self._lock:
+            # An in-flight load of this path still returns to its callers but is not cached
+            self._loading.pop(path, None)
+            return self._drop(path)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of cache occupancy and counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'maxEntries': self.max_entries,
+                'maxBytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'reloads': self.reloads,
+                'paths': list(self._entries.keys())
+            }
+
+    def _drop(self, path: str) -> bool:
+        entry = self._entries.pop(path, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[1][1]
+        if self.on_evict is not None:
+            self.on_evict(path)
+        return True
+
+    def _enforce_budget(self) -> None:
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            sys.stderr.write(f'{self.name.capitalize()} cache evicting LRU entry: {oldest}\n')
+            sys.stderr.flush()
+            self._drop(oldest)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Partitioned Parquet Sink for EODHD Options Snapshots
+
+One typed Parquet file per (snapshot date, underlying ticker), Hive-partitioned
+so pyarrow / pandas can read the whole tree as one dataset:
+
+    <root>/date=2025-10-15/ticker=AAPL/part.parquet
+
+Every file has the same fixed schema (OPTIONS_SCHEMA): contract identifiers,
+strike/type/expiry, prices, volume and open interest, volatility and greeks.
+Fields the API adds later are dropped; fields a response lacks are null.
+
+Pages are handed to a SnapshotWriter as they are fetched and flushed as row
+groups of ROW_GROUP_ROWS contracts, so a ticker's chain never has to be
+serialized as JSON/CSV first. The file is written under a temporary name and
+renamed on close(), so readers only ever see complete snapshots.
+
+For resumable fetches a PageSpool keeps each fetched page as its own small
+file under the partition's _pages/ directory (ignored by dataset readers) until
+the chain is complete, then merges them into part.parquet in one step.
+
+Usage:
+    sink = OptionsParquetSink('data/eodhd_options/parquet')
+    writer = sink.writer('AAPL', '2025-10-15')
+    for page in pages:
+        writer.write(page)
+    writer.close()
+
+    df = read_snapshot(sink.latest('AAPL'), columns=['type', 'strike', 'volume'])
+"""
+
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+ROW_GROUP_ROWS = 50_000
+PART_FILE = 'part.parquet'
+
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+_PARTITIONING = ds.partitioning(pa.schema([('date', pa.string()), ('ticker', pa.string())]), flavor='hive')
+
+OPTIONS_SCHEMA = pa.schema([
+    # Contract
+    ('contract', pa.string()),
+    ('underlying_symbol', pa.string()),
+    ('exp_date', pa.date32()),
+    ('expiration_type', _CATEGORY),
+    ('type', _CATEGORY),
+    ('strike', pa.float64()),
+    ('exchange', _CATEGORY),
+    ('currency', _CATEGORY),
+    # Prices
+    ('open', pa.float64()),
+    ('high', pa.float64()),
+    ('low', pa.float64()),
+    ('last', pa.float64()),
+    ('last_size', pa.int64()),
+    ('change', pa.float64()),
+    ('pctchange', pa.float64()),
+    ('previous', pa.float64()),
+    ('previous_date', pa.string()),
+    ('bid', pa.float64()),
+    ('bid_date', pa.string()),
+    ('bid_size', pa.int64()),
+    ('ask', pa.float64()),
+    ('ask_date', pa.string()),
+    ('ask_size', pa.int64()),
+    ('midpoint', pa.float64()),
+    ('moneyness', pa.float64()),
+    # Volume / open interest
+    ('volume', pa.int64()),
+    ('volume_change', pa.float64()),
+    ('volume_pctchange', pa.float64()),
+    ('open_interest', pa.int64()),
+    ('open_interest_change', pa.float64()),
+    ('open_interest_pctchange', pa.float64()),
+    ('vol_oi_ratio', pa.float64()),
+    # Volatility / greeks
+    ('volatility', pa.float64()),
+    ('volatility_change', pa.float64()),
+    ('volatility_pctchange', pa.float64()),
+    ('theoretical', pa.float64()),
+    ('delta', pa.float64()),
+    ('gamma', pa.float64()),
+    ('theta', pa.float64()),
+    ('vega', pa.float64()),
+    ('rho', pa.float64()),
+    ('tradetime', pa.string()),
+    ('dte', pa.int64()),
+])
+
+
+def records_to_table(records: List[Dict]) -> pa.Table:
+    """Options contract dicts (API attributes) → Arrow table with OPTIONS_SCHEMA"""
+    df = pd.DataFrame.from_records(records)
+    columns = {}
+    for field in OPTIONS_SCHEMA:
+        values = df[field.name] if field.name in df.columns else pd.Series([None] * len(df), dtype=object)
+        if pa.types.is_date32(field.type):
+            values = pd.to_datetime(values, errors='coerce').dt.date
+        elif pa.types.is_floating(field.type) or pa.types.is_integer(field.type):
+            values = pd.to_numeric(values, errors='coerce')
+            if pa.types.is_integer(field.type):
+                values = values.round().astype('Int64')
+        else:
+            values = values.where(values.notna(), None).astype(object)
+            values = values.map(lambda v: v if v is None else str(v))
+        columns[field.name] = values
+    return pa.Table.from_pandas(pd.DataFrame(columns), schema=OPTIONS_SCHEMA, preserve_index=False)
+
+
+class SnapshotWriter:
+    """Streams one (date, ticker) snapshot to Parquet in row-group batches"""
+
+    def __init__(self, path: Path, row_group_rows: int = ROW_GROUP_ROWS):
+        self.path = path
+        self.tmp_path = path.with_name(path.name + '.tmp')
+        self.row_group_rows = row_group_rows
+        self.buffer: List[Dict] = []
+        self.rows = 0
+        self._writer: Optional[pq.ParquetWriter] = None
+
+    def write(self, records: List[Dict]) -> None:
+        """Buffer a page of contracts, flushing full row groups"""
+        self.buffer.extend(records)
+        if len(self.buffer) >= self.row_group_rows:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self.buffer:
+            return
+        if self._writer is None:
+            self.tmp_path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = pq.ParquetWriter(self.tmp_path, OPTIONS_SCHEMA, compression='snappy')
+        table = records_to_table(self.buffer)
+        self._writer.write_table(table, row_group_size=len(self.buffer))
+        self.rows += table.num_rows
+        self.buffer = []
+
+    def close(self) -> int:
+        """Flush and publish the snapshot; returns rows written (0 = nothing written)"""
+        self._flush()
+        if self._writer is None:
+            return 0
+        self._writer.close()
+        self._writer = None
+        os.replace(self.tmp_path, self.path)
+        return self.rows
+
+    def abort(self) -> None:
+        """Discard everything written so far"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self.buffer = []
+        self.tmp_path.unlink(missing_ok=True)
+
+
+class PageSpool:
+    """Durable per-page staging for one (date, ticker) snapshot, merged into part.parquet on commit()"""
+
+    def __init__(self, path: Path, row_group_rows: int = ROW_GROUP_ROWS):
+        self.path = path
+        self.dir = path.parent / '_pages'
+        self.row_group_rows = row_group_rows
+
+    def _page_path(self, page: int) -> Path:
+        return self.dir / f'page-{page:05d}.parquet'
+
+    def page_count(self) -> int:
+        """Number of consecutive pages stored, starting from page 1"""
+        count = 0
+        while self._page_path(count + 1).exists():
+            count += 1
+        return count
+
+    def write(self, page: int, records: List[Dict]) -> None:
+        """Store one page atomically (it either exists complete or not at all)"""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        path = self._page_path(page)
+        tmp_path = path.with_name(path.name + '.tmp')
+        pq.write_table(records_to_table(records), tmp_path, compression='snappy')
+        os.replace(tmp_path, path)
+
+    def truncate(self, pages: int) -> None:
+        """Drop every stored page after the first `pages`"""
+        if not self.dir.exists():
+            return
+        for path in self.dir.iterdir():
+            stem = path.name.split('.', 1)[0]
+            if not stem.startswith('page-') or not path.name.endswith('.parquet') or int(stem[5:]) > pages:
+                path.unlink()
+
+    def commit(self) -> int:
+        """Merge the stored pages into the snapshot file; returns rows written (0 = nothing stored)"""
+        pages = self.page_count()
+        if pages == 0:
+            self.discard()
+            return 0
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        rows = 0
+        buffer: List[pa.Table] = []
+        try:
+            with pq.ParquetWriter(tmp_path, OPTIONS_SCHEMA, compression='snappy') as writer:
+                for page in range(1, pages + 1):
+                    buffer.append(pq.read_table(self._page_path(page), schema=OPTIONS_SCHEMA))
+                    if sum(table.num_rows for table in buffer) >= self.row_group_rows or page == pages:
+                        table = pa.concat_tables(buffer).combine_chunks()
+                        writer.write_table(table, row_group_size=max(table.num_rows, 1))
+                        rows += table.num_rows
+                        buffer = []
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        os.replace(tmp_path, self.path)
+        self.discard()
+        return rows
+
+    def discard(self) -> None:
+        """Remove all stored pages"""
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+class OptionsParquetSink:
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+
+    def path(self, ticker: str, date: str) -> Path:
+        return self.root / f'date={date}' / f'ticker={ticker}' / PART_FILE
+
+    def writer(self, ticker: str, date: str) -> SnapshotWriter:
+        return SnapshotWriter(self.path(ticker, date))
+
+    def spool(self, ticker: str, date: str) -> PageSpool:
+        return PageSpool(self.path(ticker, date))
+
+    def snapshots(self) -> Dict[str, List[str]]:
+        """ticker → sorted snapshot dates stored for it"""
+        result: Dict[str, List[str]] = {}
+        for part in self.root.glob(f'date=*/ticker=*/{PART_FILE}'):
+            date = part.parent.parent.name.split('=', 1)[1]
+            ticker = part.parent.name.split('=', 1)[1]
+            result.setdefault(ticker, []).append(date)
+        return {ticker: sorted(dates) for ticker, dates in sorted(result.items())}
+
+    def read_latest(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Most recent snapshot of every ticker as one frame, with a categorical `ticker` column
+
+        All files are scanned as a single Arrow dataset (in parallel, `columns` only).
+        """
+        columns = list(columns or OPTIONS_SCHEMA.names)
+        files = [str(self.path(ticker, dates[-1])) for ticker, dates in self.snapshots().items()]
+        if not files:
+            return pd.DataFrame(columns=['ticker'] + columns)
+        dataset = ds.dataset(
+            files, schema=OPTIONS_SCHEMA.append(pa.field('date', pa.string())).append(pa.field('ticker', pa.string())),
+            format='parquet', partitioning=_PARTITIONING, partition_base_dir=str(self.root)
+        )
+        df = dataset.to_table(columns=['ticker'] + columns).to_pandas()
+        df['ticker'] = df['ticker'].astype('category')
+        return df
+
+    def latest(self, ticker: str) -> Optional[Path]:
+        """Most recent snapshot file for ticker (None if none stored)"""
+        parts = sorted(self.root.glob(f'date=*/ticker={ticker}/{PART_FILE}'))
+        return parts[-1] if parts else None
+
+
+def read_snapshot(path: Union[str, Path], columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read one snapshot file (only `columns` if given) without adding partition columns"""
+    return pq.read_table(path, columns=columns).to_pandas()
+
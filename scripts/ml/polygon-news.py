@@ -1,12 +1,16 @@
-import requests
 import pandas as pd
-import time
+import os
 import random
 
-API_KEY = 'YOUR_POLYGON_API_KEY'  # 🔁 Replace this
+from polygon_news_harvester import DEFAULT_TIER, PolygonNewsHarvester
+
+# Use environment variable for API key
+API_KEY = os.getenv('POLYGON_API_KEY')
+if not API_KEY:
+    raise ValueError("POLYGON_API_KEY environment variable is required")
+
 YEARS = [2022, 2023, 2024]
-ARTICLES_PER_PAGE = 100
-DELAY_SECONDS = 1.5
+POLYGON_TIER = DEFAULT_TIER  # 'free' (5 calls/min) or 'paid'; set via POLYGON_TIER
 
 # ---------------------
 # Fetch S&P 500 and NASDAQ-100 tickers
@@ -30,64 +34,18 @@ def get_dynamic_tickers():
     print(f"Using {len(combined)} tickers dynamically fetched.")
     return combined
 
-# ---------------------
-# Pull Polygon.io news
-# ---------------------
-def get_news_for_ticker_year(ticker, year):
-    start_date = f'{year}-01-01'
-    end_date = f'{year}-12-31'
-    url = f"https://api.polygon.io/v2/reference/news"
-
-    all_articles = []
-    page = 1
-    while True:
-        params = {
-            'ticker': ticker,
-            'published_utc.gte': start_date,
-            'published_utc.lte': end_date,
-            'order': 'asc',
-            'limit': ARTICLES_PER_PAGE,
-            'apiKey': API_KEY,
-            'page': page
-        }
-        response = requests.get(url, params=params)
-        if response.status_code != 200:
-            print(f"❌ Error: {response.status_code} for {ticker} {year}")
-            break
-
-        data = response.json()
-        articles = data.get('results', [])
-        if not articles:
-            break
-
-        for article in articles:
-            all_articles.append({
-                'ticker': ticker,
-                'published_utc': article.get('published_utc'),
-                'title': article.get('title'),
-                'summary': article.get('summary'),
-                'article_url': article.get('article_url'),
-                'sentiment': article.get('sentiment', {}).get('score')  # Optional
-            })
-
-        print(f"{ticker} {year}: Retrieved {len(articles)} articles (page {page})")
-        page += 1
-        time.sleep(DELAY_SECONDS)
-
-    return all_articles
-
 # ---------------------
 # Main run logic
 # ---------------------
 def save_news_to_csv():
     tickers = get_dynamic_tickers()
-    for year in YEARS:
-        all_data = []
-        for ticker in tickers:
-            articles = get_news_for_ticker_year(ticker, year)
-            all_data.extend(articles)
+    harvester = PolygonNewsHarvester(API_KEY, tier=POLYGON_TIER)
+
+    # Articles land in the Parquet store as they arrive; a rerun resumes where this one stopped
+    harvester.harvest(tickers, YEARS)
 
-        df = pd.DataFrame(all_data)
+    for year in YEARS:
+        df = harvester.store.read(tickers, [year])
         file_name = f"polygon_news_{year}.csv"
         df.to_csv(file_name, index=False)
         print(f"✅ Saved {len(df)} articles to {file_name}")
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Deduplicating Polygon News Article Store
+
+Every article is stored once, keyed by its Polygon article id, in Parquet files
+partitioned by publication month:
+
+    <root>/articles/month=2025-03/part-00007.parquet
+
+A SQLite key index (<root>/articles.sqlite) maps article id → month and records
+which tickers each article was fetched for, so:
+
+- upsert() only writes articles whose key is not indexed yet and only adds ticker
+  links that are new; replaying overlapping inputs (checkpoint CSVs, re-harvests)
+  costs index lookups, not disk. Disk use scales with unique articles.
+- scan() reads one month at a time, only the requested columns and tickers, and
+  yields (ticker, article) rows lazily; read() collects them into one frame.
+
+Articles from sources without an id (legacy CSVs) are keyed by article_url; they
+match, and are matched by, articles with the same URL, so an article imported from
+a CSV and later harvested with its id is stored once. A month is compacted
+into a single file once it accumulates COMPACT_PARTS files.
+
+Usage:
+    store = ArticleStore('data/training/polygon_news')
+    store.upsert(records)                        # dicts with ticker + article fields
+    store.import_csv('data/training/polygon_news_2024_checkpoint_50.csv')
+    for batch in store.scan(tickers=['AAPL'], start='2025-01', end='2025-06'):
+        ...
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+DEFAULT_STORE_DIR = Path('data/training/polygon_news')
+COMPACT_PARTS = 16  # Files per month before they are merged into one
+UNKNOWN_MONTH = 'unknown'  # Partition for articles without a parseable publish time
+_SQL_CHUNK = 500  # Keys per IN (...) lookup
+
+ARTICLE_SCHEMA = pa.schema([
+    ('article_id', pa.string()),
+    ('published_utc', pa.string()),  # ISO 8601 UTC, e.g. 2025-03-04T13:05:00Z
+    ('title', pa.string()),
+    ('description', pa.string()),
+    ('article_url', pa.string()),
+    ('publisher', pa.string()),
+    ('image_url', pa.string()),
+])
+
+# Per-ticker article rows, as in the polygon_news_*.csv exports
+EXPORT_COLUMNS = ['ticker', 'published_utc', 'title', 'description', 'article_url', 'publisher', 'image_url']
+
+
+def normalize_published(values: pd.Series) -> pd.Series:
+    """Mixed-format publish times (ISO with Z, '+00:00', space-separated) → ISO 8601 UTC strings"""
+    parsed = pd.to_datetime(values, format='mixed', utc=True, errors='coerce')
+    return parsed.dt.strftime('%Y-%m-%dT%H:%M:%SZ').where(parsed.notna(), None)
+
+
+def _chunks(items: List, size: int = _SQL_CHUNK) -> Iterator[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class ArticleStore:
+    def __init__(self, root: Union[str, Path] = DEFAULT_STORE_DIR):
+        self.root = Path(root)
+        self.articles_dir = self.root / 'articles'
+        self.articles_dir.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(self.root / 'articles.sqlite', check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS articles (
+            article_id TEXT PRIMARY KEY,
+            article_url TEXT,
+            month TEXT NOT NULL)""")
+        self.conn.execute('CREATE INDEX IF NOT EXISTS articles_url ON articles (article_url)')
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS article_tickers (
+            article_id TEXT NOT NULL,
+            ticker TEXT NOT NULL,
+            month TEXT NOT NULL,
+            PRIMARY KEY (article_id, ticker))""")
+        self.conn.execute('CREATE INDEX IF NOT EXISTS article_tickers_month ON article_tickers (month, ticker)')
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS imports (
+            source TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL)""")
+
+    @contextmanager
+    def _transaction(self):
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    def _month_dir(self, month: str) -> Path:
+        return self.articles_dir / f'month={month}'
+
+    def _parts(self, month: str) -> List[Path]:
+        return sorted(self._month_dir(month).glob('part-*.parquet'))
+
+    def _write_part(self, month: str, table: pa.Table) -> Path:
+        month_dir = self._month_dir(month)
+        month_dir.mkdir(parents=True, exist_ok=True)
+        parts = self._parts(month)
+        number = int(parts[-1].stem.split('-')[1]) + 1 if parts else 1
+        path = month_dir / f'part-{number:05d}.parquet'
+        tmp_path = path.with_name(f'_{path.name}.tmp')  # '_' prefix: skipped by the month readers
+        pq.write_table(table, tmp_path, compression='snappy')
+        os.replace(tmp_path, path)
+        return path
+
+    def _known(self, column: str, values: List[str]) -> Dict[str, Tuple[str, str]]:
+        """column value → (article_id, month) for indexed articles"""
+        known = {}
+        for chunk in _chunks(values):
+            placeholders = ','.join('?' * len(chunk))
+            for article_id, url, month in self.conn.execute(
+                f'SELECT article_id, article_url, month FROM articles WHERE {column} IN ({placeholders})', chunk
+            ):
+                known[article_id if column == 'article_id' else url] = (article_id, month)
+        return known
+
+    def upsert(self, records: Union[pd.DataFrame, Iterable[Dict]]) -> Tuple[int, int]:
+        """
+        Add articles (with the ticker they were fetched for) not stored yet
+
+        Records carry `ticker` plus the ARTICLE_SCHEMA fields; `article_id` may be
+        missing, in which case the article is keyed by its URL. Articles are immutable
+        once stored, so known keys only gain ticker links.
+        Returns (new articles, new ticker links).
+        """
+        df = records.copy() if isinstance(records, pd.DataFrame) else pd.DataFrame.from_records(list(records))
+        if len(df) == 0:
+            return 0, 0
+        df = df.reindex(columns=['ticker'] + ARTICLE_SCHEMA.names)
+        df['published_utc'] = normalize_published(df['published_utc'])
+        df['month'] = df['published_utc'].str.slice(0, 7).fillna(UNKNOWN_MONTH)
+        df = df[df['article_id'].notna() | df['article_url'].notna()]
+        for col in ARTICLE_SCHEMA.names:
+            df[col] = df[col].astype(object).where(df[col].notna(), None).map(lambda v: v if v is None else str(v))
+
+        with self._transaction() as db:
+            # Resolve every record to its stored key: by id, then by URL, else a new key
+            known_ids = self._known('article_id', df['article_id'].dropna().unique().tolist())
+            known_urls = self._known('article_url', df['article_url'].dropna().unique().tolist())
+
+            batch_ids = {url: article_id for url, article_id in zip(df['article_url'], df['article_id'])
+                         if url is not None and article_id is not None}
+
+            def resolve(article_id, url, month):
+                if article_id is not None and article_id in known_ids:
+                    return known_ids[article_id]
+                if url is not None and url in known_urls and (article_id is None or known_urls[url][0].startswith('url:')):
+                    return known_urls[url]
+                if article_id is None:
+                    article_id = batch_ids.get(url) or f'url:{url}'
+                return article_id, month
+
+            keys = [resolve(a, u, m) for a, u, m in zip(df['article_id'], df['article_url'], df['month'])]
+            df['article_id'] = [key for key, _ in keys]
+            df['month'] = [month for _, month in keys]
+            df['month'] = df.groupby('article_id')['month'].transform('first')  # One partition per article
+
+            stored = {key for key, _ in known_ids.values()} | {key for key, _ in known_urls.values()}
+            new = df[~df['article_id'].isin(stored)].drop_duplicates(subset=['article_id'], keep='first')
+            for month, rows in new.groupby('month', sort=True):
+                self._write_part(month, pa.Table.from_pandas(rows[ARTICLE_SCHEMA.names], schema=ARTICLE_SCHEMA,
+                                                             preserve_index=False))
+            db.executemany('INSERT OR IGNORE INTO articles (article_id, article_url, month) VALUES (?, ?, ?)',
+                           new[['article_id', 'article_url', 'month']].itertuples(index=False, name=None))
+
+            links = df[df['ticker'].notna()].drop_duplicates(subset=['article_id', 'ticker'])
+            before = db.total_changes
+            db.executemany('INSERT OR IGNORE INTO article_tickers (article_id, ticker, month) VALUES (?, ?, ?)',
+                           links[['article_id', 'ticker', 'month']].astype(str).itertuples(index=False, name=None))
+            new_links = db.total_changes - before
+
+        for month in new['month'].unique():
+            if len(self._parts(month)) >= COMPACT_PARTS:
+                self.compact(month)
+        return len(new), new_links
+
+    def compact(self, month: Optional[str] = None):
+        """Merge a month's files (every month if None) into one, dropping duplicate keys"""
+        months = [month] if month is not None else self.months()
+        for month in months:
+            with self.lock:
+                parts = self._parts(month)
+                if len(parts) < 2:
+                    continue
+                table = pq.read_table(self._month_dir(month), schema=ARTICLE_SCHEMA)
+                df = table.to_pandas().drop_duplicates(subset=['article_id'], keep='first')
+                merged = self._write_part(month, pa.Table.from_pandas(df, schema=ARTICLE_SCHEMA, preserve_index=False))
+                for part in parts:
+                    if part != merged:
+                        part.unlink()
+
+    def months(self) -> List[str]:
+        return sorted(path.name.split('=', 1)[1] for path in self.articles_dir.glob('month=*') if path.is_dir())
+
+    def is_imported(self, source: Union[str, Path]) -> bool:
+        """True if source (a file) was imported unchanged before"""
+        stat = os.stat(source)
+        with self.lock:
+            row = self.conn.execute('SELECT size, mtime FROM imports WHERE source = ?', (str(source),)).fetchone()
+        return row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime
+
+    def mark_imported(self, source: Union[str, Path]):
+        stat = os.stat(source)
+        with self._transaction() as db:
+            db.execute('INSERT OR REPLACE INTO imports (source, size, mtime) VALUES (?, ?, ?)',
+                       (str(source), stat.st_size, stat.st_mtime))
+
+    def import_csv(self, path: Union[str, Path], chunksize: int = 50_000) -> Tuple[int, int]:
+        """
+        Upsert a polygon_news_*.csv (e.g. a legacy checkpoint) in chunks; a file already
+        imported unchanged is skipped. Returns (new articles, new ticker links).
+        """
+        if self.is_imported(path):
+            return 0, 0
+        new_articles = new_links = 0
+        for chunk in pd.read_csv(path, chunksize=chunksize, dtype=str):
+            added = self.upsert(chunk)
+            new_articles += added[0]
+            new_links += added[1]
+        self.mark_imported(path)
+        return new_articles, new_links
+
+    def counts(self) -> Tuple[int, int]:
+        """(unique articles, ticker links)"""
+        with self.lock:
+            return (self.conn.execute('SELECT COUNT(*) FROM articles').fetchone()[0],
+                    self.conn.execute('SELECT COUNT(*) FROM article_tickers').fetchone()[0])
+
+    def link_count(self, ticker: str, start: str, end: str) -> int:
+        """Articles stored for ticker published in the inclusive 'YYYY-MM' range start..end"""
+        with self.lock:
+            return self.conn.execute(
+                'SELECT COUNT(*) FROM article_tickers WHERE ticker = ? AND month BETWEEN ? AND ?', (ticker, start, end)
+            ).fetchone()[0]
+
+    def scan(
+        self,
+        tickers: Optional[Iterable[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        columns: Optional[List[str]] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Lazily yield (ticker, article) rows one month at a time, oldest month first
+
+        start / end are inclusive 'YYYY-MM' bounds. Rows within a month follow the
+        order the links were stored in. Only `columns` (default: article_id + EXPORT_COLUMNS)
+        are read from disk.
+        """
+        columns = columns or ['article_id'] + EXPORT_COLUMNS
+        article_columns = [col for col in ARTICLE_SCHEMA.names if col in columns or col == 'article_id']
+        tickers = None if tickers is None else list(dict.fromkeys(tickers))
+
+        for month in self.months():
+            if month != UNKNOWN_MONTH and ((start and month < start) or (end and month > end)):
+                continue
+            if month == UNKNOWN_MONTH and (start or end):
+                continue
+
+            with self.lock:
+                query = 'SELECT article_id, ticker FROM article_tickers WHERE month = ?'
+                if tickers is None:
+                    links = self.conn.execute(query + ' ORDER BY rowid', (month,)).fetchall()
+                else:
+                    links = []
+                    for chunk in _chunks(tickers):
+                        links += self.conn.execute(
+                            query + f" AND ticker IN ({','.join('?' * len(chunk))}) ORDER BY rowid", [month] + chunk
+                        ).fetchall()
+            if not links:
+                continue
+            links = pd.DataFrame(links, columns=['article_id', 'ticker'])
+
+            dataset = ds.dataset(self._month_dir(month), schema=ARTICLE_SCHEMA, format='parquet')
+            ids = pa.array(links['article_id'].unique(), pa.string())
+            articles = dataset.to_table(columns=article_columns, filter=pc.is_in(ds.field('article_id'), ids))
+            articles = articles.to_pandas().drop_duplicates(subset=['article_id'], keep='first')
+            yield links.merge(articles, on='article_id', how='inner')[columns]
+
+    def read(
+        self,
+        tickers: Optional[Iterable[str]] = None,
+        years: Optional[Iterable[int]] = None,
+        columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        (ticker, article) rows for tickers / publication years as one frame
+
+        Rows are ordered by year, then by ticker (in the order given, else alphabetical),
+        then by publish time, like the per-year CSVs the harvest scripts write.
+        """
+        columns = columns or EXPORT_COLUMNS
+        scan_columns = list(dict.fromkeys(columns + ['ticker', 'published_utc']))
+        if years is None:
+            batches = list(self.scan(tickers, columns=scan_columns))
+        else:
+            batches = [batch for year in sorted(set(years))
+                       for batch in self.scan(tickers, f'{year}-01', f'{year}-12', columns=scan_columns)]
+        if not batches:
+            return pd.DataFrame(columns=columns)
+        df = pd.concat(batches, ignore_index=True)
+
+        ticker_order = list(dict.fromkeys(tickers)) if tickers is not None else sorted(df['ticker'].unique())
+        df['_ticker_order'] = df['ticker'].map({ticker: i for i, ticker in enumerate(ticker_order)})
+        df['_year'] = df['published_utc'].str.slice(0, 4)
+        df = df.sort_values(['_year', '_ticker_order', 'published_utc'], kind='stable', na_position='last')
+        return df[columns].reset_index(drop=True)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Concurrent Polygon News Harvester with Resumable Cursors
+
+Shared engine behind the polygon-news*.py scripts. (ticker, year) jobs are fetched
+concurrently over one pooled HTTP session; a shared token bucket keeps the pool
+within the plan's request rate ('free' = 5 calls/min, 'paid' = effectively
+unthrottled), so paid plans get full throughput and free plans never trip 429s.
+
+Articles end up in the deduplicating ArticleStore (polygon_article_store.py):
+one copy per Polygon article id, partitioned by month, plus ticker links.
+
+While a (ticker, year) is being paged through, every page is spooled under
+<root>/_spool/ and its Polygon next_url cursor committed to <root>/cursors.sqlite
+before the next request, so a restarted harvest continues at the exact page where
+the previous one stopped and never refetches a page. Once the last page arrives
+the spooled pages are upserted into the article store.
+
+A (ticker, year) is finished for good only once the year has ended. A year still
+in progress is fetched again by every harvest, starting from the newest article
+already stored for it, so reruns pick up articles published since the last one.
+
+Usage:
+    harvester = PolygonNewsHarvester(os.getenv('POLYGON_API_KEY'), tier='paid')
+    harvester.harvest(['AAPL', 'MSFT'], [2024, 2025])
+    df = harvester.store.read(years=[2025])
+"""
+
+import os
+import shutil
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+from requests.adapters import HTTPAdapter
+
+from polygon_article_store import DEFAULT_STORE_DIR, ArticleStore, normalize_published
+from rate_limiter import TokenBucketLimiter
+
+NEWS_URL = 'https://api.polygon.io/v2/reference/news'
+ARTICLES_PER_PAGE = 1000  # Polygon max is 1000
+MAX_RETRIES = 3  # Retries of a page after HTTP 429
+DEFAULT_BACKOFF_SECONDS = 60  # Pause after HTTP 429 when no Retry-After header is sent
+
+DEFAULT_TIER = os.getenv('POLYGON_TIER', 'free')
+
+# Plan → (requests per minute, concurrent (ticker, year) jobs)
+TIERS = {
+    'free': (5, 2),  # 5 calls/min
+    'paid': (6000, 16),  # Paid plans are unlimited; stay well under Polygon's soft cap
+}
+
+# Spooled pages: one row per (ticker, article) as returned
+PAGE_SCHEMA = pa.schema([
+    ('article_id', pa.string()),
+    ('ticker', pa.string()),
+    ('published_utc', pa.string()),
+    ('title', pa.string()),
+    ('description', pa.string()),
+    ('article_url', pa.string()),
+    ('publisher', pa.string()),
+    ('image_url', pa.string()),
+])
+
+
+def year_closed(year: int) -> bool:
+    """True once no more articles can be published in `year` (UTC)"""
+    return year < datetime.now(timezone.utc).year
+
+
+def article_record(ticker: str, article: Dict) -> Dict:
+    """One Polygon news result → PAGE_SCHEMA row"""
+    return {
+        'article_id': article.get('id') or article.get('article_url'),
+        'ticker': ticker,
+        'published_utc': article.get('published_utc'),
+        'title': article.get('title'),
+        'description': article.get('description'),
+        'article_url': article.get('article_url'),
+        'publisher': (article.get('publisher') or {}).get('name'),
+        'image_url': article.get('image_url'),
+    }
+
+
+class NewsStore:
+    """Article store plus per-(ticker, year) page spools and next_url cursors"""
+
+    def __init__(self, root: Union[str, Path] = DEFAULT_STORE_DIR):
+        self.root = Path(root)
+        self.articles = ArticleStore(self.root)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.root / 'cursors.sqlite', check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS cursors (
+            ticker TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            pages INTEGER NOT NULL DEFAULT 0,
+            next_url TEXT,
+            done INTEGER NOT NULL DEFAULT 0,
+            articles INTEGER NOT NULL DEFAULT 0,
+            last_published TEXT,
+            PRIMARY KEY (ticker, year))""")
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(cursors)')}
+        if 'last_published' not in columns:
+            self.conn.execute('ALTER TABLE cursors ADD COLUMN last_published TEXT')
+
+    @contextmanager
+    def _transaction(self):
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    def _pages_dir(self, ticker: str, year: int) -> Path:
+        return self.root / '_spool' / f'year={year}' / f'ticker={ticker}'
+
+    def _page_path(self, ticker: str, year: int, page: int) -> Path:
+        return self._pages_dir(ticker, year) / f'page-{page:05d}.parquet'
+
+    def cursor(self, ticker: str, year: int) -> Tuple[int, Optional[str], bool]:
+        """(pages stored, next_url to fetch, finished) for a (ticker, year)"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT pages, next_url, done FROM cursors WHERE ticker = ? AND year = ?', (ticker, year)
+            ).fetchone()
+        if row is None:
+            return 0, None, False
+        pages, next_url, done = row
+        if not done and any(not self._page_path(ticker, year, page).exists() for page in range(1, pages + 1)):
+            # Spooled pages were lost; the cursor can't be trusted
+            self.reset(ticker, year)
+            return 0, None, False
+        return pages, next_url, bool(done)
+
+    def last_published(self, ticker: str, year: int) -> Optional[str]:
+        """publish time of the newest article stored by an earlier pass over (ticker, year)"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT last_published FROM cursors WHERE ticker = ? AND year = ?', (ticker, year)
+            ).fetchone()
+        return row[0] if row else None
+
+    def reopen(self, ticker: str, year: int):
+        """Start a new pass over a finished (ticker, year), keeping its last_published resume point"""
+        with self._transaction() as db:
+            db.execute('UPDATE cursors SET pages = 0, next_url = NULL, done = 0 WHERE ticker = ? AND year = ?',
+                       (ticker, year))
+        shutil.rmtree(self._pages_dir(ticker, year), ignore_errors=True)
+
+    def reset(self, ticker: str, year: int):
+        """Forget a (ticker, year) entirely so it is fetched again from the first page"""
+        with self._transaction() as db:
+            db.execute('DELETE FROM cursors WHERE ticker = ? AND year = ?', (ticker, year))
+        shutil.rmtree(self._pages_dir(ticker, year), ignore_errors=True)
+
+    def write_page(self, ticker: str, year: int, page: int, records: List[Dict], next_url: Optional[str]):
+        """Store page `page` atomically, then advance the cursor past it"""
+        path = self._page_path(ticker, year, page)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        pq.write_table(pa.Table.from_pylist(records, schema=PAGE_SCHEMA), tmp_path, compression='snappy')
+        os.replace(tmp_path, path)
+        with self._transaction() as db:
+            db.execute(
+                """INSERT INTO cursors (ticker, year, pages, next_url) VALUES (?, ?, ?, ?)
+                   ON CONFLICT (ticker, year) DO UPDATE SET pages = excluded.pages, next_url = excluded.next_url""",
+                (ticker, year, page, next_url)
+            )
+
+    def complete(self, ticker: str, year: int) -> int:
+        """
+        Upsert the spooled pages into the article store and record the newest publish
+        time as the resume point of the next pass; returns the articles in this pass
+        """
+        pages, _, _ = self.cursor(ticker, year)
+        tables = [pq.read_table(self._page_path(ticker, year, page), schema=PAGE_SCHEMA)
+                  for page in range(1, pages + 1)]
+        df = pa.concat_tables(tables).to_pandas() if tables else PAGE_SCHEMA.empty_table().to_pandas()
+        self.articles.upsert(df)
+        newest = normalize_published(df['published_utc']).max() if len(df) else None
+        stored = self.articles.link_count(ticker, f'{year}-01', f'{year}-12')
+        with self._transaction() as db:
+            db.execute(
+                """INSERT INTO cursors (ticker, year, pages, next_url, done, articles, last_published)
+                   VALUES (?, ?, ?, NULL, 1, ?, ?)
+                   ON CONFLICT (ticker, year) DO UPDATE SET
+                       next_url = NULL, done = 1, articles = excluded.articles,
+                       last_published = COALESCE(MAX(last_published, excluded.last_published),
+                                                 last_published, excluded.last_published)""",
+                (ticker, year, pages, stored, None if pd.isna(newest) else newest)
+            )
+        shutil.rmtree(self._pages_dir(ticker, year), ignore_errors=True)
+        return df['article_id'].nunique()
+
+    def read(self, tickers: Optional[Iterable[str]] = None, years: Optional[Iterable[int]] = None) -> pd.DataFrame:
+        """Stored articles (EXPORT_COLUMNS, by year, ticker, date), optionally limited to tickers / years"""
+        return self.articles.read(tickers, years)
+
+    def close(self):
+        self.conn.close()
+        self.articles.close()
+
+
+class PolygonNewsHarvester:
+    def __init__(
+        self,
+        api_key: str,
+        tier: str = DEFAULT_TIER,
+        store: Optional[NewsStore] = None,
+        requests_per_minute: Optional[float] = None,
+        workers: Optional[int] = None
+    ):
+        tier_rate, tier_workers = TIERS[tier]
+        self.api_key = api_key
+        self.store = store or NewsStore()
+        self.requests_per_minute = requests_per_minute or tier_rate
+        self.workers = workers or tier_workers
+        self.limiter = TokenBucketLimiter(self.requests_per_minute)
+
+        # One pooled session for all workers
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=self.workers))
+
+    def estimated_hours(self, requests_needed: int) -> float:
+        return requests_needed / self.requests_per_minute / 60
+
+    def fetch(self, ticker: str, year: int) -> Optional[int]:
+        """
+        Page through one (ticker, year) from its stored cursor into the store
+
+        Returns the articles fetched once the last page is in, or None if the fetch
+        stopped early (HTTP error, timeout, repeated HTTP 429); the cursor is kept so
+        the next harvest continues from the page that failed. A finished year still
+        in progress is fetched again from its newest stored article.
+        """
+        pages, next_url, done = self.store.cursor(ticker, year)
+        if done:
+            if year_closed(year):
+                return None
+            self.store.reopen(ticker, year)
+            pages, next_url = 0, None
+        since = self.store.last_published(ticker, year)
+        if pages:
+            print(f"  ↩️  {ticker} {year}: resuming after page {pages}")
+        elif since:
+            print(f"  🔄 {ticker} {year}: fetching articles published since {since}")
+
+        retries = 0
+
+        while True:
+            # Use next_url if available, otherwise build initial request
+            if next_url:
+                separator = '&' if '?' in next_url else '?'
+                url = f"{next_url}{separator}apiKey={self.api_key}"
+            else:
+                params = {
+                    'ticker': ticker,
+                    'published_utc.gte': since or f'{year}-01-01',  # Articles at `since` are deduplicated on upsert
+                    'published_utc.lte': f'{year}-12-31',
+                    'order': 'asc',
+                    'limit': ARTICLES_PER_PAGE,
+                    'apiKey': self.api_key,
+                }
+                url = f"{NEWS_URL}?{requests.compat.urlencode(params)}"
+
+            self.limiter.acquire()
+            try:
+                response = self.session.get(url, timeout=30)
+
+                if response.status_code == 429:
+                    retries += 1
+                    if retries > MAX_RETRIES:
+                        print(f"🚫 Still rate limited for {ticker} {year} after {MAX_RETRIES} retries, will resume on the next run")
+                        return None
+                    try:
+                        backoff = float(response.headers.get('Retry-After', DEFAULT_BACKOFF_SECONDS))
+                    except ValueError:
+                        backoff = DEFAULT_BACKOFF_SECONDS
+                    print(f"⚠️  Rate limited for {ticker} {year}, pausing all workers for {backoff:.0f}s...")
+                    self.limiter.pause(backoff)
+                    continue
+
+                if response.status_code != 200:
+                    print(f"❌ Error: {response.status_code} for {ticker} {year}")
+                    return None
+
+                data = response.json()
+
+                if data.get('status') == 'ERROR':
+                    print(f"❌ API Error for {ticker} {year}: {data.get('message', 'Unknown error')}")
+                    return None
+
+            except requests.exceptions.Timeout:
+                print(f"⚠️  Timeout for {ticker} {year}, will resume on the next run")
+                return None
+            except Exception as e:
+                print(f"❌ Unexpected error for {ticker} {year}: {e}")
+                return None
+
+            retries = 0
+            articles = data.get('results', [])
+            if articles:
+                pages += 1
+                next_url = data.get('next_url')
+                self.store.write_page(ticker, year, pages, [article_record(ticker, a) for a in articles], next_url)
+                print(f"  {ticker} {year}: Retrieved {len(articles)} articles (page {pages})")
+            if not articles or not next_url:
+                return self.store.complete(ticker, year)
+
+    def harvest(self, tickers: List[str], years: List[int]) -> Dict[Tuple[str, int], Optional[int]]:
+        """
+        Fetch every (ticker, year) not yet complete, up to `workers` at once
+
+        Returns (ticker, year) → articles fetched (None where the fetch stopped early).
+        Jobs complete in the store for a year that has ended are skipped without any
+        request; years still in progress are always fetched for newer articles.
+        """
+        jobs = [(ticker, year) for year in years for ticker in tickers
+                if not (self.store.cursor(ticker, year)[2] and year_closed(year))]
+        print(f"📊 {len(jobs)} (ticker, year) jobs to fetch, {len(tickers) * len(years) - len(jobs)} already stored")
+        print(f"⏱️  {self.requests_per_minute:g} requests/min across {self.workers} workers")
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.fetch, ticker, year): (ticker, year) for ticker, year in jobs}
+            for i, future in enumerate(as_completed(futures), 1):
+                ticker, year = futures[future]
+                results[(ticker, year)] = future.result()
+                if results[(ticker, year)] is None:
+                    print(f"   [{i}/{len(jobs)}] ⚠️  {ticker} {year}: incomplete")
+                else:
+                    print(f"   [{i}/{len(jobs)}] ✅ {ticker} {year}: {results[(ticker, year)]} articles fetched")
+        return results
@@ -2,6 +2,8 @@
 """
 Early Signal Detection - Persistent Prediction Server
 Loads model once and handles multiple predictions via stdin/stdout
+Requests with an "id" field run on a worker pool and are answered out of order
+(response echoes the "id"); requests without one are answered serially, in order
 """
 
 import sys
@@ -9,6 +11,8 @@ import json
 import lightgbm as lgb
 import numpy as np
 
+from stdio_request_loop import ConcurrentRequestLoop
+
 class PredictionServer:
     def __init__(self):
         """Initialize server and load model"""
@@ -94,36 +98,26 @@ class PredictionServer:
             'confidenceLevel': confidence_level
         }
 
+    def handle_request(self, request: dict) -> dict:
+        """Handle one parsed request (thread-safe)"""
+        features = request.get('features')
+
+        if not features or len(features) != 34:
+            return {
+                'success': False,
+                'error': f'Expected 34 features, got {len(features) if features else 0}'
+            }
+
+        # Make prediction
+        result = self.predict(features)
+        return {
+            'success': True,
+            'data': result
+        }
+
     def run(self):
-        """Run prediction server loop"""
-        for line in sys.stdin:
-            try:
-                # Parse request
-                request = json.loads(line.strip())
-                features = request.get('features')
-
-                if not features or len(features) != 34:
-                    response = {
-                        'success': False,
-                        'error': f'Expected 34 features, got {len(features) if features else 0}'
-                    }
-                else:
-                    # Make prediction
-                    result = self.predict(features)
-                    response = {
-                        'success': True,
-                        'data': result
-                    }
-
-                # Send response
-                print(json.dumps(response), flush=True)
-
-            except Exception as e:
-                response = {
-                    'success': False,
-                    'error': str(e)
-                }
-                print(json.dumps(response), flush=True)
+        """Run prediction server loop (requests with an "id" run concurrently)"""
+        ConcurrentRequestLoop(self.handle_request).run()
 
 if __name__ == '__main__':
     server = PredictionServer()
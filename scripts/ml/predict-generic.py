@@ -6,13 +6,30 @@ Loads LightGBM models dynamically and handles multiple predictions via stdin/std
 Architecture:
 - Persistent Python process (spawn once, use many times)
 - Load model and normalizer from paths provided in request
-- Z-score normalization using normalizer.json parameters
+- Z-score normalization using normalizer.json parameters, compiled once per file into
+  contiguous mean/inv-std arrays and checked against the model's feature_name() order
 - JSON-based stdin/stdout communication
-- Real LightGBM inference (NO MOCK DATA)
+- Requests with an "id" field run on a worker pool and are answered out of order
+  (response echoes the "id"); requests without one are answered serially, in order
+- Real LightGBM inference (NO MOCK DATA); ML_PREDICT_ENGINE=numpy scores model.txt with
+  the vectorized NumpyTreeEnsemble (lightgbm_numpy.py) instead of lgb.Booster
 
 Request Format:
 {
-  "features": {"feature1": value1, "feature2": value2, ...},
+  "features": {"feature1": value1, "feature2": value2, ...},   # or a list already in model column order
+  "modelPath": "/path/to/model.txt",
+  "normalizerPath": "/path/to/normalizer.json"
+}
+
+Cache Commands (for deploy scripts; models are also reloaded automatically when model.txt changes):
+{"command": "load",  "modelPath": "...", "normalizerPath": "..."}   # warm the cache
+{"command": "evict", "modelPath": "...", "normalizerPath": "..."}   # drop from the cache
+{"command": "stats"}                                                 # cache occupancy
+Budgets: ML_MODEL_CACHE_MAX_ENTRIES / ML_MODEL_CACHE_MAX_BYTES (LRU eviction)
+
+Batch Request Format (one normalization pass + one Booster.predict call):
+{
+  "featuresBatch": [{"feature1": value1, ...}, {"feature1": value1, ...}, ...],
   "modelPath": "/path/to/model.txt",
   "normalizerPath": "/path/to/normalizer.json"
 }
@@ -30,43 +47,151 @@ Response Format:
     }
   }
 }
+
+Batch Response Format:
+{
+  "success": true,
+  "data": {
+    "predictions": [ {prediction, confidence, probability}, ... ]   # Same order as featuresBatch
+  }
+}
 """
 
 import sys
 import json
-import lightgbm as lgb
+import os
 import numpy as np
-from typing import Dict, Any, Optional
+from operator import itemgetter
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+from lightgbm_numpy import NumpyTreeEnsemble, UnsupportedModelError
+from model_cache import FileLRUCache, env_int
+from stdio_request_loop import ConcurrentRequestLoop
+
+try:
+    import lightgbm as lgb
+except ImportError:
+    # Only the numpy engine (ML_PREDICT_ENGINE=numpy) is usable without lightgbm
+    lgb = None
+
+# lgb.Booster or NumpyTreeEnsemble (same predict/num_feature/feature_name/num_trees interface)
+TreeModel = Any
+
+FeatureRow = Union[Dict[str, float], List[float]]
+
+
+class NormalizerPlan:
+    """Precompiled z-score normalizer: ordered feature index plus contiguous mean/inv-std arrays"""
+
+    def __init__(self, feature_names: Optional[List[str]], mean: Any, std: Any):
+        self.mean = np.ascontiguousarray(mean, dtype=np.float64)
+        self.std = np.ascontiguousarray(std, dtype=np.float64)
+        if self.mean.ndim != 1 or self.mean.shape != self.std.shape:
+            raise Exception(f'mean/std shape mismatch: {self.mean.shape} vs {self.std.shape}')
+        if feature_names is not None and len(feature_names) != len(self.mean):
+            raise Exception(f'feature_names has {len(feature_names)} entries, expected {len(self.mean)}')
+
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.num_features = len(self.mean)
+        # Zero-variance features normalize to 0.0 instead of dividing by zero
+        self.zero_std = self.std == 0
+        self.has_zero_std = bool(self.zero_std.any())
+        self.inv_std = np.divide(1.0, self.std, out=np.zeros_like(self.std), where=~self.zero_std)
+        self._getter = itemgetter(*self.feature_names) if self.feature_names else None
+
+    def reordered(self, feature_names: List[str]) -> 'NormalizerPlan':
+        """Return a plan whose columns follow feature_names (a permutation of this plan's names)"""
+        index = {name: i for i, name in enumerate(self.feature_names)}
+        order = np.array([index[name] for name in feature_names], dtype=np.intp)
+        return NormalizerPlan(feature_names, self.mean[order], self.std[order])
+
+    def gather(self, rows: List[FeatureRow]) -> np.ndarray:
+        """Build the raw (n_rows, n_features) matrix in plan column order"""
+        values = []
+        for i, row in enumerate(rows):
+            if isinstance(row, dict) and self._getter is not None:
+                try:
+                    picked = self._getter(row)
+                except KeyError as e:
+                    raise Exception(f'Missing feature: {e.args[0]}' + (f' (row {i})' if len(rows) > 1 else ''))
+                values.append(picked if self.num_features > 1 else (picked,))
+            else:
+                # Positional row (list, or dict against a normalizer without feature names)
+                picked = list(row.values()) if isinstance(row, dict) else row
+                if len(picked) != self.num_features:
+                    raise Exception(f'Feature count mismatch: got {len(picked)} features, expected {self.num_features}')
+                values.append(picked)
+        return np.array(values, dtype=np.float64)
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Vectorized z-score: (X - mean) * inv_std"""
+        X_norm = (X - self.mean) * self.inv_std
+        if self.has_zero_std:
+            X_norm[:, self.zero_std] = 0.0
+        return X_norm
+
 
 class GenericPredictionServer:
     def __init__(self):
         """Initialize prediction server"""
-        self.model_cache: Dict[str, lgb.Booster] = {}
-        self.normalizer_cache: Dict[str, Dict[str, Any]] = {}
+        # "lightgbm" (lgb.Booster) or "numpy" (NumpyTreeEnsemble, falls back to lightgbm for unsupported models)
+        self.engine = os.environ.get('ML_PREDICT_ENGINE', 'lightgbm').lower()
+        if self.engine not in ('lightgbm', 'numpy'):
+            raise Exception(f'Unknown ML_PREDICT_ENGINE: {self.engine}')
+        # Bounded LRU caches that reload entries whose file changed on disk (e.g. after a retrain)
+        self.model_cache = FileLRUCache(
+            'model',
+            max_entries=env_int('ML_MODEL_CACHE_MAX_ENTRIES', 16),
+            max_bytes=env_int('ML_MODEL_CACHE_MAX_BYTES', 2 * 1024 ** 3),
+            on_evict=self._forget_plans
+        )
+        self.normalizer_cache = FileLRUCache(
+            'normalizer',
+            max_entries=env_int('ML_NORMALIZER_CACHE_MAX_ENTRIES', 64),
+            max_bytes=env_int('ML_NORMALIZER_CACHE_MAX_BYTES', 64 * 1024 ** 2),
+            on_evict=self._forget_plans
+        )
+        # Plans checked (and if needed reordered) against each model's feature_name(),
+        # stored with the model/normalizer objects they were resolved against
+        self.plan_cache: Dict[Tuple[str, str], Tuple[TreeModel, NormalizerPlan, NormalizerPlan]] = {}
         sys.stderr.write('READY\n')
         sys.stderr.flush()
 
-    def load_model(self, model_path: str) -> lgb.Booster:
-        """Load LightGBM model from file (cached)"""
-        if model_path in self.model_cache:
-            sys.stderr.write(f'Model cache HIT: {model_path}\n')
-            sys.stderr.flush()
-            return self.model_cache[model_path]
+    def _forget_plans(self, path: str) -> None:
+        """Drop resolved plans that reference an evicted model or normalizer"""
+        for key in list(self.plan_cache.keys()):
+            if path in key:
+                self.plan_cache.pop(key, None)
+
+    def load_model(self, model_path: str) -> TreeModel:
+        """Load LightGBM model from file (cached, reloaded if the file changed)"""
+        return self.model_cache.get(model_path, self._read_model)
 
+    def _read_model(self, model_path: str) -> TreeModel:
         try:
-            model = lgb.Booster(model_file=model_path)
-            self.model_cache[model_path] = model
-            sys.stderr.write(f'Model loaded: {model_path} (num_trees={model.num_trees()}, num_features={model.num_feature()})\n')
+            model = None
+            if self.engine == 'numpy':
+                try:
+                    model = NumpyTreeEnsemble.from_file(model_path)
+                except UnsupportedModelError as e:
+                    if lgb is None:
+                        raise
+                    sys.stderr.write(f'NumPy engine cannot compile {model_path} ({str(e)}), using lightgbm\n')
+            if model is None:
+                if lgb is None:
+                    raise Exception('lightgbm is not installed (set ML_PREDICT_ENGINE=numpy)')
+                model = lgb.Booster(model_file=model_path)
+            sys.stderr.write(f'Model loaded: {model_path} (engine={type(model).__name__}, num_trees={model.num_trees()}, num_features={model.num_feature()})\n')
             sys.stderr.flush()
             return model
         except Exception as e:
             raise Exception(f'Failed to load model from {model_path}: {str(e)}')
 
-    def load_normalizer(self, normalizer_path: str) -> Dict[str, Any]:
-        """Load normalizer parameters from JSON (cached)"""
-        if normalizer_path in self.normalizer_cache:
-            return self.normalizer_cache[normalizer_path]
+    def load_normalizer(self, normalizer_path: str) -> NormalizerPlan:
+        """Load normalizer parameters from JSON and compile them into a NormalizerPlan (cached)"""
+        return self.normalizer_cache.get(normalizer_path, self._read_normalizer)
 
+    def _read_normalizer(self, normalizer_path: str) -> NormalizerPlan:
         try:
             with open(normalizer_path, 'r') as f:
                 normalizer_data = json.load(f)
@@ -75,83 +200,87 @@ class GenericPredictionServer:
             if 'mean' in normalizer_data and ('std' in normalizer_data or 'scale' in normalizer_data):
                 # Array-based format: {"mean": [...], "std": [...]} or {"mean": [...], "scale": [...]}
                 # Support both "std" and "scale" as they're equivalent (standard deviation)
-                if 'scale' in normalizer_data and 'std' not in normalizer_data:
-                    normalizer_data['std'] = normalizer_data['scale']
-                self.normalizer_cache[normalizer_path] = normalizer_data
+                std = normalizer_data['std'] if 'std' in normalizer_data else normalizer_data['scale']
+                feature_names = normalizer_data.get('feature_names', normalizer_data.get('features'))
+                plan = NormalizerPlan(feature_names, normalizer_data['mean'], std)
             elif 'params' in normalizer_data:
                 # Dict-based format: {"params": {"feature1": {"mean": ..., "stdDev": ...}, ...}}
                 params = normalizer_data['params']
-                mean_dict = {k: v['mean'] for k, v in params.items()}
-                std_dict = {k: v['stdDev'] for k, v in params.items()}
-                self.normalizer_cache[normalizer_path] = {
-                    'mean': mean_dict,
-                    'std': std_dict,
-                    'feature_names': list(params.keys())
-                }
+                feature_names = list(params.keys())
+                plan = NormalizerPlan(
+                    feature_names,
+                    [params[k]['mean'] for k in feature_names],
+                    [params[k]['stdDev'] for k in feature_names]
+                )
             else:
                 raise Exception('Unsupported normalizer format')
 
-            sys.stderr.write(f'Normalizer loaded: {normalizer_path}\n')
+            sys.stderr.write(f'Normalizer loaded: {normalizer_path} ({plan.num_features} features)\n')
             sys.stderr.flush()
-            return self.normalizer_cache[normalizer_path]
+            return plan
         except Exception as e:
             raise Exception(f'Failed to load normalizer from {normalizer_path}: {str(e)}')
 
+    def resolve_plan(self, model: TreeModel, model_path: str, normalizer_path: str) -> NormalizerPlan:
+        """Check the normalizer's column order against model.feature_name() (cached per model/normalizer pair)"""
+        key = (model_path, normalizer_path)
+        base_plan = self.load_normalizer(normalizer_path)
+        cached = self.plan_cache.get(key)
+        if cached is not None and cached[0] is model and cached[1] is base_plan:
+            return cached[2]
+
+        plan = base_plan
+        if plan.num_features != model.num_feature():
+            raise Exception(f'Normalizer has {plan.num_features} features, model expects {model.num_feature()}')
+
+        # LightGBM names unnamed training columns Column_0..Column_N; those carry no ordering information
+        model_names = model.feature_name()
+        named_model = any(name != f'Column_{i}' for i, name in enumerate(model_names))
+        if named_model:
+            if plan.feature_names is None:
+                # Arrays are stored in training order; adopt the model's names so dict rows are gathered by name
+                plan = NormalizerPlan(model_names, plan.mean, plan.std)
+            elif plan.feature_names != model_names:
+                if sorted(plan.feature_names) != sorted(model_names):
+                    missing = sorted(set(model_names) - set(plan.feature_names))
+                    extra = sorted(set(plan.feature_names) - set(model_names))
+                    raise Exception(f'Normalizer features do not match model (missing: {missing}, unexpected: {extra})')
+                sys.stderr.write(f'Reordering normalizer {normalizer_path} to match model column order\n')
+                sys.stderr.flush()
+                plan = plan.reordered(model_names)
+
+        self.plan_cache[key] = (model, base_plan, plan)
+        return plan
+
     def normalize_features(
         self,
-        features: Dict[str, float],
-        normalizer: Dict[str, Any]
+        features: FeatureRow,
+        plan: NormalizerPlan
     ) -> np.ndarray:
         """Apply z-score normalization to features"""
-        mean = normalizer['mean']
-        std = normalizer['std']
-
-        # Convert dict features to array in correct order
-        if isinstance(mean, dict):
-            # Dict-based normalizer
-            feature_names = normalizer.get('feature_names', list(mean.keys()))
-            normalized = []
-            for fname in feature_names:
-                if fname not in features:
-                    raise Exception(f'Missing feature: {fname}')
-                value = features[fname]
-                mean_val = mean[fname]
-                std_val = std[fname]
-                # Z-score: (x - mean) / std
-                normalized_val = (value - mean_val) / std_val if std_val != 0 else 0.0
-                normalized.append(normalized_val)
-            return np.array(normalized).reshape(1, -1)
-        else:
-            # Array-based normalizer - features dict must be in same order as arrays
-            # Get feature names from dict keys (should be ordered)
-            feature_names = list(features.keys())
-            feature_values = [features[fname] for fname in feature_names]
-
-            X = np.array(feature_values).reshape(1, -1)
-            mean_arr = np.array(mean)
-            std_arr = np.array(std)
+        return self.normalize_feature_rows([features], plan)
 
-            # Validate dimensions
-            if X.shape[1] != len(mean_arr):
-                raise Exception(f'Feature count mismatch: got {X.shape[1]} features, expected {len(mean_arr)}')
-
-            # Z-score normalization
-            X_norm = (X - mean_arr) / std_arr
-            return X_norm
+    def normalize_feature_rows(
+        self,
+        rows: List[FeatureRow],
+        plan: NormalizerPlan
+    ) -> np.ndarray:
+        """Apply z-score normalization to many rows, returning one (n_rows, n_features) matrix"""
+        return plan.apply(plan.gather(rows))
 
     def predict(
         self,
-        features: Dict[str, float],
+        features: FeatureRow,
         model_path: str,
         normalizer_path: str
     ) -> Dict[str, Any]:
         """Make prediction using loaded model and normalizer"""
         # Load model and normalizer (cached)
         model = self.load_model(model_path)
-        normalizer = self.load_normalizer(normalizer_path)
+        plan = self.resolve_plan(model, model_path, normalizer_path)
 
         # Normalize features
-        X_norm = self.normalize_features(features, normalizer)
+        X_norm = self.normalize_features(features, plan)
 
         # Make prediction
         raw_prediction = model.predict(X_norm)[0]
@@ -160,6 +289,32 @@ class GenericPredictionServer:
         sys.stderr.write(f'RAW PREDICTION from {model_path}: {raw_prediction}\n')
         sys.stderr.flush()
 
+        return self.interpret_prediction(raw_prediction)
+
+    def predict_batch(
+        self,
+        rows: List[FeatureRow],
+        model_path: str,
+        normalizer_path: str
+    ) -> List[Dict[str, Any]]:
+        """Make predictions for many feature rows with a single Booster.predict call"""
+        # Load model and normalizer (cached)
+        model = self.load_model(model_path)
+        plan = self.resolve_plan(model, model_path, normalizer_path)
+
+        # Normalize all rows into one matrix
+        X_norm = self.normalize_feature_rows(rows, plan)
+
+        # One LightGBM call for the whole batch
+        raw_predictions = model.predict(X_norm)
+
+        sys.stderr.write(f'BATCH PREDICTION from {model_path}: {len(rows)} rows\n')
+        sys.stderr.flush()
+
+        return [self.interpret_prediction(raw) for raw in raw_predictions]
+
+    def interpret_prediction(self, raw_prediction: Any) -> Dict[str, Any]:
+        """Convert one raw LightGBM output into prediction/confidence/probability"""
         # Handle multi-class vs binary classification vs regression
         if isinstance(raw_prediction, np.ndarray):
             # Multi-class classification: prediction is array of probabilities [prob_class0, prob_class1, prob_class2]
@@ -234,48 +389,102 @@ class GenericPredictionServer:
             'probability': probability
         }
 
-    def run(self):
-        """Run prediction server loop"""
-        for line in sys.stdin:
-            try:
-                # Parse request
-                request = json.loads(line.strip())
-                features = request.get('features')
-                model_path = request.get('modelPath')
-                normalizer_path = request.get('normalizerPath')
-
-                if not features:
-                    response = {
-                        'success': False,
-                        'error': 'Missing required field: features'
-                    }
-                elif not model_path:
-                    response = {
-                        'success': False,
-                        'error': 'Missing required field: modelPath'
-                    }
-                elif not normalizer_path:
-                    response = {
-                        'success': False,
-                        'error': 'Missing required field: normalizerPath'
-                    }
-                else:
-                    # Make prediction
-                    result = self.predict(features, model_path, normalizer_path)
-                    response = {
-                        'success': True,
-                        'data': result
-                    }
-
-                # Send response
-                print(json.dumps(response), flush=True)
-
-            except Exception as e:
-                response = {
-                    'success': False,
-                    'error': str(e)
+    def handle_command(self, command: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Cache management: warm ("load"), drop ("evict") or inspect ("stats") models/normalizers"""
+        model_path = request.get('modelPath')
+        normalizer_path = request.get('normalizerPath')
+
+        if command == 'stats':
+            return {
+                'success': True,
+                'data': {
+                    'models': self.model_cache.stats(),
+                    'normalizers': self.normalizer_cache.stats()
                 }
-                print(json.dumps(response), flush=True)
+            }
+        if command not in ('load', 'evict'):
+            return {
+                'success': False,
+                'error': f'Unknown command: {command}'
+            }
+        if not model_path and not normalizer_path:
+            return {
+                'success': False,
+                'error': 'Missing required field: modelPath or normalizerPath'
+            }
+
+        if command == 'load':
+            model = self.load_model(model_path) if model_path else None
+            if normalizer_path:
+                if model is not None:
+                    self.resolve_plan(model, model_path, normalizer_path)
+                else:
+                    self.load_normalizer(normalizer_path)
+            return {
+                'success': True,
+                'data': {'loaded': [p for p in (model_path, normalizer_path) if p]}
+            }
+
+        evicted = []
+        if model_path and self.model_cache.evict(model_path):
+            evicted.append(model_path)
+        if normalizer_path and self.normalizer_cache.evict(normalizer_path):
+            evicted.append(normalizer_path)
+        return {
+            'success': True,
+            'data': {'evicted': evicted}
+        }
+
+    def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle one parsed request (thread-safe)"""
+        command = request.get('command')
+        if command:
+            return self.handle_command(command, request)
+
+        features = request.get('features')
+        features_batch = request.get('featuresBatch')
+        model_path = request.get('modelPath')
+        normalizer_path = request.get('normalizerPath')
+
+        if not features and not features_batch:
+            return {
+                'success': False,
+                'error': 'Missing required field: features'
+            }
+        if features_batch is not None and not isinstance(features_batch, list):
+            return {
+                'success': False,
+                'error': 'featuresBatch must be an array of feature objects'
+            }
+        if not model_path:
+            return {
+                'success': False,
+                'error': 'Missing required field: modelPath'
+            }
+        if not normalizer_path:
+            return {
+                'success': False,
+                'error': 'Missing required field: normalizerPath'
+            }
+
+        if features_batch:
+            # Batch prediction (one matrix, one model call)
+            results = self.predict_batch(features_batch, model_path, normalizer_path)
+            return {
+                'success': True,
+                'data': {'predictions': results}
+            }
+
+        # Make prediction
+        result = self.predict(features, model_path, normalizer_path)
+        return {
+            'success': True,
+            'data': result
+        }
+
+    def run(self):
+        """Run prediction server loop (requests with an "id" run concurrently)"""
+        ConcurrentRequestLoop(self.handle_request).run()
 
 if __name__ == '__main__':
     server = GenericPredictionServer()
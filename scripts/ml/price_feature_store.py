@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Incremental, Append-Only Price Feature Store
+
+Daily OHLCV bars and the features computed from them, stored as Parquet
+partitioned by ticker and year:
+
+    <root>/ticker=AAPL/year=2024/part.parquet
+    <root>/_manifest.json          per-ticker high-water mark + feature version
+
+When new bars arrive, only the tail of the history is recomputed: the new bars
+plus the last `lookahead_bars` stored rows (whose forward-looking labels change
+once the future is known), using the preceding `warmup_bars` stored bars as
+context for the longest lookback (252-day 52-week high). A nightly refresh
+therefore touches days of data instead of years. Rolling-window features are
+exact; EWM features (EMA, MACD) differ from a full rebuild by less than
+(1 - alpha)^warmup_bars, which is negligible for the spans in use.
+
+A ticker is rebuilt from scratch when its feature version changes, or when the
+bars overlapping the stored history disagree with it (split/dividend
+re-adjustment); in the latter case update() returns False and the caller
+re-fetches the full history. History is never silently truncated at the front:
+fetch_start() asks for a full download when the caller's start is earlier than
+the stored history covers, and update() rebuilds from bars that begin before the
+first stored bar (or returns False if they don't reach the last one).
+
+Usage:
+    store = PriceFeatureStore('data/feature_store/price', compute_features, feature_version='v1')
+    fetch_start = store.fetch_start(symbol, '2022-01-01')
+    bars = download(symbol, start=fetch_start, end=end_date)
+    if not store.update(symbol, bars, start=fetch_start):
+        store.update(symbol, download(symbol, start='2022-01-01', end=end_date), start='2022-01-01')
+    features = store.read(symbol, '2022-01-01', end_date)
+"""
+
+import os
+import json
+import shutil
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+MANIFEST_FILE = '_manifest.json'
+# 252-day 52-week high plus slack for holidays/halts
+DEFAULT_WARMUP_BARS = 260
+# Trading days per partition year, used to decide how many years of context to read
+BARS_PER_YEAR = 250
+# Calendar days re-fetched before the high-water mark so the overlap can be verified
+OVERLAP_DAYS = 7
+
+FeatureFunction = Callable[[pd.DataFrame], pd.DataFrame]
+
+
+def normalize_bars(bars: pd.DataFrame) -> pd.DataFrame:
+    """OHLCV bars on a sorted, unique, tz-naive date index"""
+    bars = bars[BAR_COLUMNS].copy()
+    index = pd.to_datetime(bars.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    bars.index = index.normalize()
+    bars.index.name = 'date'
+    bars = bars[~bars.index.duplicated(keep='last')].sort_index()
+    return bars.astype(float)
+
+
+class PriceFeatureStore:
+    def __init__(
+        self,
+        root: str,
+        compute_features: FeatureFunction,
+        feature_version: str,
+        warmup_bars: int = DEFAULT_WARMUP_BARS,
+        lookahead_bars: int = 0
+    ):
+        """
+        Args:
+            root: Store directory (created if missing)
+            compute_features: Maps normalized OHLCV bars to a feature frame on the same index
+            feature_version: Bump whenever compute_features changes to force a rebuild
+            warmup_bars: Bars of history needed by the longest lookback window
+            lookahead_bars: Bars of future data used by labels (those rows are recomputed)
+        """
+        self.root = root
+        self.compute_features = compute_features
+        self.feature_version = feature_version
+        self.warmup_bars = warmup_bars
+        self.lookahead_bars = lookahead_bars
+        os.makedirs(root, exist_ok=True)
+        self.manifest = self._load_manifest()
+
+    # --- manifest -----------------------------------------------------------
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.root, MANIFEST_FILE)
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        path = self._manifest_path()
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def _save_manifest(self) -> None:
+        path = self._manifest_path()
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def _state(self, ticker: str) -> Optional[Dict[str, Any]]:
+        state = self.manifest.get(ticker)
+        if state is None or state.get('feature_version') != self.feature_version:
+            return None
+        return state
+
+    def high_water(self, ticker: str) -> Optional[pd.Timestamp]:
+        """Date of the last stored bar for ticker (None if not stored or stale version)"""
+        state = self._state(ticker)
+        return pd.Timestamp(state['high_water']) if state else None
+
+    def fetch_start(self, ticker: str, default_start: str) -> str:
+        """
+        Earliest date the caller needs to download for the next update()
+
+        default_start itself when the stored history does not cover it (nothing stored,
+        or the caller's start moved earlier); otherwise just the overlap before the
+        high-water mark.
+        """
+        state = self._state(ticker)
+        if state is None or pd.Timestamp(default_start) < self._covered_from(state):
+            return default_start
+        high_water = pd.Timestamp(state['high_water'])
+        return max(pd.Timestamp(default_start), high_water - timedelta(days=OVERLAP_DAYS)).strftime('%Y-%m-%d')
+
+    @staticmethod
+    def _covered_from(state: Dict[str, Any]) -> pd.Timestamp:
+        """Earliest start date the stored history is complete from"""
+        covered_from = state.get('covered_from') or state.get('first_date')
+        return pd.Timestamp(covered_from) if covered_from else pd.Timestamp.max
+
+    # --- partitions ---------------------------------------------------------
+
+    def _ticker_dir(self, ticker: str) -> str:
+        return os.path.join(self.root, f'ticker={ticker}')
+
+    def _partition_path(self, ticker: str, year: int) -> str:
+        return os.path.join(self._ticker_dir(ticker), f'year={year}', 'part.parquet')
+
+    def _years(self, ticker: str) -> List[int]:
+        ticker_dir = self._ticker_dir(ticker)
+        if not os.path.isdir(ticker_dir):
+            return []
+        return sorted(
+            int(name.split('=', 1)[1])
+            for name in os.listdir(ticker_dir)
+            if name.startswith('year=') and os.path.exists(os.path.join(ticker_dir, name, 'part.parquet'))
+        )
+
+    def _read_years(self, ticker: str, years: List[int]) -> Optional[pd.DataFrame]:
+        frames = [pd.read_parquet(self._partition_path(ticker, year)) for year in years]
+        if not frames:
+            return None
+        return pd.concat(frames).sort_index()
+
+    def _write_partition(self, ticker: str, year: int, df: pd.DataFrame) -> None:
+        path = self._partition_path(ticker, year)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        df.to_parquet(tmp_path, compression='snappy')
+        os.replace(tmp_path, path)
+
+    def _write_rows(self, ticker: str, rows: pd.DataFrame, replace_from: Optional[pd.Timestamp]) -> None:
+        """Write rows into their year partitions, replacing stored rows on/after replace_from"""
+        for year, year_rows in rows.groupby(rows.index.year):
+            path = self._partition_path(ticker, year)
+            if replace_from is not None and os.path.exists(path):
+                existing = pd.read_parquet(path)
+                year_rows = pd.concat([existing[existing.index < replace_from], year_rows])
+            self._write_partition(ticker, year, year_rows)
+
+    # --- public API ---------------------------------------------------------
+
+    def invalidate(self, ticker: str) -> None:
+        """Drop everything stored for ticker"""
+        shutil.rmtree(self._ticker_dir(ticker), ignore_errors=True)
+        if self.manifest.pop(ticker, None) is not None:
+            self._save_manifest()
+
+    def update(self, ticker: str, bars: pd.DataFrame, start: Optional[str] = None) -> bool:
+        """
+        Append bars for ticker, recomputing only the affected tail
+
+        `start` is the date the bars were requested from (default: their first bar);
+        it is recorded so fetch_start() stays incremental for a ticker whose history
+        begins after it. Bars beginning before the first stored bar rebuild the ticker.
+        Returns False (after invalidating the ticker) when the bars that overlap the
+        stored history disagree with it, or begin before it without reaching its last
+        bar; the caller should pass the full history again.
+        """
+        if bars is None or len(bars) == 0:
+            return True
+        bars = normalize_bars(bars)
+
+        state = self._state(ticker)
+        if state is None:
+            self._rebuild(ticker, bars, start)
+            return True
+
+        high_water = pd.Timestamp(state['high_water'])
+        if state.get('first_date') and bars.index[0] < pd.Timestamp(state['first_date']):
+            # Earlier history than stored: the bars replace it if they cover the stored range
+            if bars.index[-1] >= high_water:
+                self._rebuild(ticker, bars, start)
+                return True
+            self.invalidate(ticker)
+            return False
+        covered_from = self._covered_from(state)
+        if start is not None:
+            covered_from = min(covered_from, pd.Timestamp(start))
+
+        years_back = self.warmup_bars // BARS_PER_YEAR + 1
+        stored = self._read_years(ticker, [y for y in self._years(ticker) if y >= high_water.year - years_back])
+        if stored is None:
+            self._rebuild(ticker, bars, start)
+            return True
+        stored_bars = stored[BAR_COLUMNS]
+
+        overlap = bars.index[(bars.index <= high_water) & bars.index.isin(stored_bars.index)]
+        if len(overlap) > 0 and not np.allclose(
+            bars.loc[overlap].values, stored_bars.loc[overlap].values, rtol=1e-6, equal_nan=True
+        ):
+            self.invalidate(ticker)
+            return False
+
+        new_bars = bars[bars.index > high_water]
+        if len(new_bars) == 0:
+            if covered_from < self._covered_from(state):
+                self._record(ticker, high_water, state['first_date'], covered_from)
+            return True
+
+        # Context for the lookback windows, then the rows whose values can change
+        context_bars = self.warmup_bars + self.lookahead_bars
+        combined = pd.concat([stored_bars.iloc[-context_bars:], new_bars])
+        first_new = len(combined) - len(new_bars)
+        recompute_from = combined.index[max(0, first_new - self.lookahead_bars)]
+
+        rows = self._with_features(combined)
+        self._write_rows(ticker, rows[rows.index >= recompute_from], replace_from=recompute_from)
+        self._record(ticker, rows.index[-1], state.get('first_date'), covered_from)
+        return True
+
+    def read(self, ticker: str, start: Optional[str] = None, end: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """Stored bars + features for ticker in [start, end] (None if not stored)"""
+        if self._state(ticker) is None:
+            return None
+        years = self._years(ticker)
+        if start is not None:
+            years = [y for y in years if y >= pd.Timestamp(start).year]
+        if end is not None:
+            years = [y for y in years if y <= pd.Timestamp(end).year]
+        df = self._read_years(ticker, years)
+        if df is None:
+            return None
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df.index <= pd.Timestamp(end)]
+        return df
+
+    def _with_features(self, bars: pd.DataFrame) -> pd.DataFrame:
+        features = self.compute_features(bars)
+        return pd.concat([bars, features], axis=1)
+
+    def _rebuild(self, ticker: str, bars: pd.DataFrame, start: Optional[str] = None) -> None:
+        shutil.rmtree(self._ticker_dir(ticker), ignore_errors=True)
+        self._write_rows(ticker, self._with_features(bars), replace_from=None)
+        covered_from = bars.index[0] if start is None else min(bars.index[0], pd.Timestamp(start))
+        self._record(ticker, bars.index[-1], bars.index[0].strftime('%Y-%m-%d'), covered_from)
+
+    def _record(
+        self,
+        ticker: str,
+        high_water: pd.Timestamp,
+        first_date: Optional[str],
+        covered_from: Optional[pd.Timestamp]
+    ) -> None:
+        if covered_from is not None and covered_from == pd.Timestamp.max:
+            covered_from = None
+        self.manifest[ticker] = {
+            'high_water': high_water.strftime('%Y-%m-%d'),
+            'first_date': first_date,
+            'covered_from': covered_from.strftime('%Y-%m-%d') if covered_from is not None else None,
+            'feature_version': self.feature_version,
+            'updated_at': datetime.now().isoformat()
+        }
+        self._save_manifest()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Shared Token-Bucket Rate Limiter for API Harvesters
+
+One TokenBucketLimiter is shared by every worker thread of a harvester, so the
+whole pool stays under a provider's per-minute limit (and an optional daily
+request budget) however many requests are in flight. A 429 answered to any
+worker pauses them all.
+
+Usage:
+    limiter = TokenBucketLimiter(per_minute=900, daily_budget=9500)
+    if limiter.acquire():
+        response = session.get(url)
+"""
+
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucketLimiter:
+    """Thread-safe token bucket: `per_minute` requests per minute and at most `daily_budget` in total"""
+
+    def __init__(self, per_minute: float, daily_budget: Optional[int] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate)  # Bursts of up to one second's worth
+        self.tokens = self.capacity
+        self.daily_budget = daily_budget
+        self.used = 0
+        self.paused_until = 0.0
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def exhausted(self) -> bool:
+        return self.daily_budget is not None and self.used >= self.daily_budget
+
+    def acquire(self) -> bool:
+        """Block until a request may be sent; False once the daily budget is spent"""
+        while True:
+            with self.lock:
+                if self.daily_budget is not None and self.used >= self.daily_budget:
+                    return False
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    self.used += 1
+                    return True
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold every worker for `seconds` (after the server answers HTTP 429)"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
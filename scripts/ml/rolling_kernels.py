@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Vectorized Rolling-Window Kernels
+
+Closed-form trailing-window statistics computed from cumulative sums: every
+window is the difference of two prefix sums, so each step costs O(1) regardless
+of window length and the whole series is processed in a handful of NumPy calls.
+Use these instead of Series.rolling(...).apply(...) with a Python callback.
+
+Windows containing a NaN produce NaN, matching pandas rolling with
+min_periods=window.
+"""
+
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+ArrayLike = Union[pd.Series, np.ndarray]
+
+
+def _wrap(result: np.ndarray, like: ArrayLike) -> ArrayLike:
+    """Return a Series on the input's index when given a Series"""
+    if isinstance(like, pd.Series):
+        return pd.Series(result, index=like.index)
+    return result
+
+
+def window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum of each trailing window of `window` values (NaN until the first full window)"""
+    prefix = np.concatenate(([0.0], np.cumsum(values, dtype=float)))
+    sums = np.full(len(values), np.nan)
+    if len(values) >= window:
+        sums[window - 1:] = prefix[window:] - prefix[:-window]
+    return sums
+
+
+def rolling_sum(series: ArrayLike, window: int) -> ArrayLike:
+    """Trailing-window sum; equivalent to series.rolling(window).sum()"""
+    if window < 1:
+        raise ValueError(f'window must be >= 1, got {window}')
+    y = np.asarray(series, dtype=float)
+    missing = np.isnan(y)
+    sums = window_sums(np.where(missing, 0.0, y), window)
+    sums[window_sums(missing, window) > 0] = np.nan
+    return _wrap(sums, series)
+
+
+def rolling_mean(series: ArrayLike, window: int) -> ArrayLike:
+    """Trailing-window mean; equivalent to series.rolling(window).mean()"""
+    return _wrap(np.asarray(rolling_sum(series, window)) / window, series)
+
+
+def rolling_slope(series: ArrayLike, window: int) -> ArrayLike:
+    """
+    Least-squares slope of each trailing window against x = 0..window-1
+
+    Equivalent to series.rolling(window).apply(lambda y: np.polyfit(np.arange(window), y, 1)[0]),
+    using slope = (n*Sxy - Sx*Sy) / (n*Sxx - Sx^2), where Sy and Sxy come from prefix
+    sums of y and t*y (t = global position) and Sx, Sxx depend only on the window length.
+    """
+    if window < 2:
+        raise ValueError(f'window must be >= 2, got {window}')
+    y = np.asarray(series, dtype=float)
+    missing = np.isnan(y)
+    if missing.all():
+        return _wrap(np.full(len(y), np.nan), series)
+
+    # Slope is shift-invariant in y; centering keeps the prefix sums small
+    centered = np.where(missing, 0.0, y - np.nanmean(y))
+    t = np.arange(len(y), dtype=float)
+
+    sum_y = window_sums(centered, window)
+    sum_ty = window_sums(t * centered, window)
+    # Re-base x to the window: x = t - first position of the window
+    sum_xy = sum_ty - (t - (window - 1)) * sum_y
+
+    sum_x = window * (window - 1) / 2
+    denominator = window * window * (window * window - 1) / 12
+    slopes = (window * sum_xy - sum_x * sum_y) / denominator
+    slopes[window_sums(missing, window) > 0] = np.nan
+    return _wrap(slopes, series)
@@ -16,6 +16,7 @@ Input:
 Output:
   - data/training/polygon_news_with_sentiment.csv (118K articles + sentiment scores)
   - data/cache/polygon_sentiment/ (cached FinBERT scores per ticker)
+  - data/cache/sentiment/finbert-cache.sqlite (shared content-hash cache, see sentiment_cache.py)
 
 Performance:
   - First run: ~20-30 minutes (score 118K articles)
@@ -34,15 +35,19 @@ import torch
 from tqdm import tqdm
 import sys
 
+from sentiment_cache import SentimentCache
+
 class FinBERTScorer:
     """Batch sentiment scoring with pre-trained FinBERT"""
 
     def __init__(self, batch_size=32):
         print("📦 Loading pre-trained FinBERT model...")
-        self.tokenizer = AutoTokenizer.from_pretrained("ProsusAI/finbert")
-        self.model = AutoModelForSequenceClassification.from_pretrained("ProsusAI/finbert")
+        self.model_name = "ProsusAI/finbert"
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
         self.model.eval()
         self.batch_size = batch_size
+        self.cache = SentimentCache()
 
         # Use GPU/MPS if available
         if torch.backends.mps.is_available():
@@ -56,26 +61,38 @@ class FinBERTScorer:
         print(f"✓ FinBERT loaded on {self.device} (batch size: {batch_size})\n")
 
     def score_batch(self, texts: list) -> list:
-        """Score multiple texts in batches for performance"""
+        """Score multiple texts, running FinBERT only on texts missing from the shared sentiment cache"""
         if not texts:
             return []
 
+        # Empty texts get the neutral placeholder
+        results = [{'negative': 0.0, 'neutral': 0.5, 'positive': 0.0, 'score': 0.0} for _ in texts]
+        valid_indices = [i for i, text in enumerate(texts) if text and text.strip()]
+
+        probabilities = self.cache.score(self.model_name, [texts[i] for i in valid_indices], self.run_model)
+        for i, probs in zip(valid_indices, probabilities):
+            negative, neutral, positive = probs
+            score = positive - negative  # Range: -1 (very negative) to +1 (very positive)
+
+            results[i] = {
+                'negative': round(negative, 4),
+                'neutral': round(neutral, 4),
+                'positive': round(positive, 4),
+                'score': round(score, 4)
+            }
+
+        return results
+
+    def run_model(self, texts: list) -> list:
+        """[negative, neutral, positive] probabilities per text, in batches for performance"""
         results = []
 
         for i in range(0, len(texts), self.batch_size):
             batch = texts[i:i + self.batch_size]
 
-            # Filter empty texts
-            valid_indices = [j for j, text in enumerate(batch) if text and text.strip()]
-            valid_texts = [batch[j] for j in valid_indices]
-
-            if not valid_texts:
-                results.extend([{'negative': 0.0, 'neutral': 0.5, 'positive': 0.0, 'score': 0.0}] * len(batch))
-                continue
-
             # Tokenize batch
             inputs = self.tokenizer(
-                valid_texts,
+                batch,
                 return_tensors="pt",
                 truncation=True,
                 max_length=512,
@@ -87,27 +104,7 @@ class FinBERTScorer:
                 outputs = self.model(**inputs)
                 probabilities = torch.softmax(outputs.logits, dim=-1)
 
-            # Process results
-            batch_results = []
-            valid_idx = 0
-
-            for j in range(len(batch)):
-                if j in valid_indices:
-                    probs = probabilities[valid_idx].cpu().tolist()
-                    negative, neutral, positive = probs
-                    score = positive - negative  # Range: -1 (very negative) to +1 (very positive)
-
-                    batch_results.append({
-                        'negative': round(negative, 4),
-                        'neutral': round(neutral, 4),
-                        'positive': round(positive, 4),
-                        'score': round(score, 4)
-                    })
-                    valid_idx += 1
-                else:
-                    batch_results.append({'negative': 0.0, 'neutral': 0.5, 'positive': 0.0, 'score': 0.0})
-
-            results.extend(batch_results)
+            results.extend(probabilities.cpu().tolist())
 
         return results
 
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Parallel, Streaming Ingestion Helpers for SEC Bulk ZIP Datasets (Form 4, 13F)
+
+- read_tsv_chunks(): streams one TSV straight out of a ZIP archive in chunks,
+  reading only the planned columns with the planned dtypes, so a worker never
+  holds a whole quarter's raw table in memory.
+- run_zip_pool(): parses each ZIP independently in a process pool; every worker
+  writes its result to its own Parquet part file and returns the path.
+- merge_parquet_parts(): streams the parts (in ZIP order) into one Parquet file,
+  one row group per part, optionally dropping duplicate keys (keep='last').
+
+Peak memory is one ZIP's aggregates per worker plus one part during the merge.
+
+- zip_fingerprint() / load_manifest() / save_manifest(): a JSON manifest of
+  processed ZIPs keyed by SHA-256, so incremental runs parse only new or
+  replaced archives. Hashes are reused while a file's size and mtime are unchanged.
+"""
+
+import os
+import json
+import hashlib
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_CHUNK_ROWS = 500_000
+HASH_BLOCK_BYTES = 8 * 1024 * 1024
+NA_VALUES = ['', 'NA', 'N/A']
+SEC_DATE_FORMAT = '%d-%b-%Y'
+
+ColumnPlan = Dict[str, str]
+
+
+def worker_count(requested: int) -> int:
+    """Process count for --workers (0 = all cores)"""
+    if requested and requested > 0:
+        return requested
+    return os.cpu_count() or 1
+
+
+def _read_options(columns: Optional[ColumnPlan]) -> Dict[str, Any]:
+    if columns is None:
+        return {'low_memory': False}
+    return {
+        'usecols': lambda col: col in columns,
+        'dtype': columns
+    }
+
+
+def parse_sec_dates(df: pd.DataFrame, date_columns: Sequence[str]) -> pd.DataFrame:
+    """Parse SEC DD-MON-YYYY date columns in place (unparseable -> NaT)"""
+    for col in date_columns:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format=SEC_DATE_FORMAT, errors='coerce')
+    return df
+
+
+def zip_tables(zip_path: str) -> List[str]:
+    """Table names (TSV members without extension) in a ZIP"""
+    with zipfile.ZipFile(zip_path, 'r') as z:
+        return [name[:-len('.tsv')] for name in z.namelist() if name.endswith('.tsv')]
+
+
+def read_tsv(zip_path: str, table: str, columns: Optional[ColumnPlan] = None) -> pd.DataFrame:
+    """Read a whole (small) TSV table from a ZIP"""
+    with zipfile.ZipFile(zip_path, 'r') as z:
+        with z.open(f'{table}.tsv') as f:
+            return pd.read_csv(f, sep='\t', na_values=NA_VALUES, **_read_options(columns))
+
+
+def read_tsv_chunks(
+    zip_path: str,
+    table: str,
+    columns: Optional[ColumnPlan] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS
+) -> Iterator[pd.DataFrame]:
+    """Stream a TSV table out of a ZIP in chunks of chunk_rows rows"""
+    with zipfile.ZipFile(zip_path, 'r') as z:
+        with z.open(f'{table}.tsv') as f:
+            reader = pd.read_csv(f, sep='\t', na_values=NA_VALUES, chunksize=chunk_rows, **_read_options(columns))
+            for chunk in reader:
+                yield chunk
+
+
+def write_part(df: pd.DataFrame, parts_dir: Path, zip_path: str) -> Optional[str]:
+    """Write one worker's result as <parts_dir>/<zip stem>.parquet (None if empty)"""
+    if df is None or len(df) == 0:
+        return None
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    part_path = parts_dir / f'{Path(zip_path).stem}.parquet'
+    df.to_parquet(part_path, index=False, compression='snappy')
+    return str(part_path)
+
+
+def run_zip_pool(
+    zip_files: Sequence[Path],
+    worker: Callable[..., Optional[str]],
+    workers: int,
+    *args: Any,
+    failed: Optional[List[Path]] = None
+) -> List[Optional[str]]:
+    """
+    Run worker(zip_path, *args) for every ZIP in a process pool
+
+    worker must be a module-level function returning a part path (or None).
+    Results are returned in zip_files order; failures are reported and become None
+    (and are appended to `failed` when given, to tell them apart from empty ZIPs).
+    """
+    results: List[Optional[str]] = [None] * len(zip_files)
+    with ProcessPoolExecutor(max_workers=min(workers, max(1, len(zip_files)))) as pool:
+        futures = [pool.submit(worker, str(zip_file), *args) for zip_file in zip_files]
+        for i, (zip_file, future) in enumerate(zip(zip_files, futures)):
+            try:
+                results[i] = future.result()
+                status = 'no rows' if results[i] is None else Path(results[i]).name
+                print(f"  ✅ [{i + 1}/{len(zip_files)}] {zip_file.name} → {status}")
+            except Exception as e:
+                print(f"  ❌ [{i + 1}/{len(zip_files)}] Failed to process {zip_file.name}: {e}")
+                if failed is not None:
+                    failed.append(zip_file)
+    return results
+
+
+def zip_fingerprint(zip_path: Path, previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    {'sha256', 'size', 'mtime_ns'} for a ZIP
+
+    The SHA-256 from `previous` (an earlier fingerprint) is reused when size and
+    mtime still match, so unchanged multi-GB archives are not re-read every run.
+    """
+    stat = Path(zip_path).stat()
+    if previous and previous.get('size') == stat.st_size and previous.get('mtime_ns') == stat.st_mtime_ns:
+        sha256 = previous['sha256']
+    else:
+        digest = hashlib.sha256()
+        with open(zip_path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+    return {'sha256': sha256, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def load_manifest(path: Path) -> Dict[str, Any]:
+    """Manifest JSON at path ({} if missing)"""
+    if not Path(path).exists():
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_manifest(path: Path, manifest: Dict[str, Any]) -> None:
+    """Atomically write the manifest JSON"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = Path(str(path) + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def merge_parquet_parts(
+    parts: Sequence[str],
+    output_file: Path,
+    schema: Optional[pa.Schema] = None,
+    dedupe_keys: Optional[List[str]] = None
+) -> int:
+    """
+    Stream part files (in order) into output_file, one row group per part
+
+    With dedupe_keys, rows whose key appears again in a later part (or later in the
+    same part) are dropped, matching concat + drop_duplicates(keep='last'). Only the
+    key columns of all parts are held in memory at once. Returns rows written.
+    """
+    parts = [p for p in parts if p]
+    keep_masks: Dict[str, Any] = {}
+    if dedupe_keys:
+        keys = pd.concat(
+            [pd.read_parquet(p, columns=dedupe_keys).assign(_part=i) for i, p in enumerate(parts)],
+            ignore_index=True
+        )
+        keep = ~keys.duplicated(subset=dedupe_keys, keep='last')
+        for i, p in enumerate(parts):
+            keep_masks[p] = keep[keys['_part'] == i].to_numpy()
+
+    rows = 0
+    writer = None
+    tmp_path = Path(str(output_file) + '.tmp')
+    try:
+        for p in parts:
+            table = pq.read_table(p)
+            if p in keep_masks:
+                table = table.filter(pa.array(keep_masks[p]))
+            if schema is None:
+                schema = table.schema.remove_metadata()
+            table = table.select(schema.names).cast(schema)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, schema, compression='snappy')
+            writer.write_table(table)
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        os.replace(tmp_path, output_file)
+    return rows
@@ -2,10 +2,20 @@
 """
 FinBERT Sentiment Fusion Model - Test Set Evaluation
 Evaluate the fine-tuned model on held-out test data
+
+Usage:
+    python3 scripts/ml/sentiment-fusion/evaluate-test-set.py
+    python3 scripts/ml/sentiment-fusion/evaluate-test-set.py --quantize dynamic-int8
+
+With --quantize, the full-precision model is evaluated first as a baseline, then
+the quantized model; accuracy drift, prediction agreement, latency and memory are
+reported and results are saved as test_evaluation_<mode>.json.
 """
 
 import os
 import json
+import time
+import argparse
 import pandas as pd
 import numpy as np
 from datetime import datetime
@@ -19,16 +29,28 @@ from sklearn.metrics import (
 )
 import torch
 
+from quantization import QUANTIZATION_MODES, measure_load_rss_mb, quantize_dynamic_int8, serialized_size_mb
+
 # Paths
 TEST_FILE = "data/training/sentiment-fusion-test.csv"
 MODEL_DIR = "models/sentiment-fusion/v1.1.0"
 MAX_LENGTH = 512
 
+parser = argparse.ArgumentParser(description='Evaluate FinBERT sentiment fusion model on the test set')
+parser.add_argument(
+    '--quantize',
+    choices=QUANTIZATION_MODES,
+    default='none',
+    help='Evaluate a quantized model and compare it against full precision'
+)
+args = parser.parse_args()
+
 print("=" * 80)
 print("FinBERT Sentiment Fusion Model - Test Set Evaluation")
 print("=" * 80)
 print(f"Test file: {TEST_FILE}")
 print(f"Model directory: {MODEL_DIR}")
+print(f"Quantization: {args.quantize}")
 print("=" * 80)
 print()
 
@@ -58,6 +80,9 @@ print(f"🤖 Loading fine-tuned FinBERT model from {MODEL_DIR}...")
 model = AutoModelForSequenceClassification.from_pretrained(MODEL_DIR)
 model.eval()  # Set to evaluation mode
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+if args.quantize != 'none' and device.type != 'cpu':
+    print("⚠️  Quantized inference is CPU-only, evaluating on CPU")
+    device = torch.device('cpu')
 model.to(device)
 print(f"✓ Model loaded on {device}")
 print()
@@ -74,39 +99,99 @@ test_encodings = tokenizer(
 print("✓ Tokenization complete")
 print()
 
-# Run inference
-print("🔮 Running inference on test set...")
-predictions = []
-probabilities = []
 
-with torch.no_grad():
-    # Process in batches to avoid memory issues
-    batch_size = 32
-    num_batches = (len(test_df) + batch_size - 1) // batch_size
+def run_inference(model):
+    """Batched inference over the test set; returns (predictions, probabilities, seconds)"""
+    predictions = []
+    probabilities = []
+    started = time.perf_counter()
 
-    for i in range(num_batches):
-        start_idx = i * batch_size
-        end_idx = min((i + 1) * batch_size, len(test_df))
+    with torch.no_grad():
+        # Process in batches to avoid memory issues
+        batch_size = 32
+        num_batches = (len(test_df) + batch_size - 1) // batch_size
 
-        batch = {
-            key: val[start_idx:end_idx].to(device)
-            for key, val in test_encodings.items()
-        }
+        for i in range(num_batches):
+            start_idx = i * batch_size
+            end_idx = min((i + 1) * batch_size, len(test_df))
+
+            batch = {
+                key: val[start_idx:end_idx].to(device)
+                for key, val in test_encodings.items()
+            }
+
+            outputs = model(**batch)
+            logits = outputs.logits
+            probs = torch.softmax(logits, dim=-1)
+            preds = torch.argmax(logits, dim=-1)
+
+            predictions.extend(preds.cpu().numpy().tolist())
+            probabilities.extend(probs.cpu().numpy().tolist())
 
-        outputs = model(**batch)
-        logits = outputs.logits
-        probs = torch.softmax(logits, dim=-1)
-        preds = torch.argmax(logits, dim=-1)
+            if (i + 1) % 10 == 0 or (i + 1) == num_batches:
+                print(f"  Processed {end_idx}/{len(test_df)} examples ({(end_idx/len(test_df)*100):.1f}%)")
 
-        predictions.extend(preds.cpu().numpy().tolist())
-        probabilities.extend(probs.cpu().numpy().tolist())
+    return predictions, probabilities, time.perf_counter() - started
 
-        if (i + 1) % 10 == 0 or (i + 1) == num_batches:
-            print(f"  Processed {end_idx}/{len(test_df)} examples ({(end_idx/len(test_df)*100):.1f}%)")
 
+# Run inference
+print("🔮 Running inference on test set...")
+predictions, probabilities, inference_seconds = run_inference(model)
 print("✓ Inference complete")
 print()
 
+quantization_report = None
+if args.quantize == 'dynamic-int8':
+    # Full-precision run above is the baseline; now score the quantized model
+    baseline_predictions = np.array(predictions)
+    baseline_probabilities = np.array(probabilities)
+    baseline_seconds = inference_seconds
+    baseline_size_mb = serialized_size_mb(model)
+
+    print("🗜️  Quantizing nn.Linear layers to int8 (dynamic)...")
+    model = quantize_dynamic_int8(model)
+    print("🔮 Running inference with quantized model...")
+    predictions, probabilities, inference_seconds = run_inference(model)
+    print("✓ Quantized inference complete")
+    print()
+
+    # Each load measured in its own fresh process so neither includes the other's weights
+    print("📏 Measuring load RSS (fp32 and int8, separate processes)...")
+    rss_fp32 = measure_load_rss_mb(MODEL_DIR, 'none')
+    rss_int8 = measure_load_rss_mb(MODEL_DIR, args.quantize)
+    print()
+
+    y_true_baseline = test_df['label'].values
+    baseline_accuracy = accuracy_score(y_true_baseline, baseline_predictions)
+    quantized_accuracy = accuracy_score(y_true_baseline, predictions)
+    quantization_report = {
+        "mode": args.quantize,
+        "baseline_accuracy": float(baseline_accuracy),
+        "quantized_accuracy": float(quantized_accuracy),
+        "accuracy_drift": float(quantized_accuracy - baseline_accuracy),
+        "prediction_agreement": float((baseline_predictions == np.array(predictions)).mean()),
+        "max_probability_diff": float(np.max(np.abs(baseline_probabilities - np.array(probabilities)))),
+        "baseline_ms_per_example": baseline_seconds / len(test_df) * 1000,
+        "quantized_ms_per_example": inference_seconds / len(test_df) * 1000,
+        "speedup": baseline_seconds / inference_seconds if inference_seconds > 0 else None,
+        "baseline_model_size_mb": baseline_size_mb,
+        "quantized_model_size_mb": serialized_size_mb(model),
+        "baseline_rss_load_mb": rss_fp32,
+        "quantized_rss_load_mb": rss_int8,
+        "rss_saving_mb": rss_fp32 - rss_int8
+    }
+
+    print("=" * 80)
+    print("🗜️  Quantization Report (fp32 → dynamic int8)")
+    print("=" * 80)
+    print(f"Accuracy:          {baseline_accuracy:.4f} → {quantized_accuracy:.4f} (drift {quantization_report['accuracy_drift']:+.4f})")
+    print(f"Prediction agree:  {quantization_report['prediction_agreement']*100:.2f}%")
+    print(f"Max |Δ prob|:      {quantization_report['max_probability_diff']:.4f}")
+    print(f"Latency:           {quantization_report['baseline_ms_per_example']:.2f} → {quantization_report['quantized_ms_per_example']:.2f} ms/example")
+    print(f"Model size:        {baseline_size_mb:.1f} → {quantization_report['quantized_model_size_mb']:.1f} MB")
+    print(f"RSS after load:    {rss_fp32:.1f} → {rss_int8:.1f} MB (saves {rss_fp32 - rss_int8:.1f} MB)")
+    print()
+
 # Convert to numpy arrays
 y_true = test_df['label'].values
 y_pred = np.array(predictions)
@@ -262,6 +347,8 @@ print()
 results = {
     "evaluation_date": datetime.now().isoformat(),
     "model_version": "1.0.0",
+    "quantization": args.quantize,
+    "quantization_report": quantization_report,
     "test_examples": len(test_df),
     "metrics": {
         "accuracy": float(accuracy),
@@ -292,7 +379,9 @@ results = {
     }
 }
 
-results_path = os.path.join(MODEL_DIR, "test_evaluation.json")
+# Quantized evaluations never overwrite the full-precision results
+suffix = "" if args.quantize == 'none' else f"_{args.quantize.replace('-', '_')}"
+results_path = os.path.join(MODEL_DIR, f"test_evaluation{suffix}.json")
 with open(results_path, 'w') as f:
     json.dump(results, f, indent=2)
 print(f"✓ Evaluation results saved to {results_path}")
@@ -309,7 +398,7 @@ predictions_df['confidence'] = [y_probs[i][y_pred[i]] for i in range(len(y_pred)
 for i, label_name in enumerate(label_names):
     predictions_df[f'prob_{label_name.lower()}'] = y_probs[:, i]
 
-predictions_path = os.path.join(MODEL_DIR, "test_predictions.csv")
+predictions_path = os.path.join(MODEL_DIR, f"test_predictions{suffix}.csv")
 predictions_df.to_csv(predictions_path, index=False)
 print(f"✓ Predictions saved to {predictions_path}")
 print()
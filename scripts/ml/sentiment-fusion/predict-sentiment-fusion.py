@@ -2,6 +2,9 @@
 """
 Sentiment Fusion - FinBERT Prediction Server
 Loads FinBERT model once and handles multiple predictions via stdin/stdout
+Requests with an "id" field run on a worker pool and are answered out of order
+(response echoes the "id"); requests without one are answered serially, in order
+--quantize dynamic-int8 (or "inference.quantization" in metadata.json) enables int8 CPU inference
 """
 
 import sys
@@ -9,6 +12,7 @@ import json
 import argparse
 import os
 from pathlib import Path
+from typing import Optional
 
 try:
     import torch
@@ -20,14 +24,22 @@ except ImportError as e:
     sys.stderr.flush()
     sys.exit(1)
 
+# Shared request loop and sentiment cache live in scripts/ml
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from sentiment_cache import SentimentCache, model_version_for_dir
+from stdio_request_loop import ConcurrentRequestLoop
+from quantization import QUANTIZATION_MODES, quantize_dynamic_int8, resolve_quantization
+
 class FinBERTPredictionServer:
-    def __init__(self, model_dir: str):
+    def __init__(self, model_dir: str, quantize: Optional[str] = None):
         """Initialize server and load FinBERT model"""
         self.model = None
         self.tokenizer = None
         self.model_dir = model_dir
+        self.quantize = quantize
         self.max_length = 512
         self.label_map = {0: 'BEARISH', 1: 'NEUTRAL', 2: 'BULLISH'}
+        self.cache = SentimentCache()
         self._load_model()
 
     def _load_model(self):
@@ -53,6 +65,7 @@ class FinBERTPredictionServer:
                     self.model_dir,
                     local_files_only=True
                 )
+                self.model_version = model_version_for_dir(self.model_dir)
             else:
                 # Fallback to base pretrained FinBERT
                 sys.stderr.write('Fine-tuned model not found, loading base ProsusAI/finbert\n')
@@ -62,6 +75,7 @@ class FinBERTPredictionServer:
                     num_labels=3
                 )
                 self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+                self.model_version = model_name
 
             # Set to evaluation mode
             self.model.eval()
@@ -70,6 +84,17 @@ class FinBERTPredictionServer:
             self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
             self.model.to(self.device)
 
+            # Optional dynamic int8 quantization (CPU only; flag or metadata.json)
+            quantization = resolve_quantization(self.model_dir, self.quantize)
+            if quantization == 'dynamic-int8':
+                if self.device.type != 'cpu':
+                    sys.stderr.write('Quantization dynamic-int8 is CPU-only, keeping full precision on GPU\n')
+                else:
+                    self.model = quantize_dynamic_int8(self.model)
+                    # Quantized outputs differ slightly, so they get their own cache entries
+                    self.model_version = f'{self.model_version}:dynamic-int8'
+                    sys.stderr.write('Quantization: dynamic-int8 (nn.Linear)\n')
+
             sys.stderr.write(f'Device: {self.device}\n')
             sys.stderr.write('READY\n')
             sys.stderr.flush()
@@ -83,9 +108,34 @@ class FinBERTPredictionServer:
         if not text or len(text.strip()) == 0:
             raise ValueError('Text input cannot be empty')
 
+        # Shared content-hash cache: the model only runs for unseen texts
+        probs_np = np.array(self.cache.score(self.model_version, [text], self.run_model)[0])
+
+        # Get prediction (class with highest probability)
+        predicted_class = int(np.argmax(probs_np))
+        prediction = self.label_map[predicted_class]
+
+        # Calculate confidence (max probability)
+        confidence = float(np.max(probs_np))
+
+        # Extract individual probabilities
+        probability = {
+            'bearish': float(probs_np[0]),
+            'neutral': float(probs_np[1]),
+            'bullish': float(probs_np[2])
+        }
+
+        return {
+            'prediction': prediction,
+            'confidence': confidence,
+            'probability': probability
+        }
+
+    def run_model(self, texts: list) -> list:
+        """Softmax class probabilities per text"""
         # Tokenize text (max 512 tokens)
         inputs = self.tokenizer(
-            text,
+            texts,
             max_length=self.max_length,
             padding='max_length',
             truncation=True,
@@ -102,58 +152,28 @@ class FinBERTPredictionServer:
 
             # Apply softmax to get probabilities
             probs = torch.nn.functional.softmax(logits, dim=-1)
-            probs_np = probs.cpu().numpy()[0]
+            return probs.cpu().tolist()
 
-            # Get prediction (class with highest probability)
-            predicted_class = int(np.argmax(probs_np))
-            prediction = self.label_map[predicted_class]
+    def handle_request(self, request: dict) -> dict:
+        """Handle one parsed request (thread-safe)"""
+        text = request.get('text')
 
-            # Calculate confidence (max probability)
-            confidence = float(np.max(probs_np))
-
-            # Extract individual probabilities
-            probability = {
-                'bearish': float(probs_np[0]),
-                'neutral': float(probs_np[1]),
-                'bullish': float(probs_np[2])
+        if not text:
+            return {
+                'success': False,
+                'error': 'Missing required field: text'
             }
 
+        # Make prediction
+        result = self.predict(text)
         return {
-            'prediction': prediction,
-            'confidence': confidence,
-            'probability': probability
+            'success': True,
+            'data': result
         }
 
     def run(self):
-        """Run prediction server loop"""
-        for line in sys.stdin:
-            try:
-                # Parse request
-                request = json.loads(line.strip())
-                text = request.get('text')
-
-                if not text:
-                    response = {
-                        'success': False,
-                        'error': 'Missing required field: text'
-                    }
-                else:
-                    # Make prediction
-                    result = self.predict(text)
-                    response = {
-                        'success': True,
-                        'data': result
-                    }
-
-                # Send response
-                print(json.dumps(response), flush=True)
-
-            except Exception as e:
-                response = {
-                    'success': False,
-                    'error': str(e)
-                }
-                print(json.dumps(response), flush=True)
+        """Run prediction server loop (requests with an "id" run concurrently)"""
+        ConcurrentRequestLoop(self.handle_request).run()
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='FinBERT Prediction Server')
@@ -163,7 +183,13 @@ if __name__ == '__main__':
         required=True,
         help='Path to fine-tuned model directory (or fallback to base FinBERT)'
     )
+    parser.add_argument(
+        '--quantize',
+        choices=QUANTIZATION_MODES,
+        default=None,
+        help='CPU quantization mode (default: "inference.quantization" in the model dir metadata.json, else none)'
+    )
     args = parser.parse_args()
 
-    server = FinBERTPredictionServer(model_dir=args.model_dir)
+    server = FinBERTPredictionServer(model_dir=args.model_dir, quantize=args.quantize)
     server.run()
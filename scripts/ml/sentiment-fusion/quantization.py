@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Sentiment Fusion - CPU Quantization Helpers
+Shared by predict-sentiment-fusion.py and evaluate-test-set.py
+
+Dynamic int8 quantization converts every nn.Linear layer to int8 weights with
+activations quantized on the fly. It needs no calibration data and applies to
+CPU inference only.
+
+Selection (first match wins):
+- --quantize flag on the calling script ("none" or "dynamic-int8")
+- "inference": {"quantization": "dynamic-int8"} in the model directory's metadata.json
+- default: full precision
+"""
+
+import os
+import io
+import gc
+import sys
+import json
+import subprocess
+from typing import Optional
+
+import torch
+
+QUANTIZATION_MODES = ('none', 'dynamic-int8')
+
+
+def quantization_from_metadata(model_dir: str) -> str:
+    """Quantization mode recorded in <model_dir>/metadata.json ("none" if absent)"""
+    metadata_path = os.path.join(model_dir, 'metadata.json')
+    if not os.path.exists(metadata_path):
+        return 'none'
+    try:
+        with open(metadata_path, 'r') as f:
+            metadata = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        sys.stderr.write(f'Could not read {metadata_path}: {e}\n')
+        return 'none'
+    mode = (metadata.get('inference') or {}).get('quantization', 'none')
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f'Unsupported quantization "{mode}" in {metadata_path} (expected one of {QUANTIZATION_MODES})')
+    return mode
+
+
+def resolve_quantization(model_dir: str, requested: Optional[str]) -> str:
+    """Explicit flag wins, otherwise fall back to model metadata"""
+    if requested is not None:
+        if requested not in QUANTIZATION_MODES:
+            raise ValueError(f'Unsupported quantization "{requested}" (expected one of {QUANTIZATION_MODES})')
+        return requested
+    return quantization_from_metadata(model_dir)
+
+
+def quantize_dynamic_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """Replace nn.Linear layers with dynamically quantized int8 versions (CPU only)"""
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def serialized_size_mb(model: torch.nn.Module) -> float:
+    """Size of the model's state_dict when saved, in MB"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (Linux /proc, falls back to peak RSS)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss is KB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure_load_rss_mb(model_dir: str, mode: str) -> float:
+    """RSS growth in MB from loading (and quantizing) the model in a fresh process
+
+    Run out of process so the measurement never includes another copy of the
+    model; for dynamic-int8 the fp32 weights are dropped before RSS is read.
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f'Unsupported quantization "{mode}" (expected one of {QUANTIZATION_MODES})')
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--measure-rss', model_dir, mode],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])['rss_mb']
+
+
+def _measure_rss_in_this_process(model_dir: str, mode: str) -> float:
+    from transformers import AutoModelForSequenceClassification
+
+    rss_before = current_rss_mb()
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    model.eval()
+    # safetensors weights are memory-mapped and only count once touched; copy them
+    # into process memory so both modes measure fully loaded weights
+    with torch.no_grad():
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            tensor.data = tensor.data.clone()
+    gc.collect()
+    if mode == 'dynamic-int8':
+        # quantize_dynamic copies; rebinding drops the only fp32 reference
+        model = quantize_dynamic_int8(model)
+    gc.collect()
+    return current_rss_mb() - rss_before
+
+
+if __name__ == '__main__':
+    # Child process for measure_load_rss_mb: --measure-rss <model_dir> <mode>
+    if len(sys.argv) != 4 or sys.argv[1] != '--measure-rss':
+        sys.exit(f'Usage: {sys.argv[0]} --measure-rss <model_dir> <mode>')
+    print(json.dumps({'rss_mb': _measure_rss_in_this_process(sys.argv[2], sys.argv[3])}))
@@ -55,6 +55,7 @@ import sys
 import json
 import traceback
 from datetime import datetime
+from pathlib import Path
 
 try:
     from transformers import AutoTokenizer, AutoModelForSequenceClassification
@@ -67,13 +68,19 @@ except ImportError as e:
     }), flush=True)
     sys.exit(1)
 
+# Shared sentiment cache lives in scripts/ml
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from sentiment_cache import SentimentCache
+
 
 class NewsSentimentScorer:
     """Sentiment scorer using pre-trained FinBERT"""
 
-    def __init__(self):
+    def __init__(self, batch_size: int = 32):
         """Load model on initialization"""
         self.model_name = "ProsusAI/finbert"
+        self.batch_size = batch_size
+        self.cache = SentimentCache()
         self.tokenizer = None
         self.model = None
         self.load_model()
@@ -110,22 +117,80 @@ class NewsSentimentScorer:
                 'probabilities': dict
             }
         """
-        if not text or not text.strip():
-            return {
-                'score': 0.0,
-                'confidence': 0.0,
-                'label': 'neutral',
-                'probabilities': {'negative': 0.33, 'neutral': 0.34, 'positive': 0.33}
-            }
+        return self.score_texts([text])[0]
+
+    def score_texts(self, texts: list) -> list:
+        """
+        Score many texts with length-bucketed, dynamically padded batches
+
+        Texts already in the shared sentiment cache are not rescored. The rest
+        are tokenized once without padding, sorted by token length and grouped
+        into batches of up to batch_size. Each batch is padded only to its own
+        longest sequence, so short headlines never pay for 512-token padding and
+        a typical per-ticker news pull needs one or two forward passes.
+
+        Args:
+            texts: List of news headlines or article texts
+
+        Returns:
+            List of sentiment dicts in the same order as texts
+        """
+        results = [None] * len(texts)
+        valid = []
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                results[i] = {
+                    'score': 0.0,
+                    'confidence': 0.0,
+                    'label': 'neutral',
+                    'probabilities': {'negative': 0.33, 'neutral': 0.34, 'positive': 0.33}
+                }
+            else:
+                valid.append(i)
+
+        if not valid:
+            return results
 
         try:
-            # Tokenize
-            inputs = self.tokenizer(
-                text,
-                return_tensors="pt",
-                truncation=True,
-                max_length=512,
-                padding=True
+            # Shared content-hash cache: only unseen texts reach the transformer
+            probabilities = self.cache.score(self.model_name, [texts[i] for i in valid], self.run_model)
+            for i, probs in zip(valid, probabilities):
+                results[i] = self.format_sentiment(list(probs))
+
+        except Exception as e:
+            self.log(f"Error scoring {len(valid)} texts: {e}")
+            for i in valid:
+                if results[i] is None:
+                    results[i] = {
+                        'score': 0.0,
+                        'confidence': 0.0,
+                        'label': 'neutral',
+                        'error': str(e)
+                    }
+
+        return results
+
+    def run_model(self, texts: list) -> list:
+        """[negative, neutral, positive] probabilities per text via length-bucketed FinBERT passes"""
+        probabilities_out = [None] * len(texts)
+
+        # Tokenize everything once, unpadded
+        encodings = self.tokenizer(
+            texts,
+            truncation=True,
+            max_length=512
+        )
+        lengths = [len(ids) for ids in encodings['input_ids']]
+        order = sorted(range(len(texts)), key=lengths.__getitem__)
+
+        for start in range(0, len(order), self.batch_size):
+            bucket = order[start:start + self.batch_size]
+
+            # Pad only to the longest sequence in this bucket
+            inputs = self.tokenizer.pad(
+                {key: [encodings[key][j] for j in bucket] for key in encodings.keys()},
+                padding='longest',
+                return_tensors="pt"
             )
 
             # Get predictions
@@ -133,45 +198,41 @@ class NewsSentimentScorer:
                 outputs = self.model(**inputs)
                 probabilities = torch.softmax(outputs.logits, dim=-1)
 
-            # Extract probabilities
-            probs = probabilities[0].tolist()
-            negative, neutral, positive = probs
+            for j, probs in zip(bucket, probabilities.tolist()):
+                probabilities_out[j] = probs
 
-            # Calculate sentiment score (-1 to +1)
-            score = positive - negative
-            confidence = max(probs)
+        return probabilities_out
 
-            # Determine label
-            if score > 0.2:
-                label = 'positive'
-            elif score < -0.2:
-                label = 'negative'
-            else:
-                label = 'neutral'
+    def format_sentiment(self, probs: list) -> dict:
+        """Convert [negative, neutral, positive] probabilities into a sentiment dict"""
+        negative, neutral, positive = probs
 
-            return {
-                'score': round(score, 4),
-                'confidence': round(confidence, 4),
-                'label': label,
-                'probabilities': {
-                    'negative': round(negative, 4),
-                    'neutral': round(neutral, 4),
-                    'positive': round(positive, 4)
-                }
-            }
+        # Calculate sentiment score (-1 to +1)
+        score = positive - negative
+        confidence = max(probs)
 
-        except Exception as e:
-            self.log(f"Error scoring text: {e}")
-            return {
-                'score': 0.0,
-                'confidence': 0.0,
-                'label': 'neutral',
-                'error': str(e)
+        # Determine label
+        if score > 0.2:
+            label = 'positive'
+        elif score < -0.2:
+            label = 'negative'
+        else:
+            label = 'neutral'
+
+        return {
+            'score': round(score, 4),
+            'confidence': round(confidence, 4),
+            'label': label,
+            'probabilities': {
+                'negative': round(negative, 4),
+                'neutral': round(neutral, 4),
+                'positive': round(positive, 4)
             }
+        }
 
     def score_batch(self, articles: list) -> list:
         """
-        Score multiple articles
+        Score multiple articles in batched forward passes
 
         Args:
             articles: List of dicts with 'title' and optional 'description'
@@ -179,17 +240,15 @@ class NewsSentimentScorer:
         Returns:
             List of sentiment dicts
         """
-        results = []
+        texts = []
         for article in articles:
             # Combine title and description
             text = article.get('title', '')
             if article.get('description'):
                 text += ". " + article['description']
+            texts.append(text)
 
-            sentiment = self.score_text(text)
-            results.append(sentiment)
-
-        return results
+        return self.score_texts(texts)
 
     def handle_request(self, request: dict) -> dict:
         """Handle a single request"""
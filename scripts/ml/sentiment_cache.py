@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed FinBERT Sentiment Cache (shared by every FinBERT entry point)
+
+Stores the 3-class softmax probabilities produced by a sentiment model (in the
+model's own output order), keyed by SHA-1 of (model version, normalized text). Every scorer
+formats its own output from these probabilities, so one cache serves
+score-news-sentiment.py, score-polygon-sentiment.py, add-sentiment-features.py
+and predict-sentiment-fusion.py: a headline scored by any of them is never run
+through the same model again.
+
+Storage: a single SQLite file (default data/cache/sentiment/finbert-cache.sqlite
+under the repository root, override with SENTIMENT_CACHE_PATH) in WAL mode, so many
+processes can read concurrently while one writes, with reads served from a
+memory-mapped file. Size is bounded by SENTIMENT_CACHE_MAX_ENTRIES; when exceeded,
+the least recently used entries are evicted.
+
+The cache is only an optimization: if the file cannot be opened (unwritable
+directory, locked or corrupt database) or a lookup fails, a warning is printed and
+texts are scored by the model as if they were cache misses.
+
+Usage:
+    cache = SentimentCache()
+    probs = cache.score(model_version, texts, run_model)   # run_model only sees cache misses
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from typing import Callable, List, Optional, Sequence, Tuple
+
+Probabilities = Tuple[float, float, float]
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DEFAULT_CACHE_PATH = os.path.join(REPO_ROOT, 'data', 'cache', 'sentiment', 'finbert-cache.sqlite')
+DEFAULT_MAX_ENTRIES = 2_000_000
+MMAP_BYTES = 256 * 1024 * 1024
+BUSY_TIMEOUT_MS = 30_000
+# SQLite's default limit on bound parameters per statement is 999
+LOOKUP_CHUNK = 900
+# Re-count rows after this many inserts to decide whether to evict
+EVICTION_CHECK_INTERVAL = 10_000
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for hashing: NFKC, trimmed, internal whitespace collapsed"""
+    return ' '.join(unicodedata.normalize('NFKC', text).split())
+
+
+def model_version_for_dir(model_dir: str) -> str:
+    """Version string for a local model directory: path plus weights file stamp, so retrains miss"""
+    for weights in ('model.safetensors', 'pytorch_model.bin'):
+        weights_path = os.path.join(model_dir, weights)
+        if os.path.exists(weights_path):
+            stat = os.stat(weights_path)
+            return f'{os.path.abspath(model_dir)}:{stat.st_size}:{stat.st_mtime_ns}'
+    return os.path.abspath(model_dir)
+
+
+class SentimentCache:
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.path = path or os.environ.get('SENTIMENT_CACHE_PATH', DEFAULT_CACHE_PATH)
+        self.max_entries = max_entries or int(os.environ.get('SENTIMENT_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+        self._lock = threading.Lock()
+        self._inserts_since_check = EVICTION_CHECK_INTERVAL
+        self.hits = 0
+        self.misses = 0
+        # One connection per process, shared by worker threads under self._lock; None = caching disabled
+        self._conn: Optional[sqlite3.Connection] = None
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False, isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(f'PRAGMA mmap_size={MMAP_BYTES}')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS sentiment ('
+                ' key BLOB PRIMARY KEY,'
+                ' negative REAL NOT NULL,'
+                ' neutral REAL NOT NULL,'
+                ' positive REAL NOT NULL,'
+                ' accessed INTEGER NOT NULL'
+                ') WITHOUT ROWID'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS sentiment_accessed ON sentiment (accessed)')
+        except (sqlite3.Error, OSError) as e:
+            sys.stderr.write(f'Sentiment cache unavailable ({self.path}): {e}; scoring without cache\n')
+            sys.stderr.flush()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    @staticmethod
+    def key(model_version: str, text: str) -> bytes:
+        return hashlib.sha1(f'{model_version}\0{normalize_text(text)}'.encode('utf-8')).digest()
+
+    def get_many(self, model_version: str, texts: Sequence[str]) -> List[Optional[Probabilities]]:
+        """Cached probabilities per text (None for misses), in input order"""
+        keys = [self.key(model_version, text) for text in texts]
+        found = {}
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    unique_keys = list(dict.fromkeys(keys))
+                    for start in range(0, len(unique_keys), LOOKUP_CHUNK):
+                        chunk = unique_keys[start:start + LOOKUP_CHUNK]
+                        placeholders = ','.join('?' * len(chunk))
+                        rows = self._conn.execute(
+                            f'SELECT key, negative, neutral, positive FROM sentiment WHERE key IN ({placeholders})',
+                            chunk
+                        ).fetchall()
+                        for key, negative, neutral, positive in rows:
+                            found[key] = (negative, neutral, positive)
+                except sqlite3.Error as e:
+                    found = {}
+                    sys.stderr.write(f'Sentiment cache read failed ({self.path}): {e}\n')
+                    sys.stderr.flush()
+
+                if found:
+                    self._touch(list(found.keys()))
+
+            results = [found.get(key) for key in keys]
+            hits = sum(1 for r in results if r is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, model_version: str, texts: Sequence[str], probabilities: Sequence[Sequence[float]]) -> None:
+        """Store probabilities for texts (same order)"""
+        now = int(time.time())
+        rows = [
+            (self.key(model_version, text), float(p[0]), float(p[1]), float(p[2]), now)
+            for text, p in zip(texts, probabilities)
+        ]
+        if not rows:
+            return
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute('BEGIN IMMEDIATE')
+                self._conn.executemany('INSERT OR REPLACE INTO sentiment VALUES (?, ?, ?, ?, ?)', rows)
+                self._conn.execute('COMMIT')
+            except sqlite3.Error as e:
+                self._rollback()
+                sys.stderr.write(f'Sentiment cache write failed ({self.path}): {e}\n')
+                sys.stderr.flush()
+                return
+
+            self._inserts_since_check += len(rows)
+            if self._inserts_since_check >= EVICTION_CHECK_INTERVAL:
+                self._inserts_since_check = 0
+                self._evict()
+
+    def score(
+        self,
+        model_version: str,
+        texts: Sequence[str],
+        run_model: Callable[[List[str]], List[Sequence[float]]]
+    ) -> List[Probabilities]:
+        """
+        Probabilities for every text, running run_model only on cache misses
+
+        Args:
+            model_version: Identifies the model (hub name or model_version_for_dir())
+            texts: Non-empty texts to score
+            run_model: Maps a list of texts to 3 class probabilities per text
+        """
+        cached = self.get_many(model_version, texts)
+        missing = [i for i, probs in enumerate(cached) if probs is None]
+        if missing:
+            # Score each distinct normalized text once
+            first_index = {}
+            for i in missing:
+                first_index.setdefault(normalize_text(texts[i]), i)
+            to_score = list(first_index.values())
+            scored = run_model([texts[i] for i in to_score])
+            self.put_many(model_version, [texts[i] for i in to_score], scored)
+
+            by_text = {normalize_text(texts[i]): tuple(float(p) for p in probs) for i, probs in zip(to_score, scored)}
+            for i in missing:
+                cached[i] = by_text[normalize_text(texts[i])]
+        return cached
+
+    def _touch(self, keys: List[bytes]) -> None:
+        """Best-effort LRU bookkeeping; skipped if another process holds the write lock"""
+        now = int(time.time())
+        try:
+            # Never wait on another process's write lock just to refresh timestamps
+            self._conn.execute('PRAGMA busy_timeout=0')
+            self._conn.execute('BEGIN IMMEDIATE')
+            for start in range(0, len(keys), LOOKUP_CHUNK):
+                chunk = keys[start:start + LOOKUP_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                self._conn.execute(
+                    f'UPDATE sentiment SET accessed = ? WHERE key IN ({placeholders}) AND accessed < ?',
+                    [now, *chunk, now]
+                )
+            self._conn.execute('COMMIT')
+        except sqlite3.Error:
+            self._rollback()
+        finally:
+            self._conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+
+    def _evict(self) -> None:
+        """Trim to 90% of max_entries by dropping least recently accessed rows"""
+        try:
+            count = self._conn.execute('SELECT COUNT(*) FROM sentiment').fetchone()[0]
+            if count <= self.max_entries:
+                return
+            excess = count - int(self.max_entries * 0.9)
+            self._conn.execute(
+                'DELETE FROM sentiment WHERE key IN (SELECT key FROM sentiment ORDER BY accessed LIMIT ?)',
+                (excess,)
+            )
+            sys.stderr.write(f'Sentiment cache evicted {excess} entries ({self.path})\n')
+            sys.stderr.flush()
+        except sqlite3.Error as e:
+            sys.stderr.write(f'Sentiment cache eviction failed ({self.path}): {e}\n')
+            sys.stderr.flush()
+
+    def _rollback(self) -> None:
+        try:
+            self._conn.execute('ROLLBACK')
+        except sqlite3.Error:
+            pass
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
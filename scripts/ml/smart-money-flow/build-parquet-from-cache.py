@@ -14,62 +14,106 @@ Features Built:
 
 Input: data/cache/polygon_prices/*.csv, data/cache/polygon_sentiment/*.json
 Output: data/smart_money_features/*.parquet (updated with real data)
+
+All rolling windows are computed in one vectorized pass per symbol, then
+subsampled at the weekly cadence; every Parquet output is cut from that frame.
 """
 
+import sys
 import pandas as pd
 import numpy as np
 from pathlib import Path
 import json
 from datetime import datetime, timedelta
+from numpy.lib.stride_tricks import sliding_window_view
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from rolling_kernels import rolling_mean, rolling_sum
+
+# Weekly sampling: features start at day 30 (enough history), placeholders at day 7
+SAMPLE_EVERY = 7
+FEATURE_START = 30
+PLACEHOLDER_START = 7
+
+def calculate_rolling_features(df):
+    """
+    Every rolling feature for one symbol, as vectorized columns over all days
+
+    Row i is computed from the trailing window ending at row i (20 days for momentum,
+    30 for the rest); rows without a full window hold NaN or a neutral default.
+    Only rows from FEATURE_START on are sampled, so every sampled row has full windows.
+    """
+    close = df['Close'].to_numpy(dtype=float)
+    open_ = df['Open'].to_numpy(dtype=float)
+    volume = df['Volume'].to_numpy(dtype=float)
+    n = len(df)
+
+    features = pd.DataFrame(index=df.index)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Price momentum: close vs close 19 rows earlier (iloc[-1] / iloc[-20])
+        momentum = np.full(n, np.nan)
+        momentum[19:] = close[19:] / close[:-19] - 1.0
+        features['price_momentum_20d'] = momentum
+
+        # Volume trend: 7-day vs 30-day average volume
+        baseline_avg = np.asarray(rolling_mean(volume, 30))
+        recent_avg = np.asarray(rolling_mean(volume, 7))
+        features['volume_trend_30d'] = np.where(baseline_avg > 0, recent_avg / baseline_avg, 1.0)
+
+        # Volatility: std dev of the last 30 daily returns
+        features['price_volatility_30d'] = df['Close'].pct_change().rolling(30).std().to_numpy()
+
+        # Volume concentration: top day / average over 30 days
+        volume_max = df['Volume'].rolling(30).max().to_numpy()
+        features['volume_concentration'] = np.where(baseline_avg > 0, volume_max / baseline_avg, 0.0)
+
+        # Institutional volume ratio (estimate: volume on up days / total)
+        total_volume = np.asarray(rolling_sum(volume, 30))
+        up_volume = np.asarray(rolling_sum(np.where(close > open_, volume, 0.0), 30))
+        features['institutional_volume_ratio'] = np.where(total_volume > 0, up_volume / total_volume, 0.5)
+
+        # Dark pool volume (estimate: use 10% of volume as proxy)
+        features['dark_pool_volume'] = total_volume * 0.10
+
+        # Block trades: share of the last 30 days with volume > 2x that window's average
+        block_ratio = np.full(n, np.nan)
+        if n >= 30:
+            windows = sliding_window_view(volume, 30)
+            block_ratio[29:] = (windows > 2 * baseline_avg[29:, None]).sum(axis=1) / 30
+        features['block_trade_ratio'] = block_ratio
+
+        # VWAP deviation: sum(price * volume) / sum(volume) over 30 days vs close
+        vwap = np.asarray(rolling_sum(close * volume, 30)) / total_volume
+        features['vwap_deviation'] = np.where(vwap > 0, (close - vwap) / vwap, 0.0)
+
+    return features
+
+def build_feature_frame(symbols_data):
+    """One pass per symbol: compute all rolling features, then subsample weekly"""
+    print("\n🏗️  Computing rolling features (single pass per symbol)...")
+
+    feature_frames = []
+    placeholder_frames = []
+
+    for symbol, df in symbols_data.items():
+        df = df.reset_index(drop=True)
+        dates = df['Date'].dt.strftime('%Y-%m-%d')
+
+        features = calculate_rolling_features(df)
+        features.insert(0, 'symbol', symbol)
+        features.insert(1, 'date', dates)
+        feature_frames.append(features.iloc[FEATURE_START::SAMPLE_EVERY])
+
+        placeholder_frames.append(pd.DataFrame({
+            'symbol': symbol,
+            'date': dates.iloc[PLACEHOLDER_START::SAMPLE_EVERY]
+        }))
 
-def calculate_price_momentum(df, window=20):
-    """Calculate price momentum over window days"""
-    if len(df) < window:
-        return 0.0
-    return (df['Close'].iloc[-1] / df['Close'].iloc[-window] - 1.0)
-
-def calculate_volume_trend(df, window=30):
-    """Calculate volume trend (current vs average)"""
-    if len(df) < window:
-        return 1.0
-    recent_avg = df['Volume'].iloc[-7:].mean()
-    baseline_avg = df['Volume'].iloc[-window:].mean()
-    return recent_avg / baseline_avg if baseline_avg > 0 else 1.0
-
-def calculate_volatility(df, window=30):
-    """Calculate price volatility (std dev of returns)"""
-    if len(df) < window:
-        return 0.0
-    returns = df['Close'].pct_change().iloc[-window:]
-    return returns.std()
-
-def calculate_volume_concentration(df, window=30):
-    """Volume concentration (top day / avg)"""
-    if len(df) < window:
-        return 0.0
-    volumes = df['Volume'].iloc[-window:]
-    return volumes.max() / volumes.mean() if volumes.mean() > 0 else 0.0
-
-def calculate_block_trade_ratio(df, window=30):
-    """Estimate block trades (days with volume > 2x avg)"""
-    if len(df) < window:
-        return 0.0
-    volumes = df['Volume'].iloc[-window:]
-    avg_volume = volumes.mean()
-    block_days = (volumes > 2 * avg_volume).sum()
-    return block_days / window
-
-def calculate_vwap_deviation(df, window=30):
-    """VWAP deviation from close price"""
-    if len(df) < window or 'Volume' not in df.columns:
-        return 0.0
-
-    recent_df = df.iloc[-window:].copy()
-    # VWAP = sum(price * volume) / sum(volume)
-    vwap = (recent_df['Close'] * recent_df['Volume']).sum() / recent_df['Volume'].sum()
-    current_price = recent_df['Close'].iloc[-1]
-
-    return (current_price - vwap) / vwap if vwap > 0 else 0.0
+    df_features = pd.concat(feature_frames, ignore_index=True) if feature_frames else pd.DataFrame()
+    df_dates = pd.concat(placeholder_frames, ignore_index=True) if placeholder_frames else pd.DataFrame()
+    print(f"  ✅ Computed {len(df_features):,} weekly samples across {len(symbols_data)} symbols")
+    return df_features, df_dates
 
 def load_cached_prices(cache_dir):
     """Load all cached price CSV files"""
@@ -98,141 +142,41 @@ def load_cached_prices(cache_dir):
     print(f"  ✅ Loaded price data for {len(symbols_data)} symbols")
     return symbols_data
 
-def build_price_features(symbols_data):
-    """Build price_features.parquet from cached price data"""
+def build_price_features(df_features):
+    """Build price_features.parquet from the weekly feature frame"""
     print("\n🏗️  Building price_features.parquet...")
+    df = df_features[['symbol', 'date', 'price_momentum_20d', 'volume_trend_30d', 'price_volatility_30d']]
+    print(f"  ✅ Generated {len(df):,} price feature records")
+    return df
 
-    records = []
-
-    for symbol, df in symbols_data.items():
-        # Generate samples every 7 days
-        dates = df['Date'].values
-
-        for i in range(30, len(dates), 7):  # Start at day 30 to have enough history
-            date = pd.to_datetime(dates[i])
-            date_str = date.strftime('%Y-%m-%d')
-
-            # Get data up to this date
-            hist_df = df[df['Date'] <= date].copy()
-
-            # Calculate features
-            momentum_20d = calculate_price_momentum(hist_df, 20)
-            volume_trend_30d = calculate_volume_trend(hist_df, 30)
-            volatility_30d = calculate_volatility(hist_df, 30)
-
-            records.append({
-                'symbol': symbol,
-                'date': date_str,
-                'price_momentum_20d': momentum_20d,
-                'volume_trend_30d': volume_trend_30d,
-                'price_volatility_30d': volatility_30d
-            })
-
-    df_features = pd.DataFrame(records)
-    print(f"  ✅ Generated {len(df_features):,} price feature records")
-    return df_features
-
-def build_volume_features(symbols_data):
-    """Build volume_features.parquet from cached price data"""
+def build_volume_features(df_features):
+    """Build volume_features.parquet from the weekly feature frame"""
     print("\n🏗️  Building volume_features.parquet...")
+    df = df_features[['symbol', 'date', 'institutional_volume_ratio', 'volume_concentration', 'dark_pool_volume']]
+    print(f"  ✅ Generated {len(df):,} volume feature records")
+    return df
 
-    records = []
-
-    for symbol, df in symbols_data.items():
-        dates = df['Date'].values
-
-        for i in range(30, len(dates), 7):
-            date = pd.to_datetime(dates[i])
-            date_str = date.strftime('%Y-%m-%d')
-
-            hist_df = df[df['Date'] <= date].copy()
-
-            # Calculate volume features
-            volume_concentration = calculate_volume_concentration(hist_df, 30)
-
-            # Institutional volume ratio (estimate: volume on up days / total)
-            recent_df = hist_df.iloc[-30:]
-            up_days_volume = recent_df[recent_df['Close'] > recent_df['Open']]['Volume'].sum()
-            total_volume = recent_df['Volume'].sum()
-            inst_ratio = up_days_volume / total_volume if total_volume > 0 else 0.5
-
-            # Dark pool volume (estimate: use 10% of volume as proxy)
-            dark_pool_volume = recent_df['Volume'].sum() * 0.10
-
-            records.append({
-                'symbol': symbol,
-                'date': date_str,
-                'institutional_volume_ratio': inst_ratio,
-                'volume_concentration': volume_concentration,
-                'dark_pool_volume': dark_pool_volume
-            })
-
-    df_features = pd.DataFrame(records)
-    print(f"  ✅ Generated {len(df_features):,} volume feature records")
-    return df_features
-
-def build_advanced_volume_features(symbols_data):
-    """Build advanced_volume_features.parquet"""
+def build_advanced_volume_features(df_features):
+    """Build advanced_volume_features.parquet from the weekly feature frame"""
     print("\n🏗️  Building advanced_volume_features.parquet...")
+    df = df_features[['symbol', 'date', 'block_trade_ratio', 'vwap_deviation']]
+    print(f"  ✅ Generated {len(df):,} advanced volume feature records")
+    return df
 
-    records = []
-
-    for symbol, df in symbols_data.items():
-        dates = df['Date'].values
-
-        for i in range(30, len(dates), 7):
-            date = pd.to_datetime(dates[i])
-            date_str = date.strftime('%Y-%m-%d')
-
-            hist_df = df[df['Date'] <= date].copy()
-
-            block_ratio = calculate_block_trade_ratio(hist_df, 30)
-            vwap_dev = calculate_vwap_deviation(hist_df, 30)
-
-            records.append({
-                'symbol': symbol,
-                'date': date_str,
-                'block_trade_ratio': block_ratio,
-                'vwap_deviation': vwap_dev
-            })
-
-    df_features = pd.DataFrame(records)
-    print(f"  ✅ Generated {len(df_features):,} advanced volume feature records")
-    return df_features
-
-def build_placeholder_features(symbols_data):
+def build_placeholder_features(df_dates):
     """Build placeholder Parquet files for options and congress"""
     print("\n🏗️  Building placeholder features (options, congress)...")
 
-    options_records = []
-    congress_records = []
+    # Options: put/call ratio placeholder (neutral 1.0)
+    df_options = df_dates.copy()
+    df_options['put_call_ratio'] = 1.0
 
-    for symbol, df in symbols_data.items():
-        dates = df['Date'].values
-
-        for i in range(7, len(dates), 7):
-            date = pd.to_datetime(dates[i])
-            date_str = date.strftime('%Y-%m-%d')
-
-            # Options: put/call ratio placeholder (neutral 1.0)
-            options_records.append({
-                'symbol': symbol,
-                'date': date_str,
-                'put_call_ratio': 1.0
-            })
-
-            # Congress: all zeros (no trades)
-            congress_records.append({
-                'symbol': symbol,
-                'date': date_str,
-                'congress_buy_count': 0,
-                'congress_sell_count': 0,
-                'congress_net_value': 0.0,
-                'congress_net_sentiment': 0.0
-            })
-
-    df_options = pd.DataFrame(options_records)
-    df_congress = pd.DataFrame(congress_records)
+    # Congress: all zeros (no trades)
+    df_congress = df_dates.copy()
+    df_congress['congress_buy_count'] = 0
+    df_congress['congress_sell_count'] = 0
+    df_congress['congress_net_value'] = 0.0
+    df_congress['congress_net_sentiment'] = 0.0
 
     print(f"  ✅ Generated {len(df_options):,} options records (placeholder)")
     print(f"  ✅ Generated {len(df_congress):,} congress records (placeholder)")
@@ -262,11 +206,12 @@ def main():
         print("\n❌ No cached price data found!")
         return
 
-    # Build all feature files
-    df_price = build_price_features(symbols_data)
-    df_volume = build_volume_features(symbols_data)
-    df_advanced = build_advanced_volume_features(symbols_data)
-    df_options, df_congress = build_placeholder_features(symbols_data)
+    # Build all feature files from one computed frame
+    df_features, df_dates = build_feature_frame(symbols_data)
+    df_price = build_price_features(df_features)
+    df_volume = build_volume_features(df_features)
+    df_advanced = build_advanced_volume_features(df_features)
+    df_options, df_congress = build_placeholder_features(df_dates)
 
     # Save to Parquet
     print("\n💾 Saving Parquet files...")
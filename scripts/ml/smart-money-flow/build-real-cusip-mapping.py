@@ -7,15 +7,29 @@ Strategy:
 2. Download SEC company tickers to get CIK → Ticker
 3. Match company names to create CUSIP → Ticker mapping
 4. Save to Parquet for fast lookups
+
+CUSIPs already in cusip_ticker_mapping.parquet under the same company name, matched
+by MATCH_RULE against the same SEC ticker list, are kept as-is; the rest (including
+previously unmatched CUSIPs once the ticker list changes) are matched with the
+indexed matcher in scripts/ml/cusip_matcher.py.
 """
 
+import sys
 import zipfile
 import pandas as pd
 from io import StringIO
 import requests
 import json
 from pathlib import Path
-import re
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from cusip_matcher import (
+    DEFAULT_MAPPING_PATH, CompanyNameMatcher, load_cusip_mapping, normalize_company_name, save_cusip_mapping,
+    ticker_universe_version
+)
+
+# Name of the matching rule in build_mapping(); persisted matches from any other rule are not reused
+MATCH_RULE = 'exact,normalized,containment'
 
 def download_sec_tickers():
     """Download SEC company tickers (CIK → Ticker mapping)"""
@@ -48,14 +62,6 @@ def download_sec_tickers():
     print(f"  ✅ Downloaded {len(ticker_to_name)} company tickers")
     return ticker_to_name, name_to_ticker
 
-def normalize_company_name(name):
-    """Normalize company name for matching"""
-    # Remove common suffixes
-    name = name.upper().strip()
-    name = re.sub(r'\s+(INC|CORP|LTD|LLC|CO|COMPANY|CORPORATION|INCORPORATED|LIMITED)\.?$', '', name)
-    name = re.sub(r'\s+', ' ', name)  # Normalize whitespace
-    return name.strip()
-
 def load_cusip_from_13f(zip_path):
     """Load CUSIP → Company Name from 13F filings"""
     cusip_to_name = {}
@@ -101,63 +107,54 @@ def build_mapping():
 
     print(f"\n  ✅ Loaded {len(cusip_to_name)} unique CUSIPs from 13F filings")
 
-    # Match CUSIPs to tickers
+    # Match CUSIPs to tickers (only those not already in the persisted mapping)
     print("\n🔗 Matching CUSIPs to tickers...")
-    mappings = []
+    entries = [(name, ticker) for ticker, name in ticker_to_name.items()]
+    universe = ticker_universe_version(entries)
+    persisted = load_cusip_mapping(DEFAULT_MAPPING_PATH, MATCH_RULE, universe)
+    matcher = CompanyNameMatcher(entries)
+    mapping = {}
     matched = 0
     unmatched = 0
+    reused = 0
 
     for cusip, company_name in cusip_to_name.items():
-        normalized_name = normalize_company_name(company_name)
+        known = persisted.get(str(cusip))
+        if known is not None and known[1] == company_name:
+            ticker = known[0]
+            reused += 1
+        else:
+            normalized_name = normalize_company_name(company_name)
 
-        # Try exact match first
-        ticker = name_to_ticker.get(company_name)
+            # Try exact match first, then normalized match
+            ticker = matcher.exact(company_name) or matcher.exact(normalized_name)
 
-        if not ticker:
-            # Try normalized match
-            ticker = name_to_ticker.get(normalized_name)
+            if not ticker:
+                # Try fuzzy match (any ticker's company name contains, or is contained in, the normalized name)
+                ticker = matcher.containment(company_name)
 
-        if not ticker:
-            # Try fuzzy match (check if any ticker's company name contains the normalized name)
-            for t, full_name in ticker_to_name.items():
-                if normalized_name in normalize_company_name(full_name) or \
-                   normalize_company_name(full_name) in normalized_name:
-                    ticker = t
-                    break
+        # Unmatched CUSIPs are kept with an empty ticker for reference
+        mapping[str(cusip)] = (ticker or '', company_name)
 
         if ticker:
-            mappings.append({
-                'cusip': cusip,
-                'ticker': ticker,
-                'company_name': company_name
-            })
             matched += 1
         else:
             unmatched += 1
-            # Still add it with empty ticker for reference
-            mappings.append({
-                'cusip': cusip,
-                'ticker': '',
-                'company_name': company_name
-            })
 
     print(f"  ✅ Matched {matched} CUSIPs to tickers ({matched/len(cusip_to_name)*100:.1f}%)")
     print(f"  ⚠️  Unmatched: {unmatched} CUSIPs ({unmatched/len(cusip_to_name)*100:.1f}%)")
+    print(f"  ♻️  Reused {reused} CUSIPs from {DEFAULT_MAPPING_PATH}")
 
     # Save to Parquet
     print("\n💾 Saving to Parquet...")
-    df = pd.DataFrame(mappings)
-
-    output_dir = Path('data/smart_money_features')
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    parquet_path = output_dir / 'cusip_ticker_mapping.parquet'
-    df.to_parquet(parquet_path, index=False, compression='snappy')
+    df = save_cusip_mapping(mapping, DEFAULT_MAPPING_PATH, MATCH_RULE, universe)
+    matched = int((df['ticker'] != '').sum())
+    unmatched = len(df) - matched
 
-    print(f"  ✅ Saved {len(df)} CUSIP mappings to {parquet_path}")
+    print(f"  ✅ Saved {len(df)} CUSIP mappings to {DEFAULT_MAPPING_PATH}")
 
     # Also save as CSV for easy inspection
-    csv_path = output_dir / 'cusip_ticker_mapping.csv'
+    csv_path = DEFAULT_MAPPING_PATH.with_suffix('.csv')
     df.to_csv(csv_path, index=False)
     print(f"  ✅ Saved CSV to {csv_path}")
 
@@ -2,8 +2,14 @@
 """
 Extract Smart Money Flow Features from EODHD Options Data
 Calculates unusual options activity, positioning metrics, and smart money signals
+
+Reads the latest Parquet snapshot per ticker (data/eodhd_options/parquet/date=*/ticker=*/),
+loading only the columns the features use, and falls back to legacy per-ticker CSVs.
+All chains are combined into one frame and every feature is computed with grouped,
+masked aggregations keyed by symbol, producing a single options_features.csv.
 """
 
+import sys
 import pandas as pd
 import numpy as np
 from pathlib import Path
@@ -11,135 +17,159 @@ import json
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from options_parquet_sink import OptionsParquetSink
+
 # Directories
 OPTIONS_DIR = Path('data/eodhd_options')
+PARQUET_DIR = OPTIONS_DIR / 'parquet'
 OUTPUT_FILE = Path('data/training/smart-money-flow-lean/options_features.csv')
 
-def load_options_data(ticker: str) -> pd.DataFrame:
-    """Load options data for a given ticker"""
-    csv_files = list(OPTIONS_DIR.glob(f'{ticker}_*.csv'))
-    if not csv_files:
-        return None
-
-    # Use most recent file
-    csv_file = sorted(csv_files)[-1]
-    df = pd.read_csv(csv_file)
+# Option chain columns used by calculate_options_features
+FEATURE_INPUT_COLUMNS = [
+    'type', 'strike', 'last', 'midpoint', 'volume', 'open_interest',
+    'delta', 'gamma', 'volatility', 'dte'
+]
+
+def load_options_chains(csv_files: list) -> pd.DataFrame:
+    """
+    Load every ticker's latest chain into one typed frame (symbol, FEATURE_INPUT_COLUMNS)
+
+    Parquet snapshots are read as one dataset; tickers without one fall back to their
+    most recent legacy CSV.
+    """
+    chains = OptionsParquetSink(PARQUET_DIR).read_latest(FEATURE_INPUT_COLUMNS).rename(columns={'ticker': 'symbol'})
+    frames = [chains]
+
+    parquet_tickers = set(chains['symbol'].unique())
+    latest_csv = {}
+    for csv_file in sorted(csv_files):
+        latest_csv[csv_file.stem.split('_')[0]] = csv_file  # Ticker from filename; sorted → most recent wins
+    for ticker, csv_file in latest_csv.items():
+        if ticker in parquet_tickers:
+            continue
+        df = pd.read_csv(csv_file, usecols=lambda col: col in FEATURE_INPUT_COLUMNS)
+        frames.append(df.reindex(columns=FEATURE_INPUT_COLUMNS).assign(symbol=ticker))
+
+    frames = [frame for frame in frames if len(frame) > 0]
+    if not frames:
+        return pd.DataFrame(columns=['symbol'] + FEATURE_INPUT_COLUMNS)
+    df = pd.concat(frames, ignore_index=True)
+    df['symbol'] = df['symbol'].astype(str).astype('category')
+    df['type'] = df['type'].astype(str).astype('category')
+    for col in FEATURE_INPUT_COLUMNS[1:]:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
     return df
 
-def calculate_options_features(df: pd.DataFrame, ticker: str) -> dict:
-    """Calculate smart money options features from options chain data"""
-
-    if df is None or len(df) == 0:
-        return None
-
-    features = {}
-
-    try:
-        # Separate calls and puts
-        calls = df[df['type'] == 'call'].copy()
-        puts = df[df['type'] == 'put'].copy()
-
-        # === Volume & Open Interest Metrics ===
-        total_call_volume = calls['volume'].fillna(0).sum()
-        total_put_volume = puts['volume'].fillna(0).sum()
-        total_call_oi = calls['open_interest'].fillna(0).sum()
-        total_put_oi = puts['open_interest'].fillna(0).sum()
-
-        # Put/Call Ratios
-        features['put_call_volume_ratio'] = total_put_volume / total_call_volume if total_call_volume > 0 else 1.0
-        features['put_call_oi_ratio'] = total_put_oi / total_call_oi if total_call_oi > 0 else 1.0
-
-        # === Unusual Activity Detection ===
-        # Large blocks (>100 contracts threshold)
-        large_call_volume = calls[calls['volume'] > 100]['volume'].fillna(0).sum()
-        large_put_volume = puts[puts['volume'] > 100]['volume'].fillna(0).sum()
-
-        features['large_block_call_pct'] = large_call_volume / total_call_volume if total_call_volume > 0 else 0.0
-        features['large_block_put_pct'] = large_put_volume / total_put_volume if total_put_volume > 0 else 0.0
-
-        # Premium paid above midpoint (smart money willing to pay up)
-        calls['premium_above_mid'] = ((calls['last'] - calls['midpoint']) / calls['midpoint']).fillna(0)
-        puts['premium_above_mid'] = ((puts['last'] - puts['midpoint']) / puts['midpoint']).fillna(0)
-
-        features['avg_call_premium_above_mid'] = calls[calls['volume'] > 0]['premium_above_mid'].mean()
-        features['avg_put_premium_above_mid'] = puts[puts['volume'] > 0]['premium_above_mid'].mean()
-
-        # === Positioning Metrics ===
-        # OI skew (call bias vs put bias)
-        features['oi_skew_call_put'] = (total_call_oi - total_put_oi) / (total_call_oi + total_put_oi) if (total_call_oi + total_put_oi) > 0 else 0.0
-
-        # Near-the-money concentration (within 5% of current price)
-        # Estimate current price from ATM options
-        atm_price = calls['strike'].median()  # Rough estimate
-        near_money_range = (atm_price * 0.95, atm_price * 1.05)
-
-        near_money_calls = calls[(calls['strike'] >= near_money_range[0]) & (calls['strike'] <= near_money_range[1])]
-        near_money_call_oi = near_money_calls['open_interest'].fillna(0).sum()
-        features['near_money_call_concentration'] = near_money_call_oi / total_call_oi if total_call_oi > 0 else 0.0
-
-        # Far OTM call activity (>20% OTM) - lottery tickets or insider info
-        far_otm_calls = calls[calls['strike'] > atm_price * 1.2]
-        far_otm_call_volume = far_otm_calls['volume'].fillna(0).sum()
-        features['far_otm_call_activity'] = far_otm_call_volume / total_call_volume if total_call_volume > 0 else 0.0
-
-        # Protective put buildup (ATM/OTM puts)
-        protective_puts = puts[puts['strike'] <= atm_price]
-        protective_put_oi = protective_puts['open_interest'].fillna(0).sum()
-        features['protective_put_ratio'] = protective_put_oi / total_put_oi if total_put_oi > 0 else 0.0
-
-        # === Greeks Analysis (Smart Money Signals) ===
-        # High delta call volume (delta > 0.7 = stock replacement)
-        high_delta_calls = calls[calls['delta'].abs() > 0.7]
-        high_delta_call_volume = high_delta_calls['volume'].fillna(0).sum()
-        features['high_delta_call_volume_pct'] = high_delta_call_volume / total_call_volume if total_call_volume > 0 else 0.0
-
-        # Long-dated options (>90 DTE = conviction)
-        long_dated_calls = calls[calls['dte'] > 90]
-        long_dated_call_volume = long_dated_calls['volume'].fillna(0).sum()
-        features['long_dated_call_ratio'] = long_dated_call_volume / total_call_volume if total_call_volume > 0 else 0.0
-
-        # Net gamma exposure (absolute value)
-        total_gamma = calls['gamma'].fillna(0).sum() - puts['gamma'].fillna(0).sum()
-        features['net_gamma_exposure'] = abs(total_gamma)
-
-        # === Volatility Signals ===
-        # IV rank approximation (current vs range in data)
-        all_iv = pd.concat([calls['volatility'], puts['volatility']]).dropna()
-        if len(all_iv) > 0:
-            current_iv = all_iv.median()
-            iv_min = all_iv.min()
-            iv_max = all_iv.max()
-            features['iv_rank_percentile'] = (current_iv - iv_min) / (iv_max - iv_min) if (iv_max - iv_min) > 0 else 0.5
-        else:
-            features['iv_rank_percentile'] = 0.5
-
-        # IV skew (put IV vs call IV at 25 delta)
-        call_25delta = calls[calls['delta'].abs().between(0.2, 0.3)]
-        put_25delta = puts[puts['delta'].abs().between(0.2, 0.3)]
-
-        if len(call_25delta) > 0 and len(put_25delta) > 0:
-            features['iv_skew_25delta'] = put_25delta['volatility'].mean() - call_25delta['volatility'].mean()
-        else:
-            features['iv_skew_25delta'] = 0.0
-
-        # === Volume/OI Ratio (Unusual activity indicator) ===
-        # High volume relative to OI = new positions being opened
-        calls['vol_oi_ratio'] = calls['volume'] / calls['open_interest'].replace(0, np.nan)
-        puts['vol_oi_ratio'] = puts['volume'] / puts['open_interest'].replace(0, np.nan)
-
-        features['avg_call_vol_oi_ratio'] = calls['vol_oi_ratio'].median()
-        features['avg_put_vol_oi_ratio'] = puts['vol_oi_ratio'].median()
-
-        # Fill NaN/inf values with 0
-        for key in features:
-            if pd.isna(features[key]) or np.isinf(features[key]):
-                features[key] = 0.0
-
-        return features
-
-    except Exception as e:
-        print(f"   ⚠️  Error calculating features for {ticker}: {e}")
-        return None
+def calculate_options_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calculate smart money options features for every ticker in a combined chain frame
+
+    Each feature is a masked column aggregated with one groupby over symbol, so the
+    cost is a few vectorized passes over all contracts rather than per-ticker filtering.
+    Returns one row per symbol (sorted) with the features as columns.
+    """
+    g = df.groupby('symbol', observed=True, sort=True)
+    is_call = (df['type'] == 'call').to_numpy()
+    is_put = (df['type'] == 'put').to_numpy()
+    volume = df['volume'].to_numpy()
+    vol = np.nan_to_num(volume, nan=0.0)
+    oi = np.nan_to_num(df['open_interest'].to_numpy(), nan=0.0)
+    strike = df['strike'].to_numpy()
+    abs_delta = np.abs(df['delta'].to_numpy())
+    iv = df['volatility'].to_numpy()
+
+    def total(values, mask):
+        """Per-symbol sum of values over rows where mask holds"""
+        return pd.Series(np.where(mask, values, 0.0), index=df.index).groupby(df['symbol'], observed=True, sort=True).sum()
+
+    def masked(values, mask):
+        """values where mask holds, NaN elsewhere (for skipna aggregations)"""
+        return pd.Series(np.where(mask, values, np.nan), index=df.index)
+
+    def ratio(numerator, denominator, default):
+        return (numerator / denominator.where(denominator > 0)).where(denominator > 0, default)
+
+    features = pd.DataFrame(index=g.size().index)
+
+    # === Volume & Open Interest Metrics ===
+    total_call_volume = total(vol, is_call)
+    total_put_volume = total(vol, is_put)
+    total_call_oi = total(oi, is_call)
+    total_put_oi = total(oi, is_put)
+
+    # Put/Call Ratios
+    features['put_call_volume_ratio'] = ratio(total_put_volume, total_call_volume, 1.0)
+    features['put_call_oi_ratio'] = ratio(total_put_oi, total_call_oi, 1.0)
+
+    # === Unusual Activity Detection ===
+    # Large blocks (>100 contracts threshold)
+    large_block = volume > 100
+    features['large_block_call_pct'] = ratio(total(vol, is_call & large_block), total_call_volume, 0.0)
+    features['large_block_put_pct'] = ratio(total(vol, is_put & large_block), total_put_volume, 0.0)
+
+    # Premium paid above midpoint (smart money willing to pay up)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        premium_above_mid = (df['last'] - df['midpoint']) / df['midpoint']
+    premium_above_mid = premium_above_mid.fillna(0).to_numpy()
+    traded = volume > 0
+    features['avg_call_premium_above_mid'] = masked(premium_above_mid, is_call & traded).groupby(df['symbol'], observed=True).mean()
+    features['avg_put_premium_above_mid'] = masked(premium_above_mid, is_put & traded).groupby(df['symbol'], observed=True).mean()
+
+    # === Positioning Metrics ===
+    # OI skew (call bias vs put bias)
+    features['oi_skew_call_put'] = ratio(total_call_oi - total_put_oi, total_call_oi + total_put_oi, 0.0)
+
+    # Near-the-money concentration (within 5% of current price)
+    # Estimate current price from ATM options (median call strike, broadcast to every contract)
+    atm_price = masked(strike, is_call).groupby(df['symbol'], observed=True).transform('median').to_numpy()
+    near_money = (strike >= atm_price * 0.95) & (strike <= atm_price * 1.05)
+    features['near_money_call_concentration'] = ratio(total(oi, is_call & near_money), total_call_oi, 0.0)
+
+    # Far OTM call activity (>20% OTM) - lottery tickets or insider info
+    features['far_otm_call_activity'] = ratio(total(vol, is_call & (strike > atm_price * 1.2)), total_call_volume, 0.0)
+
+    # Protective put buildup (ATM/OTM puts)
+    features['protective_put_ratio'] = ratio(total(oi, is_put & (strike <= atm_price)), total_put_oi, 0.0)
+
+    # === Greeks Analysis (Smart Money Signals) ===
+    # High delta call volume (delta > 0.7 = stock replacement)
+    features['high_delta_call_volume_pct'] = ratio(total(vol, is_call & (abs_delta > 0.7)), total_call_volume, 0.0)
+
+    # Long-dated options (>90 DTE = conviction)
+    features['long_dated_call_ratio'] = ratio(total(vol, is_call & (df['dte'].to_numpy() > 90)), total_call_volume, 0.0)
+
+    # Net gamma exposure (absolute value)
+    gamma = np.nan_to_num(df['gamma'].to_numpy(), nan=0.0)
+    features['net_gamma_exposure'] = (total(gamma, is_call) - total(gamma, is_put)).abs()
+
+    # === Volatility Signals ===
+    # IV rank approximation (current vs range in data)
+    all_iv = masked(iv, is_call | is_put).groupby(df['symbol'], observed=True).agg(['median', 'min', 'max', 'count'])
+    iv_range = all_iv['max'] - all_iv['min']
+    features['iv_rank_percentile'] = ((all_iv['median'] - all_iv['min']) / iv_range.where(iv_range > 0)) \
+        .where(iv_range > 0, 0.5).where(all_iv['count'] > 0, 0.5)
+
+    # IV skew (put IV vs call IV at 25 delta)
+    near_25_delta = (abs_delta >= 0.2) & (abs_delta <= 0.3)
+    call_25delta = is_call & near_25_delta
+    put_25delta = is_put & near_25_delta
+    skew = (masked(iv, put_25delta).groupby(df['symbol'], observed=True).mean()
+            - masked(iv, call_25delta).groupby(df['symbol'], observed=True).mean())
+    has_both = (total(1.0, call_25delta) > 0) & (total(1.0, put_25delta) > 0)
+    features['iv_skew_25delta'] = skew.where(has_both, 0.0)
+
+    # === Volume/OI Ratio (Unusual activity indicator) ===
+    # High volume relative to OI = new positions being opened
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vol_oi_ratio = volume / np.where(df['open_interest'].to_numpy() == 0, np.nan, df['open_interest'].to_numpy())
+    features['avg_call_vol_oi_ratio'] = masked(vol_oi_ratio, is_call).groupby(df['symbol'], observed=True).median()
+    features['avg_put_vol_oi_ratio'] = masked(vol_oi_ratio, is_put).groupby(df['symbol'], observed=True).median()
+
+    # Fill NaN/inf values with 0
+    features = features.replace([np.inf, -np.inf], np.nan).fillna(0.0)
+
+    return features.reset_index().assign(symbol=lambda f: f['symbol'].astype(str))
 
 def main():
     """Main extraction pipeline"""
@@ -148,44 +178,22 @@ def main():
     print("=" * 70)
     print()
 
-    # Get all ticker CSV files
+    # Tickers with Parquet snapshots or legacy CSV files
     csv_files = sorted(OPTIONS_DIR.glob('*.csv'))
     csv_files = [f for f in csv_files if not f.name.startswith(('nightly', 'progress'))]
 
-    print(f"📂 Found {len(csv_files)} options files in {OPTIONS_DIR}")
+    print(f"📂 Loading option chains from {PARQUET_DIR} and {len(csv_files)} CSV files in {OPTIONS_DIR}...")
+    chains = load_options_chains(csv_files)
+    print(f"   {len(chains):,} contracts across {chains['symbol'].nunique()} tickers")
     print()
 
-    all_features = []
-
-    for csv_file in csv_files:
-        ticker = csv_file.stem.split('_')[0]  # Extract ticker from filename
-        print(f"⚙️  Processing {ticker}...", end=' ')
-
-        df = load_options_data(ticker)
-        if df is None:
-            print("❌ No data")
-            continue
-
-        features = calculate_options_features(df, ticker)
-        if features is None:
-            print("❌ Failed")
-            continue
-
-        features['symbol'] = ticker
-        all_features.append(features)
-        print(f"✅ ({len(df):,} contracts)")
+    print("⚙️  Calculating features...")
+    features_df = calculate_options_features(chains)
 
     print()
-    print(f"✅ Successfully extracted features for {len(all_features)} tickers")
+    print(f"✅ Successfully extracted features for {len(features_df)} tickers")
     print()
 
-    # Create DataFrame
-    features_df = pd.DataFrame(all_features)
-
-    # Reorder columns (symbol first, then features)
-    cols = ['symbol'] + [col for col in features_df.columns if col != 'symbol']
-    features_df = features_df[cols]
-
     # Save to CSV
     OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
     features_df.to_csv(OUTPUT_FILE, index=False)
@@ -4,7 +4,8 @@ Generate Comprehensive Smart Money Flow Dataset
 
 Uses ALL available data sources:
 - SEC Form 4 (Insider Trading) from Parquet
-- Polygon Flat Files (Price Data) - 502 daily files
+- Polygon Flat Files (Price Data) - 502 daily files, converted once into a
+  memory-mapped columnar store (scripts/ml/day_aggs_store.py)
 - Polygon Cached Prices (data/cache/polygon_prices/)
 - Congressional Trading Data
 - SEC 13F Institutional Holdings (TODO: parse if needed)
@@ -39,14 +40,19 @@ import json
 from collections import defaultdict
 import numpy as np
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from day_aggs_store import DayAggsStore
+
 class PolygonFlatFileReader:
-    """Fast reader for Polygon flat files"""
+    """Fast reader for Polygon flat files (via the symbol-major columnar store)"""
     def __init__(self, flat_files_dir='datasets/polygon-flat-files/day_aggs'):
         self.flat_files_dir = Path(flat_files_dir)
-        self.cache = {}
         print(f"📂 Indexing Polygon flat files from {self.flat_files_dir}")
         self.files = sorted(self.flat_files_dir.glob('*.csv.gz'))
         print(f"  ✅ Found {len(self.files)} daily files")
+        # One-time conversion; later runs memory-map the existing store
+        self.store = DayAggsStore.open_or_build(self.flat_files_dir)
+        print(f"  ✅ Columnar store ready: {len(self.store.symbol_index):,} symbols")
 
     def get_price_data(self, symbol, date_str):
         """Get price data for symbol on specific date and 14 days later"""
@@ -54,47 +60,29 @@ class PolygonFlatFileReader:
             sample_date = datetime.strptime(date_str, '%Y-%m-%d')
             future_date = sample_date + timedelta(days=14)
 
-            # Load files for relevant dates (with buffer)
+            # Bars for relevant dates (with buffer)
             buffer_days = 21  # Extra buffer for weekends/holidays
-            date_range = pd.date_range(sample_date, sample_date + timedelta(days=buffer_days))
-
-            prices = []
-            for single_date in date_range:
-                date_file = self.flat_files_dir / f"{single_date.strftime('%Y-%m-%d')}.csv.gz"
-                if not date_file.exists():
-                    continue
+            bars = self.store.bars(symbol, sample_date, sample_date + timedelta(days=buffer_days))
 
-                # Read file if not cached
-                if str(date_file) not in self.cache:
-                    df = pd.read_csv(date_file, compression='gzip')
-                    # Index by ticker for fast lookup
-                    self.cache[str(date_file)] = df.set_index('ticker')
-
-                df = self.cache[str(date_file)]
-                if symbol in df.index:
-                    row = df.loc[symbol]
-                    prices.append({
-                        'date': single_date,
-                        'close': row['close'],
-                        'high': row['high'],
-                        'low': row['low'],
-                        'volume': row['volume']
-                    })
-
-            if len(prices) < 2:
+            if bars is None or len(bars['date']) < 2:
                 return None
 
-            # Find closest prices to sample and future dates
-            prices_df = pd.DataFrame(prices)
-            sample_bar = prices_df[prices_df['date'] >= sample_date].iloc[0] if len(prices_df[prices_df['date'] >= sample_date]) > 0 else None
-            future_bar = prices_df[prices_df['date'] >= future_date].iloc[0] if len(prices_df[prices_df['date'] >= future_date]) > 0 else None
-
-            if sample_bar is None or future_bar is None:
+            prices_df = pd.DataFrame({
+                'date': pd.to_datetime(bars['date']).astype('datetime64[ns]'),
+                'close': bars['close'],
+                'high': bars['high'],
+                'low': bars['low'],
+                'volume': bars['volume']
+            })
+
+            # Find closest prices to sample and future dates (bars are date-sorted)
+            future_pos = np.searchsorted(bars['date'], np.datetime64(future_date.date(), 'D'))
+            if future_pos >= len(prices_df):
                 return None
 
             return {
-                'price_at_sample': sample_bar['close'],
-                'price_after_14d': future_bar['close'],
+                'price_at_sample': prices_df['close'].iloc[0],
+                'price_after_14d': prices_df['close'].iloc[future_pos],
                 'prices': prices_df
             }
 
@@ -102,7 +90,7 @@ class PolygonFlatFileReader:
             return None
 
 class CachedPriceReader:
-    """Read from cached Polygon prices"""
+    """Read from cached Polygon prices (each file parsed once into sorted arrays)"""
     def __init__(self, cache_dir='data/cache/polygon_prices'):
         self.cache_dir = Path(cache_dir)
         self.cache = {}
@@ -110,41 +98,56 @@ class CachedPriceReader:
             files = list(self.cache_dir.glob('*.json'))
             print(f"📂 Found {len(files)} cached price files")
 
-    def get_price_data(self, symbol, date_str):
-        """Get price data from cache"""
-        try:
+    def _load_bars(self, symbol):
+        """(timestamps in ms, closes) for symbol sorted by time, or None if not cached"""
+        if symbol not in self.cache:
             cache_file = self.cache_dir / f"{symbol}_prices.json"
             if not cache_file.exists():
+                self.cache[symbol] = None
                 return None
 
-            if str(cache_file) not in self.cache:
-                with open(cache_file, 'r') as f:
-                    self.cache[str(cache_file)] = json.load(f)
-
-            data = self.cache[str(cache_file)]
-            sample_date = datetime.strptime(date_str, '%Y-%m-%d')
-            future_date = sample_date + timedelta(days=14)
-
-            # Find matching prices
-            sample_bar = None
-            future_bar = None
+            with open(cache_file, 'r') as f:
+                results = json.load(f).get('results', [])
+            timestamps = np.array([bar['t'] for bar in results], dtype=np.int64)
+            closes = np.array([bar['c'] for bar in results])
+            order = np.argsort(timestamps, kind='stable')
+            self.cache[symbol] = (timestamps[order], closes[order])
 
-            for bar in data.get('results', []):
-                bar_date = datetime.fromtimestamp(bar['t'] / 1000)
-                if bar_date >= sample_date and not sample_bar:
-                    sample_bar = bar
-                if bar_date >= future_date and not future_bar:
-                    future_bar = bar
+        return self.cache[symbol]
 
-            if not sample_bar or not future_bar:
-                return None
-
-            return {
-                'price_at_sample': sample_bar['c'],
-                'price_after_14d': future_bar['c']
-            }
+    def get_price_data_batch(self, symbol, date_strs):
+        """Get price data from cache for many sample dates of one symbol (None where unavailable)"""
+        try:
+            bars = self._load_bars(symbol)
         except Exception:
-            return None
+            return [None] * len(date_strs)
+        if bars is None or len(date_strs) == 0:
+            return [None] * len(date_strs)
+        timestamps, closes = bars
+
+        # Bar dates were compared as local datetimes; compare epoch ms of local midnight instead
+        sample_dates = [datetime.strptime(d, '%Y-%m-%d') for d in date_strs]
+        sample_ms = np.array([int(d.timestamp() * 1000) for d in sample_dates], dtype=np.int64)
+        future_ms = np.array([int((d + timedelta(days=14)).timestamp() * 1000) for d in sample_dates], dtype=np.int64)
+
+        # First bar at or after each date
+        sample_pos = np.searchsorted(timestamps, sample_ms, side='left')
+        future_pos = np.searchsorted(timestamps, future_ms, side='left')
+
+        results = []
+        for s_pos, f_pos in zip(sample_pos, future_pos):
+            if s_pos >= len(timestamps) or f_pos >= len(timestamps):
+                results.append(None)
+                continue
+            results.append({
+                'price_at_sample': closes[s_pos].item(),
+                'price_after_14d': closes[f_pos].item()
+            })
+        return results
+
+    def get_price_data(self, symbol, date_str):
+        """Get price data from cache"""
+        return self.get_price_data_batch(symbol, [date_str])[0]
 
 class CongressionalTradingData:
     """Load and query congressional trading data"""
@@ -265,6 +268,10 @@ def generate_dataset(max_symbols=None, output_name='comprehensive'):
         min_date = symbol_df['date'].min()
         max_date = symbol_df['date'].max() - timedelta(days=14)
 
+        # Cached-price fallback, fetched in one vectorized lookup on the first flat-file miss
+        sample_date_strs = [d.strftime('%Y-%m-%d') for d in pd.date_range(min_date, max_date, freq='30D')]
+        cached_prices = None
+
         current_date = min_date
         while current_date <= max_date:
             # Get 30-day window for insider features
@@ -290,7 +297,11 @@ def generate_dataset(max_symbols=None, output_name='comprehensive'):
             if price_data:
                 price_source_stats['flat_files'] += 1
             else:
-                price_data = cached_reader.get_price_data(symbol, date_str)
+                if cached_prices is None:
+                    # Earlier sample dates are already resolved; batch only this one onwards
+                    remaining = [d for d in sample_date_strs if d >= date_str]
+                    cached_prices = dict(zip(remaining, cached_reader.get_price_data_batch(symbol, remaining)))
+                price_data = cached_prices.get(date_str)
                 if price_data:
                     price_source_stats['cache'] += 1
                 else:
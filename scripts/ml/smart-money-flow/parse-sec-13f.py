@@ -7,6 +7,18 @@ Input: datasets/SEC/13F/*.zip
 Output: Parquet files with institutional holding changes
 
 Pattern: Follows the plan in docs/prebuilt-dataset-parquet/complete-doc.md
+
+Runs are incremental: per-ZIP quarter aggregates and features are kept under
+data/smart_money_features/_state_institutional/ with a manifest of processed ZIP
+hashes, so only new or replaced ZIPs are parsed and only the quarters from the
+first changed ZIP onwards are re-diffed before institutional_features.parquet is
+rewritten from the stored quarters. When company_tickers.json changes, every
+stored quarter is re-diffed with the new CUSIP → symbol mapping (no ZIP is re-parsed).
+
+Usage:
+    python3 scripts/ml/smart-money-flow/parse-sec-13f.py               # new ZIPs one at a time, in memory
+    python3 scripts/ml/smart-money-flow/parse-sec-13f.py --workers 0   # new ZIPs on all cores, streamed per ZIP
+    python3 scripts/ml/smart-money-flow/parse-sec-13f.py --full        # reprocess every ZIP
 """
 
 import zipfile
@@ -17,7 +29,71 @@ from pathlib import Path
 from typing import Dict, List, Optional
 import sys
 import json
-from difflib import SequenceMatcher
+import shutil
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from cusip_matcher import CompanyNameMatcher, load_cusip_mapping, save_cusip_mapping, ticker_universe_version
+from sec_zip_ingest import (
+    DEFAULT_CHUNK_ROWS, load_manifest, merge_parquet_parts, parse_sec_dates, read_tsv, read_tsv_chunks,
+    run_zip_pool, save_manifest, worker_count, write_part, zip_fingerprint
+)
+
+
+FEATURE_COLUMNS = [
+    'cusip',
+    'symbol',
+    'quarter_date',
+    'total_shares',
+    'total_value',
+    'num_institutions',
+    'share_change',
+    'value_change'
+]
+
+DATE_COLUMNS = ['FILING_DATE', 'PERIODOFREPORT', 'REPORTCALENDARORQUARTER']
+
+# Columns read in process-pool mode (everything else in the ZIP is skipped)
+F13_TABLE_PLAN = {
+    'SUBMISSION': {
+        'ACCESSION_NUMBER': 'object',
+        'CIK': 'object',
+        'PERIODOFREPORT': 'object',
+    },
+    'INFOTABLE': {
+        'ACCESSION_NUMBER': 'object',
+        'CUSIP': 'object',
+        'SSHPRNAMTTYPE': 'category',
+        'SSHPRNAMT': 'float64',
+        'VALUE': 'float64',
+    },
+}
+
+# Per-ZIP state for incremental runs:
+#   quarters/<zip>.parquet   per-CUSIP quarter aggregates
+#   features/<zip>.parquet   that quarter's features (changes vs the previous stored quarter)
+#   cusip_to_symbol.parquet  symbol mapping built from the first ZIP
+#   cusip_matches.parquet    resolved CUSIP → ticker matches (MATCH_RULE), reused across ZIPs
+#   manifest.json            processed ZIP hashes, in ZIP order
+STATE_DIR_NAME = '_state_institutional'
+CUSIP_MATCHES_PATH = Path('data/smart_money_features') / STATE_DIR_NAME / 'cusip_matches.parquet'
+
+# Name of the matching rule in map_cusip_to_symbol(); persisted matches from any other rule are not reused
+MATCH_RULE = 'exact,ratio>0.9'
+
+# Output schema (numeric columns as float64, as the concatenated per-quarter
+# features have once any quarter-over-quarter diff exists)
+FEATURE_SCHEMA = pa.schema([
+    ('cusip', pa.string()),
+    ('symbol', pa.string()),
+    ('quarter_date', pa.string()),
+    ('total_shares', pa.float64()),
+    ('total_value', pa.float64()),
+    ('num_institutions', pa.float64()),
+    ('share_change', pa.float64()),
+    ('value_change', pa.float64()),
+])
 
 
 def load_13f_tables(zip_path: str) -> Dict[str, pd.DataFrame]:
@@ -41,10 +117,7 @@ def load_13f_tables(zip_path: str) -> Dict[str, pd.DataFrame]:
                     )
 
                     # Parse date columns
-                    date_columns = ['FILING_DATE', 'PERIODOFREPORT', 'REPORTCALENDARORQUARTER']
-                    for col in date_columns:
-                        if col in df.columns:
-                            df[col] = pd.to_datetime(df[col], format='%d-%b-%Y', errors='coerce')
+                    parse_sec_dates(df, DATE_COLUMNS)
 
                     tables[table_name] = df
                     print(f"  ✅ Loaded {table_name}: {len(df):,} rows")
@@ -77,8 +150,18 @@ def load_company_tickers() -> Dict[str, str]:
     return title_to_ticker
 
 
-def map_cusip_to_symbol(df: pd.DataFrame, title_to_ticker: Dict[str, str]) -> pd.DataFrame:
-    """Add symbol column by mapping CUSIP → NAMEOFISSUER → Ticker."""
+def map_cusip_to_symbol(
+    df: pd.DataFrame,
+    title_to_ticker: Dict[str, str],
+    mapping_path: Path = CUSIP_MATCHES_PATH
+) -> Dict[str, str]:
+    """
+    Map CUSIP → NAMEOFISSUER → Ticker.
+
+    CUSIPs persisted under the same issuer name, by this rule and against the same
+    company tickers, are reused; the rest are matched (exact title, then indexed
+    fuzzy match >90% similarity) and saved back to the mapping.
+    """
     print("\n🔗 Mapping CUSIPs to ticker symbols...")
 
     # Create CUSIP → most common company name mapping
@@ -88,36 +171,38 @@ def map_cusip_to_symbol(df: pd.DataFrame, title_to_ticker: Dict[str, str]) -> pd
 
     print(f"  📊 Found {len(cusip_to_name):,} unique CUSIPs")
 
+    universe = ticker_universe_version(title_to_ticker.items())
+    persisted = load_cusip_mapping(mapping_path, MATCH_RULE, universe)
+    matcher = CompanyNameMatcher(title_to_ticker.items())
+
     # Map company name to ticker
     cusip_to_symbol = {}
     matched = 0
+    reused = 0
     unmatched = []
 
     for cusip, company_name in cusip_to_name.items():
         company_upper = company_name.upper()
+        known = persisted.get(str(cusip))
+
+        if known is not None and known[1] == company_upper.strip():
+            ticker = known[0]
+            reused += 1
+        else:
+            # Try exact match first, then fuzzy match (>90% similarity)
+            ticker = matcher.exact(company_upper) or matcher.best_ratio(company_upper, threshold=0.9) or ''
+            persisted[str(cusip)] = (ticker, company_upper.strip())
 
-        # Try exact match first
-        if company_upper in title_to_ticker:
-            cusip_to_symbol[cusip] = title_to_ticker[company_upper]
+        if ticker:
+            cusip_to_symbol[cusip] = ticker
             matched += 1
         else:
-            # Try fuzzy match (>90% similarity)
-            best_match = None
-            best_ratio = 0
-
-            for title, ticker in title_to_ticker.items():
-                ratio = SequenceMatcher(None, company_upper, title).ratio()
-                if ratio > best_ratio:
-                    best_ratio = ratio
-                    best_match = ticker
-
-            if best_ratio > 0.9:
-                cusip_to_symbol[cusip] = best_match
-                matched += 1
-            else:
-                unmatched.append((cusip, company_name))
-
-    print(f"  ✅ Matched {matched:,} CUSIPs to tickers")
+            unmatched.append((cusip, company_name))
+
+    if reused < len(cusip_to_name):
+        save_cusip_mapping(persisted, mapping_path, MATCH_RULE, universe)
+
+    print(f"  ✅ Matched {matched:,} CUSIPs to tickers ({reused:,} from {mapping_path})")
     if unmatched:
         print(f"  ⚠️  Unmatched: {len(unmatched):,} CUSIPs")
         print(f"     (First 5: {[name for _, name in unmatched[:5]]})")
@@ -125,51 +210,44 @@ def map_cusip_to_symbol(df: pd.DataFrame, title_to_ticker: Dict[str, str]) -> pd
     return cusip_to_symbol
 
 
-def build_13f_features(
-    tables: Dict[str, pd.DataFrame],
-    cusip_to_symbol: Dict[str, str],
-    prev_quarter: Optional[pd.DataFrame] = None
-) -> pd.DataFrame:
-    """
-    Build institutional holding features from 13F tables.
-
-    Calculates quarter-over-quarter changes to detect institutional buying/selling.
-    """
-    print("\n🔨 Building institutional features...")
-
-    # Join INFOTABLE with SUBMISSION to get filing dates
-    df = tables['INFOTABLE'].merge(
-        tables['SUBMISSION'],
-        on='ACCESSION_NUMBER',
-        how='inner'
-    )
-
-    print(f"  📊 Joined tables: {len(df):,} holdings")
-
+def filter_holdings(df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
+    """Keep share holdings (not principal amounts) with CUSIP, shares and value."""
     # Filter to shares only (not principal amounts)
     df = df[df['SSHPRNAMTTYPE'] == 'SH'].copy()
-    print(f"  🎯 Filtered to shares: {len(df):,} holdings")
+    if verbose:
+        print(f"  🎯 Filtered to shares: {len(df):,} holdings")
 
     # Filter out rows with missing CUSIP or values
     df = df.dropna(subset=['CUSIP', 'SSHPRNAMT', 'VALUE'])
-    print(f"  ✂️  Removed nulls: {len(df):,} holdings remain")
+    if verbose:
+        print(f"  ✂️  Removed nulls: {len(df):,} holdings remain")
 
-    # Get quarter date (use the most common PERIODOFREPORT date)
-    quarter_date = df['PERIODOFREPORT'].mode()[0]
-    quarter_str = quarter_date.strftime('%Y-%m-%d')
+    return df
 
-    print(f"  📅 Quarter end date: {quarter_str}")
 
-    # Aggregate by CUSIP
-    current = df.groupby('CUSIP').agg({
-        'VALUE': 'sum',
-        'SSHPRNAMT': 'sum',
-        'CIK': 'count'  # Number of institutions holding
-    }).reset_index()
+# Per-CUSIP aggregation; partial aggregates from chunks can be summed again
+HOLDING_AGGREGATIONS = {
+    'VALUE': 'sum',
+    'SSHPRNAMT': 'sum',
+    'CIK': 'count'  # Number of institutions holding
+}
+
 
+def finalize_quarter(aggregated: pd.DataFrame, quarter_str: str) -> pd.DataFrame:
+    """Per-CUSIP aggregates (VALUE, SSHPRNAMT, CIK count) → quarter holdings frame."""
+    current = aggregated.reset_index()
     current.columns = ['cusip', 'total_value', 'total_shares', 'num_institutions']
     current['quarter_date'] = quarter_str
+    return current
 
+
+def apply_quarter_changes(
+    current: pd.DataFrame,
+    quarter_str: str,
+    cusip_to_symbol: Dict[str, str],
+    prev_quarter: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    """Map CUSIPs to symbols and calculate quarter-over-quarter changes vs prev_quarter."""
     # Add symbol column by mapping CUSIP
     current['symbol'] = current['cusip'].map(cusip_to_symbol)
 
@@ -205,16 +283,7 @@ def build_13f_features(
         changes['quarter_date'] = changes['quarter_date'].fillna(quarter_str)
 
         # Select final columns
-        result = changes[[
-            'cusip',
-            'symbol',
-            'quarter_date',
-            'total_shares',
-            'total_value',
-            'num_institutions',
-            'share_change',
-            'value_change'
-        ]]
+        result = changes[FEATURE_COLUMNS]
 
         print(f"  ✅ Calculated changes for {len(result):,} CUSIPs")
         print(f"    📈 Net buying: {(result['share_change'] > 0).sum():,}")
@@ -228,24 +297,109 @@ def build_13f_features(
         current['value_change'] = 0
 
         # Reorder columns to match
-        current = current[[
-            'cusip',
-            'symbol',
-            'quarter_date',
-            'total_shares',
-            'total_value',
-            'num_institutions',
-            'share_change',
-            'value_change'
-        ]]
+        current = current[FEATURE_COLUMNS]
 
         print(f"  ✅ First quarter baseline: {len(current):,} CUSIPs")
 
         return current
 
 
+def quarter_aggregates(tables: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Per-CUSIP holdings for the quarter in one ZIP's 13F tables (before quarter-over-quarter changes)."""
+    # Join INFOTABLE with SUBMISSION to get filing dates
+    df = tables['INFOTABLE'].merge(
+        tables['SUBMISSION'],
+        on='ACCESSION_NUMBER',
+        how='inner'
+    )
+
+    print(f"  📊 Joined tables: {len(df):,} holdings")
+
+    df = filter_holdings(df)
+
+    # Get quarter date (use the most common PERIODOFREPORT date)
+    quarter_date = df['PERIODOFREPORT'].mode()[0]
+    quarter_str = quarter_date.strftime('%Y-%m-%d')
+
+    print(f"  📅 Quarter end date: {quarter_str}")
+
+    # Aggregate by CUSIP
+    return finalize_quarter(df.groupby('CUSIP').agg(HOLDING_AGGREGATIONS), quarter_str)
+
+
+def build_13f_features(
+    tables: Dict[str, pd.DataFrame],
+    cusip_to_symbol: Dict[str, str],
+    prev_quarter: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    """
+    Build institutional holding features from 13F tables.
+
+    Calculates quarter-over-quarter changes to detect institutional buying/selling.
+    """
+    print("\n🔨 Building institutional features...")
+
+    current = quarter_aggregates(tables)
+    return apply_quarter_changes(current, current['quarter_date'].iloc[0], cusip_to_symbol, prev_quarter)
+
+
+def aggregate_13f_zip(zip_path: str, parts_dir: str) -> Optional[str]:
+    """In-memory counterpart of ingest_13f_zip: load one ZIP whole and write its quarter aggregates part."""
+    tables = load_13f_tables(zip_path)
+
+    # Check required tables exist
+    required = ['SUBMISSION', 'INFOTABLE']
+    missing = [t for t in required if t not in tables]
+
+    if missing:
+        print(f"  ⚠️  Skipping {Path(zip_path).name}: missing tables {missing}")
+        return None
+
+    return write_part(quarter_aggregates(tables), Path(parts_dir), zip_path)
+
+
+def ingest_13f_zip(zip_path: str, parts_dir: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Optional[str]:
+    """
+    Process-pool worker: stream one 13F ZIP into a Parquet part of per-CUSIP quarter aggregates.
+
+    SUBMISSION (key columns only) is loaded whole; INFOTABLE is streamed in chunks,
+    each joined, filtered and reduced to partial per-CUSIP sums. Quarter-over-quarter
+    changes are computed afterwards in a second pass over the parts.
+    """
+    submission = read_tsv(zip_path, 'SUBMISSION', F13_TABLE_PLAN['SUBMISSION'])
+    parse_sec_dates(submission, DATE_COLUMNS)
+
+    partials = []
+    period_counts = []
+    for chunk in read_tsv_chunks(zip_path, 'INFOTABLE', F13_TABLE_PLAN['INFOTABLE'], chunk_rows):
+        df = filter_holdings(chunk.merge(submission, on='ACCESSION_NUMBER', how='inner'), verbose=False)
+        partials.append(df.groupby('CUSIP').agg(HOLDING_AGGREGATIONS))
+        period_counts.append(df['PERIODOFREPORT'].value_counts())
+
+    if not partials:
+        return None
+
+    # Most common PERIODOFREPORT across chunks (earliest on ties, like Series.mode()[0])
+    counts = pd.concat(period_counts).groupby(level=0).sum()
+    if len(counts) == 0:
+        raise ValueError(f'No PERIODOFREPORT dates in {Path(zip_path).name}')
+    quarter_str = counts[counts == counts.max()].index.min().strftime('%Y-%m-%d')
+
+    aggregated = pd.concat(partials).groupby(level=0).sum()
+    return write_part(finalize_quarter(aggregated, quarter_str), Path(parts_dir), zip_path)
+
+
 def main():
-    """Process all 13F ZIP files and create Parquet feature store."""
+    """Process new 13F ZIP files and update the Parquet feature store."""
+
+    parser = argparse.ArgumentParser(description='Parse SEC 13F ZIPs into institutional holding features')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Parse ZIPs in a process pool with streamed TSVs (0 = all cores; default 1 = in-memory, one ZIP at a time)')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help='Rows per streamed TSV chunk in process-pool mode')
+    parser.add_argument('--full', action='store_true',
+                        help='Discard stored quarter state and reprocess every ZIP')
+    args = parser.parse_args()
 
     print("=" * 80)
     print("SEC FORM 13F PARSER - INSTITUTIONAL HOLDINGS")
@@ -263,62 +417,140 @@ def main():
         print(f"\n❌ No ZIP files found in {f13_dir}")
         sys.exit(1)
 
-    print(f"\n📦 Found {len(zip_files)} ZIP files to process\n")
+    print(f"\n📦 Found {len(zip_files)} ZIP files\n")
 
-    # Load company tickers mapping
+    output_file = output_dir / 'institutional_features.parquet'
+    state_dir = output_dir / STATE_DIR_NAME
+    manifest_path = state_dir / 'manifest.json'
+
+    if args.full:
+        shutil.rmtree(state_dir, ignore_errors=True)
+    manifest = load_manifest(manifest_path)
+    processed = manifest.get('zips', {})
+    stored_order = manifest.get('order', [])
+    zip_names = [zip_file.name for zip_file in zip_files]
+
+    print("🔍 Checking ZIP hashes against the manifest...")
+    fingerprints = {zip_file.name: zip_fingerprint(zip_file, processed.get(zip_file.name)) for zip_file in zip_files}
+    unchanged = {
+        name for name, fingerprint in fingerprints.items()
+        if name in processed and processed[name]['sha256'] == fingerprint['sha256']
+    }
+
+    # Changes are chained quarter to quarter in ZIP order, so everything from the first
+    # new, replaced or removed ZIP onwards is re-diffed (unchanged ZIPs are not re-parsed)
+    first_dirty = 0
+    while (first_dirty < len(zip_names) and first_dirty < len(stored_order)
+           and zip_names[first_dirty] == stored_order[first_dirty]
+           and zip_names[first_dirty] in unchanged):
+        first_dirty += 1
+
+    # CUSIP → symbol mapping from the first ZIP file (only the columns it needs), kept while
+    # that ZIP and the company tickers are unchanged
+    mapping_file = state_dir / 'cusip_to_symbol.parquet'
     title_to_ticker = load_company_tickers()
-
-    # Build CUSIP → symbol mapping from first ZIP file
-    print(f"\n📋 Building CUSIP → symbol mapping from first ZIP file...")
-    first_tables = load_13f_tables(str(zip_files[0]))
-    cusip_to_symbol = map_cusip_to_symbol(first_tables['INFOTABLE'], title_to_ticker)
-
-    # Process each ZIP file sequentially (need previous quarter for changes)
-    all_features = []
+    symbol_source = {
+        'zip': zip_names[0],
+        'sha256': fingerprints[zip_names[0]]['sha256'],
+        'tickers': ticker_universe_version(title_to_ticker.items()),
+    }
+    mapping_current = manifest.get('symbol_source') == symbol_source and mapping_file.exists()
+    if not mapping_current and first_dirty > 0:
+        # Stored features carry symbols from the old mapping: re-diff every quarter
+        # (quarter aggregates of unchanged ZIPs are still reused)
+        print("  🔄 CUSIP → symbol mapping changed (company tickers updated); re-diffing every stored quarter")
+        first_dirty = 0
+
+    if stored_order == zip_names and first_dirty == len(zip_names) and mapping_current and output_file.exists():
+        print(f"\n✅ No new 13F filings; {output_file} is up to date")
+        return
+
+    print(f"  ♻️  Reusing {first_dirty} quarters; re-diffing {len(zip_names) - first_dirty} from {zip_names[first_dirty] if first_dirty < len(zip_names) else 'the end'}")
+
+    # Drop state for ZIPs no longer on disk
+    for name in set(processed) - set(zip_names):
+        for key in ('quarter_part', 'feature_part'):
+            if processed[name].get(key):
+                Path(processed[name][key]).unlink(missing_ok=True)
+
+    if mapping_current:
+        mapping = pd.read_parquet(mapping_file)
+        cusip_to_symbol = dict(zip(mapping['cusip'], mapping['symbol']))
+        print(f"\n📋 Loaded CUSIP → symbol mapping for {zip_names[0]} ({len(cusip_to_symbol):,} CUSIPs)")
+    else:
+        print(f"\n📋 Building CUSIP → symbol mapping from first ZIP file...")
+        first_infotable = read_tsv(str(zip_files[0]), 'INFOTABLE', {'CUSIP': 'object', 'NAMEOFISSUER': 'object'})
+        cusip_to_symbol = map_cusip_to_symbol(first_infotable, title_to_ticker, state_dir / CUSIP_MATCHES_PATH.name)
+        del first_infotable
+        state_dir.mkdir(parents=True, exist_ok=True)
+        pd.DataFrame({'cusip': list(cusip_to_symbol), 'symbol': list(cusip_to_symbol.values())}).to_parquet(
+            mapping_file, index=False
+        )
+        manifest['symbol_source'] = symbol_source
+
+    # Pass 1: per-quarter aggregates for new or replaced ZIPs, one Parquet part per ZIP
+    quarters_dir = state_dir / 'quarters'
+    quarter_parts = {name: processed[name].get('quarter_part') for name in unchanged}
+    to_parse = [zip_file for zip_file in zip_files[first_dirty:] if zip_file.name not in unchanged]
+    failed = []
+
+    if to_parse and args.workers != 1:
+        workers = worker_count(args.workers)
+        print(f"\n⚙️  Parsing {len(to_parse)} new ZIPs with {workers} worker processes\n")
+        results = run_zip_pool(to_parse, ingest_13f_zip, workers, str(quarters_dir), args.chunk_rows, failed=failed)
+        quarter_parts.update({zip_file.name: part for zip_file, part in zip(to_parse, results)})
+    else:
+        for zip_file in to_parse:
+            try:
+                quarter_parts[zip_file.name] = aggregate_13f_zip(str(zip_file), str(quarters_dir))
+            except Exception as e:
+                print(f"  ❌ Failed to process {zip_file.name}: {e}\n")
+                failed.append(zip_file)
+
+    # Pass 2: quarter-over-quarter changes in ZIP order, starting from the last stored quarter
     prev_quarter = None
-
-    for zip_file in zip_files:
-        try:
-            # Load tables from ZIP
-            tables = load_13f_tables(str(zip_file))
-
-            # Check required tables exist
-            required = ['SUBMISSION', 'INFOTABLE']
-            missing = [t for t in required if t not in tables]
-
-            if missing:
-                print(f"  ⚠️  Skipping {zip_file.name}: missing tables {missing}")
-                continue
-
-            # Build features with symbol mapping
-            features = build_13f_features(tables, cusip_to_symbol, prev_quarter)
-            all_features.append(features)
-
-            print(f"  💾 Processed {zip_file.name}: {len(features):,} features\n")
-
-            # Save for next iteration
-            prev_quarter = features.copy()
-
-        except Exception as e:
-            print(f"  ❌ Failed to process {zip_file.name}: {e}\n")
+    for name in reversed(zip_names[:first_dirty]):
+        if processed[name].get('feature_part'):
+            prev_quarter = pd.read_parquet(processed[name]['feature_part'])
+            break
+
+    features_dir = state_dir / 'features'
+    recorded = {name: processed[name] for name in zip_names[:first_dirty]}
+    for zip_file in zip_files[first_dirty:]:
+        if zip_file in failed:
             continue
-
-    if not all_features:
+        part = quarter_parts[zip_file.name]
+        feature_part = None
+        if part is not None:
+            current = pd.read_parquet(part)
+            quarter_str = current['quarter_date'].iloc[0]
+            print(f"\n🔨 {zip_file.name}: quarter end date {quarter_str}")
+            features = apply_quarter_changes(current, quarter_str, cusip_to_symbol, prev_quarter)
+            feature_part = write_part(features, features_dir, str(zip_file))
+            prev_quarter = features
+        recorded[zip_file.name] = {**fingerprints[zip_file.name], 'quarter_part': part, 'feature_part': feature_part}
+
+    feature_parts = [entry['feature_part'] for entry in recorded.values() if entry['feature_part']]
+    if not feature_parts:
         print("\n❌ No features extracted")
         sys.exit(1)
 
-    # Combine all features
-    print("\n🔗 Combining all features...")
-    combined = pd.concat(all_features, ignore_index=True)
+    # Parquet files cannot be appended to in place; the stored quarters are streamed
+    # into a fresh file (no TSV parsing), then the manifest records what it contains
+    print(f"\n🔗 Writing {len(feature_parts)} quarters to {output_file}...")
+    merge_parquet_parts(feature_parts, output_file, schema=FEATURE_SCHEMA)
+    manifest.update({
+        'zips': recorded,
+        'order': list(recorded),
+        'updated_at': datetime.now().isoformat()
+    })
+    save_manifest(manifest_path, manifest)
+    combined = pd.read_parquet(output_file)
 
     print(f"  ✅ Combined features: {len(combined):,} rows")
     print(f"  📊 Date range: {combined['quarter_date'].min()} to {combined['quarter_date'].max()}")
     print(f"  🏢 Unique CUSIPs: {combined['cusip'].nunique():,}")
 
-    # Save to Parquet
-    output_file = output_dir / 'institutional_features.parquet'
-    combined.to_parquet(output_file, index=False, compression='snappy')
-
     file_size_mb = output_file.stat().st_size / (1024 * 1024)
     print(f"\n💾 Saved to {output_file}")
     print(f"  📦 File size: {file_size_mb:.2f} MB")
@@ -7,16 +7,28 @@ Input: datasets/SEC/insider-transactions/*.zip
 Output: Parquet files with insider features
 
 Pattern: Follows the plan in docs/prebuilt-dataset-parquet/complete-doc.md
+
+Usage:
+    python3 scripts/ml/smart-money-flow/parse-sec-form4.py               # one ZIP at a time, in memory
+    python3 scripts/ml/smart-money-flow/parse-sec-form4.py --workers 0   # all cores, streamed per ZIP
 """
 
 import zipfile
+import argparse
+import shutil
 import pandas as pd
 import pyarrow.parquet as pq
 import pyarrow as pa
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 import sys
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from sec_zip_ingest import (
+    DEFAULT_CHUNK_ROWS, merge_parquet_parts, parse_sec_dates, read_tsv, read_tsv_chunks,
+    run_zip_pool, worker_count, write_part
+)
+
 # Transaction codes that indicate buying
 BUY_CODES = ['P', 'A', 'M', 'J', 'L']
 
@@ -27,8 +39,39 @@ SELL_CODES = ['S', 'D']
 MEANINGFUL_CODES = BUY_CODES + SELL_CODES
 
 
-def load_form4_tables(zip_path: str) -> Dict[str, pd.DataFrame]:
-    """Load all TSV tables from a Form 4 ZIP file."""
+# Dtype plan for the tables build_insider_features uses: only the needed columns and
+# categorical codes for low-cardinality strings. Share counts and prices stay float64:
+# float32 is only exact for whole share counts below 2^24, and block trades and
+# fractional shares would carry its rounding into the share * price values.
+FORM4_TABLE_PLAN = {
+    'SUBMISSION': {
+        'ACCESSION_NUMBER': 'object',
+        'FILING_DATE': 'object',
+        'PERIOD_OF_REPORT': 'object',
+        'ISSUERTRADINGSYMBOL': 'category',
+    },
+    'NONDERIV_TRANS': {
+        'ACCESSION_NUMBER': 'object',
+        'TRANS_DATE': 'object',
+        'TRANS_CODE': 'category',
+        'TRANS_SHARES': 'float64',
+        'TRANS_PRICEPERSHARE': 'float64',
+    },
+    'REPORTINGOWNER': {
+        'ACCESSION_NUMBER': 'object',
+    },
+}
+
+DATE_COLUMNS = ['FILING_DATE', 'PERIOD_OF_REPORT', 'TRANS_DATE']
+
+
+def load_form4_tables(zip_path: str, plan: Optional[Dict[str, Dict[str, str]]] = FORM4_TABLE_PLAN) -> Dict[str, pd.DataFrame]:
+    """
+    Load TSV tables from a Form 4 ZIP file.
+
+    With a plan (default), only the planned tables and columns are read, using the
+    planned dtypes; pass plan=None to load every table with inferred dtypes.
+    """
     tables = {}
 
     print(f"📂 Loading {Path(zip_path).name}...")
@@ -37,19 +80,28 @@ def load_form4_tables(zip_path: str) -> Dict[str, pd.DataFrame]:
         for fname in z.namelist():
             if fname.endswith('.tsv'):
                 table_name = fname.replace('.tsv', '')
+                table_plan = plan.get(table_name) if plan is not None else None
+                if plan is not None and table_plan is None:
+                    continue
 
                 try:
+                    read_options = {}
+                    if table_plan is not None:
+                        read_options['usecols'] = lambda col, cols=table_plan: col in cols
+                        read_options['dtype'] = table_plan
+                    else:
+                        read_options['low_memory'] = False
+
                     # Read TSV with proper date parsing
                     df = pd.read_csv(
                         z.open(fname),
                         sep='\t',
-                        low_memory=False,
-                        na_values=['', 'NA', 'N/A']
+                        na_values=['', 'NA', 'N/A'],
+                        **read_options
                     )
 
                     # Parse date columns
-                    date_columns = ['FILING_DATE', 'PERIOD_OF_REPORT', 'TRANS_DATE']
-                    for col in date_columns:
+                    for col in DATE_COLUMNS:
                         if col in df.columns:
                             df[col] = pd.to_datetime(df[col], format='%d-%b-%Y', errors='coerce')
 
@@ -63,60 +115,52 @@ def load_form4_tables(zip_path: str) -> Dict[str, pd.DataFrame]:
     return tables
 
 
-def build_insider_features(tables: Dict[str, pd.DataFrame]) -> pd.DataFrame:
-    """
-    Build insider trading features from Form 4 tables.
-
-    Joins SUBMISSION, NONDERIV_TRANS, and REPORTINGOWNER tables
-    to create aggregated insider features per symbol/date.
-    """
-    print("\n🔨 Building insider features...")
-
-    # Join tables
-    df = (
-        tables['NONDERIV_TRANS']
-        .merge(tables['SUBMISSION'], on='ACCESSION_NUMBER', how='inner')
-        .merge(tables['REPORTINGOWNER'], on='ACCESSION_NUMBER', how='inner')
-    )
-
-    print(f"  📊 Joined tables: {len(df):,} total transactions")
-
+def calculate_buy_sell(df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
+    """Filter joined transactions and add buy/sell/net share and value columns."""
     # Filter to meaningful transactions only
     df = df[df['TRANS_CODE'].isin(MEANINGFUL_CODES)].copy()
-    print(f"  🎯 Filtered to meaningful codes: {len(df):,} transactions")
+    if verbose:
+        print(f"  🎯 Filtered to meaningful codes: {len(df):,} transactions")
 
     # Filter out rows with missing critical fields
     df = df.dropna(subset=['TRANS_DATE', 'TRANS_SHARES', 'TRANS_PRICEPERSHARE'])
-    print(f"  ✂️  Removed nulls: {len(df):,} transactions remain")
+    if verbose:
+        print(f"  ✂️  Removed nulls: {len(df):,} transactions remain")
 
     # Calculate transaction value
-    df['trans_value'] = df['TRANS_SHARES'] * df['TRANS_PRICEPERSHARE']
+    shares = df['TRANS_SHARES'].astype('float64')
+    df['trans_value'] = shares * df['TRANS_PRICEPERSHARE'].astype('float64')
 
     # Separate buy and sell transactions
     df['is_buy'] = df['TRANS_CODE'].isin(BUY_CODES)
     df['is_sell'] = df['TRANS_CODE'].isin(SELL_CODES)
 
-    # Calculate buy/sell metrics
-    df['buy_shares'] = df.apply(lambda r: r['TRANS_SHARES'] if r['is_buy'] else 0, axis=1)
-    df['buy_value'] = df.apply(lambda r: r['trans_value'] if r['is_buy'] else 0, axis=1)
-    df['sell_shares'] = df.apply(lambda r: r['TRANS_SHARES'] if r['is_sell'] else 0, axis=1)
-    df['sell_value'] = df.apply(lambda r: r['trans_value'] if r['is_sell'] else 0, axis=1)
+    # Calculate buy/sell metrics (masked column arithmetic)
+    df['buy_shares'] = shares.where(df['is_buy'], 0.0)
+    df['buy_value'] = df['trans_value'].where(df['is_buy'], 0.0)
+    df['sell_shares'] = shares.where(df['is_sell'], 0.0)
+    df['sell_value'] = df['trans_value'].where(df['is_sell'], 0.0)
 
     # Calculate net (buy - sell)
     df['net_shares'] = df['buy_shares'] - df['sell_shares']
     df['net_value'] = df['buy_value'] - df['sell_value']
 
-    # Aggregate by symbol and date
-    features = df.groupby(['ISSUERTRADINGSYMBOL', 'TRANS_DATE']).agg({
-        'net_shares': 'sum',
-        'net_value': 'sum',
-        'buy_shares': 'sum',
-        'buy_value': 'sum',
-        'sell_shares': 'sum',
-        'sell_value': 'sum',
-        'is_buy': 'sum',
-        'is_sell': 'sum'
-    }).reset_index()
+    return df
+
+
+# Sums per (symbol, date); partial sums from chunks can be summed again
+GROUP_KEYS = ['ISSUERTRADINGSYMBOL', 'TRANS_DATE']
+SUM_COLUMNS = ['net_shares', 'net_value', 'buy_shares', 'buy_value', 'sell_shares', 'sell_value', 'is_buy', 'is_sell']
+
+
+def aggregate_insider_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate buy/sell columns by symbol and date."""
+    return df.groupby(GROUP_KEYS, observed=True)[SUM_COLUMNS].sum().reset_index()
+
+
+def finalize_insider_features(features: pd.DataFrame) -> pd.DataFrame:
+    """Rename aggregated columns to the feature schema and format dates."""
+    features = features.copy()
 
     # Rename columns
     features.columns = [
@@ -135,8 +179,35 @@ def build_insider_features(tables: Dict[str, pd.DataFrame]) -> pd.DataFrame:
     # Convert date to string format
     features['date'] = features['date'].dt.strftime('%Y-%m-%d')
 
-    # Filter out rows with null symbols
+    # Filter out rows with null symbols (symbols may be categorical codes; store plain strings)
     features = features[features['symbol'].notna()].copy()
+    features['symbol'] = features['symbol'].astype(object)
+
+    return features
+
+
+def build_insider_features(tables: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Build insider trading features from Form 4 tables.
+
+    Joins SUBMISSION, NONDERIV_TRANS, and REPORTINGOWNER tables
+    to create aggregated insider features per symbol/date.
+    """
+    print("\n🔨 Building insider features...")
+
+    # Join tables
+    df = (
+        tables['NONDERIV_TRANS']
+        .merge(tables['SUBMISSION'], on='ACCESSION_NUMBER', how='inner')
+        .merge(tables['REPORTINGOWNER'], on='ACCESSION_NUMBER', how='inner')
+    )
+
+    print(f"  📊 Joined tables: {len(df):,} total transactions")
+
+    df = calculate_buy_sell(df)
+
+    # Aggregate by symbol and date
+    features = finalize_insider_features(aggregate_insider_features(df))
 
     print(f"  ✅ Built features: {len(features):,} symbol-date pairs")
     print(f"  📈 Unique symbols: {features['symbol'].nunique():,}")
@@ -144,9 +215,43 @@ def build_insider_features(tables: Dict[str, pd.DataFrame]) -> pd.DataFrame:
     return features
 
 
+def ingest_form4_zip(zip_path: str, parts_dir: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Optional[str]:
+    """
+    Process-pool worker: stream one Form 4 ZIP into a Parquet part of insider features.
+
+    SUBMISSION and REPORTINGOWNER (key columns only) are loaded whole; NONDERIV_TRANS
+    is streamed in chunks, each joined and reduced to partial (symbol, date) sums.
+    """
+    submission = read_tsv(zip_path, 'SUBMISSION', FORM4_TABLE_PLAN['SUBMISSION'])
+    owners = read_tsv(zip_path, 'REPORTINGOWNER', FORM4_TABLE_PLAN['REPORTINGOWNER'])
+
+    partials = []
+    for chunk in read_tsv_chunks(zip_path, 'NONDERIV_TRANS', FORM4_TABLE_PLAN['NONDERIV_TRANS'], chunk_rows):
+        parse_sec_dates(chunk, DATE_COLUMNS)
+        df = (
+            chunk
+            .merge(submission, on='ACCESSION_NUMBER', how='inner')
+            .merge(owners, on='ACCESSION_NUMBER', how='inner')
+        )
+        partials.append(aggregate_insider_features(calculate_buy_sell(df, verbose=False)))
+
+    if not partials:
+        return None
+    features = pd.concat(partials, ignore_index=True)
+    features = features.groupby(GROUP_KEYS, observed=True)[SUM_COLUMNS].sum().reset_index()
+    return write_part(finalize_insider_features(features), Path(parts_dir), zip_path)
+
+
 def main():
     """Process all Form 4 ZIP files and create Parquet feature store."""
 
+    parser = argparse.ArgumentParser(description='Parse SEC Form 4 ZIPs into insider features')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Parse ZIPs in a process pool with streamed TSVs (0 = all cores; default 1 = in-memory, one ZIP at a time)')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help='Rows per streamed TSV chunk in process-pool mode')
+    args = parser.parse_args()
+
     print("=" * 80)
     print("SEC FORM 4 PARSER - INSIDER TRANSACTIONS")
     print("=" * 80)
@@ -165,50 +270,73 @@ def main():
 
     print(f"\n📦 Found {len(zip_files)} ZIP files to process\n")
 
-    # Process each ZIP file
-    all_features = []
-
-    for zip_file in zip_files:
-        try:
-            # Load tables from ZIP
-            tables = load_form4_tables(str(zip_file))
-
-            # Check required tables exist
-            required = ['SUBMISSION', 'NONDERIV_TRANS', 'REPORTINGOWNER']
-            missing = [t for t in required if t not in tables]
+    output_file = output_dir / 'insider_features.parquet'
 
-            if missing:
-                print(f"  ⚠️  Skipping {zip_file.name}: missing tables {missing}")
-                continue
+    if args.workers != 1:
+        # Process-pool mode: one streamed Parquet part per ZIP, merged at the end
+        workers = worker_count(args.workers)
+        parts_dir = output_dir / '_parts_insider'
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        print(f"⚙️  Parsing {len(zip_files)} ZIPs with {workers} worker processes\n")
+
+        parts = run_zip_pool(zip_files, ingest_form4_zip, workers, str(parts_dir), args.chunk_rows)
+        if not any(parts):
+            print("\n❌ No features extracted")
+            sys.exit(1)
+
+        # Remove duplicates across ZIPs (keep last if symbol-date appears multiple times)
+        print("\n🔗 Merging per-ZIP parts...")
+        merge_parquet_parts(parts, output_file, dedupe_keys=['symbol', 'date'])
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        combined = pd.read_parquet(output_file)
+
+        print(f"  ✅ Combined features: {len(combined):,} rows")
+        print(f"  📊 Date range: {combined['date'].min()} to {combined['date'].max()}")
+        print(f"  🏢 Unique symbols: {combined['symbol'].nunique():,}")
+    else:
+        # Process each ZIP file
+        all_features = []
+
+        for zip_file in zip_files:
+            try:
+                # Load tables from ZIP
+                tables = load_form4_tables(str(zip_file))
+
+                # Check required tables exist
+                required = ['SUBMISSION', 'NONDERIV_TRANS', 'REPORTINGOWNER']
+                missing = [t for t in required if t not in tables]
+
+                if missing:
+                    print(f"  ⚠️  Skipping {zip_file.name}: missing tables {missing}")
+                    continue
 
-            # Build features
-            features = build_insider_features(tables)
-            all_features.append(features)
+                # Build features
+                features = build_insider_features(tables)
+                all_features.append(features)
 
-            print(f"  💾 Processed {zip_file.name}: {len(features):,} features\n")
+                print(f"  💾 Processed {zip_file.name}: {len(features):,} features\n")
 
-        except Exception as e:
-            print(f"  ❌ Failed to process {zip_file.name}: {e}\n")
-            continue
+            except Exception as e:
+                print(f"  ❌ Failed to process {zip_file.name}: {e}\n")
+                continue
 
-    if not all_features:
-        print("\n❌ No features extracted")
-        sys.exit(1)
+        if not all_features:
+            print("\n❌ No features extracted")
+            sys.exit(1)
 
-    # Combine all features
-    print("\n🔗 Combining all features...")
-    combined = pd.concat(all_features, ignore_index=True)
+        # Combine all features
+        print("\n🔗 Combining all features...")
+        combined = pd.concat(all_features, ignore_index=True)
 
-    # Remove duplicates (keep last if symbol-date appears multiple times)
-    combined = combined.drop_duplicates(subset=['symbol', 'date'], keep='last')
+        # Remove duplicates (keep last if symbol-date appears multiple times)
+        combined = combined.drop_duplicates(subset=['symbol', 'date'], keep='last')
 
-    print(f"  ✅ Combined features: {len(combined):,} rows")
-    print(f"  📊 Date range: {combined['date'].min()} to {combined['date'].max()}")
-    print(f"  🏢 Unique symbols: {combined['symbol'].nunique():,}")
+        print(f"  ✅ Combined features: {len(combined):,} rows")
+        print(f"  📊 Date range: {combined['date'].min()} to {combined['date'].max()}")
+        print(f"  🏢 Unique symbols: {combined['symbol'].nunique():,}")
 
-    # Save to Parquet
-    output_file = output_dir / 'insider_features.parquet'
-    combined.to_parquet(output_file, index=False, compression='snappy')
+        # Save to Parquet
+        combined.to_parquet(output_file, index=False, compression='snappy')
 
     file_size_mb = output_file.stat().st_size / (1024 * 1024)
     print(f"\n💾 Saved to {output_file}")
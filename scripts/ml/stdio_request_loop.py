@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Concurrent stdin/stdout request loop shared by the persistent prediction servers
+
+Protocol (one JSON object per line):
+- Requests carrying an "id" field are dispatched to a worker pool so the stdin
+  reader never blocks on inference. Their responses echo the same "id" and may be
+  written out of order as soon as each request completes.
+- Requests without an "id" keep the original strictly serial contract: they are
+  handled on the reader thread and answered in arrival order.
+
+Inference libraries used by the servers (LightGBM, PyTorch) release the GIL in
+their native code, so a thread pool gives real parallelism across cores.
+"""
+
+import os
+import sys
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+Handler = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+def default_worker_count() -> int:
+    """Worker count from ML_SERVER_WORKERS, falling back to the CPU count"""
+    configured = os.environ.get('ML_SERVER_WORKERS')
+    if configured:
+        try:
+            return max(1, int(configured))
+        except ValueError:
+            sys.stderr.write(f'Invalid ML_SERVER_WORKERS={configured!r}, using CPU count\n')
+            sys.stderr.flush()
+    return os.cpu_count() or 1
+
+
+class ConcurrentRequestLoop:
+    def __init__(self, handler: Handler, max_workers: Optional[int] = None):
+        """
+        Args:
+            handler: Maps a parsed request dict to a response dict
+                     ({'success': True, 'data': ...} or {'success': False, 'error': ...}).
+                     Must be safe to call from several threads at once.
+            max_workers: Worker pool size (defaults to default_worker_count())
+        """
+        self.handler = handler
+        self.max_workers = max_workers or default_worker_count()
+        self._write_lock = threading.Lock()
+
+    def _write(self, response: Dict[str, Any]) -> None:
+        """Write one response line atomically"""
+        line = json.dumps(response)
+        with self._write_lock:
+            sys.stdout.write(line + '\n')
+            sys.stdout.flush()
+
+    def _handle(self, request: Dict[str, Any], request_id: Any = None) -> None:
+        """Run the handler and emit its response (never raises)"""
+        try:
+            response = self.handler(request)
+        except Exception as e:
+            response = {
+                'success': False,
+                'error': str(e)
+            }
+        if request_id is not None:
+            response = {'id': request_id, **response}
+        self._write(response)
+
+    def run(self) -> None:
+        """Read requests from stdin until EOF, then wait for in-flight work"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for line in sys.stdin:
+                line = line.strip()
+                if not line:
+                    continue
+
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('Request must be a JSON object')
+                except Exception as e:
+                    self._write({
+                        'success': False,
+                        'error': str(e)
+                    })
+                    continue
+
+                request_id = request.get('id')
+                if request_id is None:
+                    # Legacy caller: serial, in-order response
+                    self._handle(request)
+                else:
+                    pool.submit(self._handle, request, request_id)